@@ -0,0 +1,20 @@
+import os
+import sys
+
+# 测试直接导入仓库根目录下的脚本
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import vxfile_bench
+
+
+@pytest.fixture
+def firmware(tmp_path_factory):
+    """
+    生成一个小的合成固件，返回 (路径, 说明)
+    """
+    def generate(file_count=20, table_type=2, endian='big', seed=1):
+        path = tmp_path_factory.mktemp("firmware") / f"fw_{table_type}_{endian}_{file_count}.bin"
+        return str(path), vxfile_bench.generate_firmware(str(path), file_count, table_type, endian, seed, symbol_count=50)
+    return generate
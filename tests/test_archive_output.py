@@ -0,0 +1,49 @@
+import io
+import tarfile
+import zipfile
+
+import vxfile_extracter as vx
+
+
+def test_extract_streams_restored_files_into_tar(firmware, tmp_path, monkeypatch):
+    path, info = firmware(table_type=1)
+    monkeypatch.chdir(tmp_path)
+    result = vx.extract(path, cache_dir=None, output=str(tmp_path / "restored.tar.gz"))
+    assert result.archived_files == len(info['files'])
+    with tarfile.open(result.archive) as archive:
+        names = archive.getnames()
+    assert sorted(names) == sorted(f"{vx.RESULT_DIR_NAME}/{name.lstrip('/')}" for name in info['files'])
+    assert not list(tmp_path.rglob(vx.RESULT_DIR_NAME))
+
+
+def test_extract_writes_zip_to_unseekable_file_object(firmware, tmp_path, monkeypatch):
+    path, info = firmware(table_type=2)
+    monkeypatch.chdir(tmp_path)
+
+    class Unseekable(io.BytesIO):
+        def seekable(self):
+            return False
+
+        def seek(self, *args):
+            raise io.UnsupportedOperation("seek")
+
+        def tell(self):
+            raise io.UnsupportedOperation("tell")
+
+    output = Unseekable()
+    result = vx.extract(path, cache_dir=None, output=output, output_format="zip")
+    assert result.archive == "-" and result.archived_files == len(info['files'])
+    with zipfile.ZipFile(io.BytesIO(output.getvalue())) as archive:
+        assert len(archive.namelist()) == len(info['files'])
+        assert all(info.filename.startswith(vx.RESULT_DIR_NAME + "/") for info in archive.infolist())
+
+
+def test_archive_sink_skips_duplicate_paths(tmp_path):
+    src = tmp_path / "src"
+    src.write_bytes(b"data")
+    sink = vx.ArchiveSink(str(tmp_path / "out.tar"))
+    sink.submit(str(src), "web/a.htm")
+    sink.submit(str(src), "web/a.htm")
+    assert sink.close() == 1
+    with tarfile.open(tmp_path / "out.tar") as archive:
+        assert archive.getnames() == [f"{vx.RESULT_DIR_NAME}/web/a.htm"]
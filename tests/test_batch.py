@@ -0,0 +1,33 @@
+import json
+import shutil
+import subprocess
+import sys
+
+import vxfile_extracter as vx
+
+
+def run_cli(args, cwd):
+    return subprocess.run([sys.executable, vx.__file__] + args, capture_output=True, text=True, cwd=cwd)
+
+
+def test_collect_skips_output_root_and_manifest(tmp_path):
+    (tmp_path / "fw.bin").write_bytes(b"fw")
+    (tmp_path / "out" / "fw.bin").mkdir(parents=True)
+    (tmp_path / "out" / "fw.bin" / "vxfile.log").write_text("log")
+    (tmp_path / "manifest.jsonl").write_text("{}\n")
+    file_paths = vx.collect_batch_inputs(str(tmp_path), str(tmp_path / "out"), str(tmp_path / "manifest.jsonl"))
+    assert file_paths == [str(tmp_path / "fw.bin")]
+
+
+def test_rerun_in_input_directory_skips_own_outputs(firmware, tmp_path):
+    # 在固件目录中运行 batch .，默认的输出根目录 vxfile_batch/ 就在输入目录里
+    image_path, _ = firmware()
+    shutil.copy(image_path, tmp_path / "fw.bin")
+    for _ in range(2):
+        result = run_cli(["batch", ".", "--no-cache"], tmp_path)
+        assert result.returncode == 0, result.stdout + result.stderr
+        assert "共 1 个固件" in result.stdout + result.stderr
+    assert "本次处理 0 个" in result.stdout + result.stderr
+    with open(tmp_path / vx.BATCH_OUTPUT_ROOT / vx.BATCH_MANIFEST_NAME, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert [(record["path"], record["status"]) for record in records] == [(str(tmp_path / "fw.bin"), "ok")]
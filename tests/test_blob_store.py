@@ -0,0 +1,71 @@
+import threading
+
+import vxfile_extracter as vx
+
+
+def make_sink(store, tmp_path, name):
+    output_dir = tmp_path / name
+    return vx.BlobStoreSink(store, str(output_dir / vx.RESULT_DIR_NAME), str(output_dir / vx.BLOB_MANIFEST_NAME), name)
+
+
+def write_file(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_gc_waits_for_in_progress_run(tmp_path):
+    store = vx.BlobStore(str(tmp_path / "store"))
+    sink = make_sink(store, tmp_path, "run")
+    sink.submit(write_file(tmp_path / "a", b"fresh object"), "web/a.htm")
+    digest = sink.files["web/a.htm"]
+
+    stats = {}
+    gc_thread = threading.Thread(target=lambda: stats.update(store.gc()))
+    gc_thread.start()
+    # 引用还没有登记，gc 必须等到写入结束
+    gc_thread.join(0.3)
+    assert gc_thread.is_alive()
+    assert store.contains(digest)
+
+    sink.close()
+    gc_thread.join(5)
+    assert not gc_thread.is_alive()
+    assert store.contains(digest)
+    assert stats['removed'] == 0 and stats['refs'] == 1
+
+
+def test_gc_does_not_wait_for_finished_runs(tmp_path):
+    store = vx.BlobStore(str(tmp_path / "store"))
+    sink = make_sink(store, tmp_path, "run")
+    sink.submit(write_file(tmp_path / "a", b"content"), "a")
+    sink.close()
+    with store.lock(shared=False, blocking=False):
+        pass
+    assert store.gc()['removed'] == 0
+
+
+def test_gc_drops_dangling_refs_and_keeps_shared_objects(tmp_path):
+    store = vx.BlobStore(str(tmp_path / "store"))
+    shared = write_file(tmp_path / "shared", b"shared asset")
+    sinks = {}
+    for name in ("kept", "removed"):
+        sink = sinks[name] = make_sink(store, tmp_path, name)
+        sink.submit(shared, "web/common.js")
+        sink.submit(write_file(tmp_path / f"own_{name}", name.encode()), f"web/{name}.htm")
+        sink.close()
+    assert sinks["kept"].files["web/common.js"] == sinks["removed"].files["web/common.js"]
+    assert store.refcounts()[sinks["kept"].files["web/common.js"]] == 2
+
+    # 输出目录被清理后引用即失效
+    (tmp_path / "removed" / vx.BLOB_MANIFEST_NAME).unlink()
+    stats = store.gc(dry_run=True)
+    assert stats['stale_refs'] == 1 and stats['removed'] == 1
+    assert store.contains(sinks["removed"].files["web/removed.htm"])
+
+    stats = store.gc()
+    assert stats == {'refs': 1, 'stale_refs': 1, 'objects': 3, 'removed': 1, 'freed_bytes': len(b"removed"),
+                     'kept_bytes': len(b"shared asset") + len(b"kept")}
+    assert not store.contains(sinks["removed"].files["web/removed.htm"])
+    assert store.contains(sinks["kept"].files["web/common.js"])
+    assert store.contains(sinks["kept"].files["web/kept.htm"])
+    assert list(store.load_refs()) == ["kept"]
@@ -0,0 +1,33 @@
+import sys
+import threading
+
+import vxfile_extracter as vx
+
+
+def test_quiet_extract_keeps_stdout_and_other_threads_logging(firmware, tmp_path, monkeypatch, capsys):
+    path, info = firmware()
+    monkeypatch.chdir(tmp_path)
+    run_extraction = vx.run_extraction
+    seen = {}
+
+    async def wrapped(*args):
+        seen['stdout'] = sys.stdout
+        # 同一时刻其他线程（默认上下文）的日志照常输出
+        thread = threading.Thread(target=vx.logger.warning, args=("other thread",))
+        thread.start()
+        thread.join()
+        return await run_extraction(*args)
+
+    monkeypatch.setattr(vx, "run_extraction", wrapped)
+    stdout = sys.stdout
+    result = vx.extract(path, cache_dir=None)
+    assert seen['stdout'] is stdout
+    assert result.filesystem_offset == info['filesystem_offset']
+    assert capsys.readouterr().out.splitlines() == ["other thread"]
+
+
+def test_verbose_extract_logs_to_console(firmware, tmp_path, monkeypatch, capsys):
+    path, _ = firmware()
+    monkeypatch.chdir(tmp_path)
+    vx.extract(path, cache_dir=None, verbose=True)
+    assert "文件偏移表" in capsys.readouterr().out
@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import vxfile_extracter as vx
+
+
+def make_tree(root, files):
+    for relative_path, data in files.items():
+        path = root / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return str(root)
+
+
+def append(path, data):
+    with open(path, 'ab') as f:
+        f.write(data)
+
+
+def store(cache, tmp_path, key, files):
+    extracted_dir = make_tree(tmp_path / f"src_{key}", files)
+    cache.store(key, "native", f"scan {key}\n", "big", extracted_dir, "_fw.bin.extracted")
+
+
+def test_hit_restores_tree_and_scan_output(tmp_path):
+    cache = vx.ExtractionCache(str(tmp_path / "cache"))
+    store(cache, tmp_path, "k1", {"A0": b"main program", "sub/B0": b"web"})
+    meta = cache.load("k1", "native")
+    assert meta['scan_output'] == "scan k1\n" and meta['endian'] == "big"
+    cache.restore(meta, str(tmp_path / "out"))
+    assert (tmp_path / "out" / "A0").read_bytes() == b"main program"
+    assert (tmp_path / "out" / "sub" / "B0").read_bytes() == b"web"
+    assert cache.load("k1", "other") is None
+
+
+def test_corrupted_entry_is_invalidated(tmp_path):
+    cache = vx.ExtractionCache(str(tmp_path / "cache"))
+    for key, corrupt in (
+        ("tree", lambda entry: os.remove(os.path.join(entry, "tree", "A0"))),
+        ("size", lambda entry: append(os.path.join(entry, "tree", "A0"), b"x")),
+        ("scan", lambda entry: append(os.path.join(entry, "scan.txt"), b"x")),
+        ("meta", lambda entry: append(os.path.join(entry, "meta.json"), b"}")),
+    ):
+        store(cache, tmp_path, key, {"A0": b"data", "B0": b"more"})
+        entry_dir = cache.entry_dir(key, "native")
+        corrupt(entry_dir)
+        assert cache.load(key, "native") is None
+        assert not os.path.exists(entry_dir)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = vx.ExtractionCache(str(tmp_path / "cache"), max_size=250)
+    store(cache, tmp_path, "old", {"A0": b"a" * 100})
+    store(cache, tmp_path, "used", {"A0": b"b" * 100})
+    os.utime(os.path.join(cache.entry_dir("old", "native"), "meta.json"), (1000, 1000))
+    os.utime(os.path.join(cache.entry_dir("used", "native"), "meta.json"), (1000, 1000))
+    # 读取会刷新最近使用时间，"old" 成为最久未用的一项
+    assert cache.load("used", "native")
+    store(cache, tmp_path, "new", {"A0": b"c" * 100})
+    assert cache.load("old", "native") is None
+    assert cache.load("used", "native") and cache.load("new", "native")
+
+
+def test_extract_hits_cache_on_second_run(firmware, tmp_path, monkeypatch):
+    path, info = firmware()
+    calls = []
+    native_extract_image = vx.native_extract_image
+    monkeypatch.setattr(vx, "native_extract_image", lambda *args: calls.append(args) or native_extract_image(*args))
+    cache_dir = str(tmp_path / "cache")
+    for run in ("first", "second"):
+        (tmp_path / run).mkdir()
+        monkeypatch.chdir(tmp_path / run)
+        result = vx.extract(path, cache_dir=cache_dir)
+        assert result.filesystem_offset == info['filesystem_offset']
+    assert len(calls) == 1
+
+
+def test_parse_size_accepts_units_and_rejects_non_positive():
+    assert vx.parse_size("4096") == 4096
+    assert vx.parse_size("512M") == 512 * 1024 ** 2
+    assert vx.parse_size("1.5kb") == 1536
+    for text in ("abc", "", "0", "-5", "0.0001K", "infG"):
+        with pytest.raises(ValueError):
+            vx.parse_size(text)
+
+
+def test_cli_reports_invalid_cache_size(tmp_path):
+    image_path = tmp_path / "image.bin"
+    image_path.write_bytes(b"\x00" * 64)
+    result = subprocess.run([sys.executable, vx.__file__, str(image_path), "--cache-size=abc"],
+                            capture_output=True, text=True, cwd=tmp_path)
+    assert result.returncode == 1
+    assert "错误：无效的缓存容量 abc" in result.stdout
+    assert "Traceback" not in result.stderr
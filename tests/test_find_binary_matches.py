@@ -0,0 +1,45 @@
+import lzma
+
+import vxfile_extracter as vx
+
+
+NAMES = ["index.htm", "login.htm", "logo.gif"]
+
+
+def write_table(path, names):
+    # 带 NUL 字节的二进制文件，明文包含所有文件名，相当于解压出的偏移表
+    data = b"\x00".join(name.encode() for name in names) + b"\x00" * 64
+    path.write_bytes(data)
+    return data
+
+
+def test_prefers_plain_file_over_its_7z_twin(tmp_path):
+    data = write_table(tmp_path / "3A2B", NAMES)
+    # 同名的 .7z 是压缩前的数据，更小，里面没有明文文件名
+    (tmp_path / "3A2B.7z").write_bytes(lzma.compress(data)[:16])
+    assert vx.find_binary_matches(str(tmp_path), NAMES, workers=1) == str(tmp_path / "3A2B")
+
+
+def test_returns_existing_match_without_7z_twin(tmp_path):
+    write_table(tmp_path / "3A2B", NAMES)
+    assert vx.find_binary_matches(str(tmp_path), NAMES, workers=1) == str(tmp_path / "3A2B")
+
+
+def test_picks_smallest_file_containing_every_name(tmp_path):
+    write_table(tmp_path / "big", NAMES + ["x" * 256])
+    write_table(tmp_path / "small", NAMES)
+    write_table(tmp_path / "partial", NAMES[:1])
+    assert vx.find_binary_matches(str(tmp_path), NAMES, workers=1) == str(tmp_path / "small")
+
+
+def test_no_match_returns_empty_list(tmp_path):
+    (tmp_path / "text.htm").write_bytes(b"index.htm login.htm")
+    assert vx.find_binary_matches(str(tmp_path), NAMES, workers=1) == []
+
+
+def test_web_source_names_from_directory_with_shell_characters(tmp_path):
+    # 目录名含空格和分号，grep 命令中必须整体转义
+    directory = tmp_path / "web dir;x"
+    directory.mkdir()
+    (directory / "index.htm").write_text('<img src="img/logo.gif"><script src="js/app.js"></script><a href="x.htm">')
+    assert sorted(vx.extract_web_source_filenames(str(directory))) == ["app.js", "logo.gif"]
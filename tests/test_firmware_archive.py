@@ -0,0 +1,29 @@
+import sys
+
+import vxfile_extracter as vx
+
+
+def test_quiet_archive_prints_nothing_and_keeps_stdout(firmware, capsys, monkeypatch):
+    path, info = firmware(table_type=2)
+    load_entries = vx.FirmwareArchive._load_entries
+    seen = {}
+
+    def wrapped(self):
+        seen['stdout'] = sys.stdout
+        return load_entries(self)
+
+    monkeypatch.setattr(vx.FirmwareArchive, "_load_entries", wrapped)
+    stdout = sys.stdout
+    with vx.FirmwareArchive(path) as archive:
+        names = archive.namelist()
+        assert len(names) == len(info['files'])
+        assert archive.read(names[0])
+    assert seen['stdout'] is stdout
+    assert capsys.readouterr().out == ""
+
+
+def test_verbose_archive_logs_to_console(firmware, capsys):
+    path, _ = firmware(table_type=1)
+    with vx.FirmwareArchive(path, verbose=True) as archive:
+        assert archive.namelist()
+    assert capsys.readouterr().out
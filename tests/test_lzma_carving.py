@@ -0,0 +1,57 @@
+import lzma
+import os
+import struct
+
+import vxfile_extracter as vx
+
+
+def header(properties=0x5D, dictionary_size=1 << 23, uncompressed_size=vx.LZMA_UNKNOWN_SIZE):
+    return struct.pack('<BIQ', properties, dictionary_size, uncompressed_size)
+
+
+def test_signature_accepts_encoder_headers():
+    for candidate in (header(), header(0x5A, 0x00800000, 1234), header(dictionary_size=3 << 21), header(uncompressed_size=vx.LZMA_MAX_DECLARED_SIZE)):
+        assert vx.find_lzma_headers(b"\xff" * 7 + candidate + b"\xff" * 16) == [7]
+
+
+def test_signature_rejects_implausible_headers():
+    for candidate in (
+        header(properties=0x00),
+        header(properties=0xE1),
+        header(dictionary_size=(1 << 23) + 1),
+        header(dictionary_size=5 << 20),
+        header(dictionary_size=1 << 11),
+        header(uncompressed_size=0),
+        header(uncompressed_size=vx.LZMA_MAX_DECLARED_SIZE + 1),
+    ):
+        assert vx.find_lzma_headers(b"\xff" * 7 + candidate + b"\xff" * 16) == []
+
+
+def test_candidates_inside_a_decoded_stream_are_not_carved(tmp_path, monkeypatch):
+    carved = []
+
+    def fake_carve(file_path, output_dir, offset):
+        carved.append(offset)
+        return {'offset': offset, 'end': offset + 100}
+
+    monkeypatch.setattr(vx, "carve_lzma_stream", fake_carve)
+    streams = vx.carve_lzma_streams("image.bin", str(tmp_path), [0, 40, 99, 100, 150, 250], workers=1)
+    assert carved == [0, 100, 250]
+    assert [stream['offset'] for stream in streams] == [0, 100, 250]
+
+
+def test_carving_on_process_pool_keeps_offset_order(tmp_path):
+    blocks = [lzma.compress(os.urandom(64) + bytes(range(256)) * (i + 1), format=lzma.FORMAT_ALONE) for i in range(6)]
+    image = tmp_path / "image.bin"
+    data = b""
+    offsets = []
+    for block in blocks:
+        data += b"\xff" * 16
+        offsets.append(len(data))
+        data += block
+    image.write_bytes(data)
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    streams = vx.carve_lzma_streams(str(image), str(output_dir), offsets, workers=2)
+    assert [stream['offset'] for stream in streams] == offsets
+    assert sorted(os.listdir(output_dir)) == sorted(name for offset in offsets for name in (vx.offset_to_carved_name(offset), vx.offset_to_carved_name(offset) + ".7z"))
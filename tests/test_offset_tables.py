@@ -0,0 +1,34 @@
+import struct
+
+import vxfile_extracter as vx
+
+
+def type1_entry(name, offset, endian, padding=4):
+    # 文件名 + 至少 padding 个 00 补齐到4字节对齐 + 4字节偏移
+    prefix = vx.get_struct_prefix(endian)
+    name = name.encode('ascii')
+    return name.ljust(vx.align_up(len(name) + padding), b"\x00") + struct.pack(prefix + "I", offset)
+
+
+def decode(table, endian):
+    data = b"\x00" * 0x40 + table + b"\x00" * 0x40
+    return list(vx.iter_type1_entries(data, 0, len(data), endian))
+
+
+def test_type1_big_endian_offset_below_0x01000000():
+    entries = [("index.htm", 0x00012345), ("login.htm", 0x00000100), ("logo.gif", 0x00FFFFFC)]
+    table = b"".join(type1_entry(name, offset, 'big') for name, offset in entries)
+    assert decode(table, 'big') == entries
+
+
+def test_type1_zero_offset_reads_zero_field():
+    for endian in ('big', 'little'):
+        entries = [("index.htm", 0), ("login.htm", 0x1234), ("logo.gif", 0)]
+        table = b"".join(type1_entry(name, offset, endian) for name, offset in entries)
+        assert decode(table, endian) == entries
+
+
+def test_type1_long_padding_is_skipped():
+    entries = [("index.htm", 0x80), ("style.css", 0), ("a/b/main.js", 0x00000200)]
+    table = b"".join(type1_entry(name, offset, 'big', padding=16) for name, offset in entries)
+    assert decode(table, 'big') == entries
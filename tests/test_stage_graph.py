@@ -0,0 +1,98 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+import vxfile_extracter as vx
+
+
+class StageFailed(Exception):
+    pass
+
+
+def test_failing_stage_cancels_running_stages_and_skips_dependents():
+    events = []
+    graph = vx.StageGraph()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise StageFailed("boom")
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            events.append("slow cancelled")
+            raise
+
+    async def dependent(_):
+        events.append("dependent ran")
+
+    async def lazy():
+        events.append("lazy ran")
+
+    graph.add("failing", failing)
+    graph.add("slow", slow)
+    graph.add("dependent", dependent, ["failing"])
+    graph.add("lazy", lazy, lazy=True)
+    start = time.monotonic()
+    with pytest.raises(StageFailed):
+        asyncio.run(graph.run())
+    assert time.monotonic() - start < 5
+    assert events == ["slow cancelled"]
+    assert all(task.done() for task in graph.tasks.values())
+    assert "lazy" not in graph.tasks
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="按进程组杀掉外部命令只在 posix 上实现")
+def test_failing_stage_kills_subprocesses_of_other_stages(tmp_path):
+    pid_file = tmp_path / "pid"
+    graph = vx.StageGraph()
+
+    async def failing():
+        while not pid_file.exists() or not pid_file.read_text().strip():
+            await asyncio.sleep(0.01)
+        raise StageFailed("boom")
+
+    async def external():
+        await vx.run_subprocess_async(f"echo $$ > {pid_file}; sleep 30", shell=True)
+
+    graph.add("failing", failing)
+    graph.add("external", external)
+    with pytest.raises(StageFailed):
+        asyncio.run(graph.run())
+    pid = int(pid_file.read_text())
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0)
+
+
+def test_shared_dependency_survives_cancellation_of_one_dependent():
+    graph = vx.StageGraph()
+
+    async def base():
+        await asyncio.sleep(0.01)
+        return "base"
+
+    async def consumer(value):
+        return value + "!"
+
+    async def main():
+        graph.add("base", base)
+        graph.add("first", consumer, ["base"])
+        graph.add("second", consumer, ["base"])
+        first = graph.start("first")
+        second = graph.start("second")
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "base!"
+
+
+def test_run_in_thread_keeps_context_variables():
+    async def main():
+        vx.LOG_STAGE.set("find_table_file")
+        return await vx.run_in_thread(vx.LOG_STAGE.get)
+
+    assert asyncio.run(main()) == "find_table_file"
@@ -0,0 +1,60 @@
+import glob
+import os
+
+import vxfile_extracter as vx
+
+ALL_STAGES = ['extract', 'symbol_table', 'check_encrypted', 'find_table_file', 'locate_offset', 'decode_table', 'choose_offset', 'restore']
+
+
+def test_unchanged_rerun_reuses_every_stage(firmware, tmp_path, monkeypatch):
+    path, info = firmware()
+    monkeypatch.chdir(tmp_path)
+    assert vx.extract(path, cache_dir=None).metrics['reused'] == []
+    result = vx.extract(path, cache_dir=None)
+    assert sorted(result.metrics['reused']) == sorted(ALL_STAGES)
+    assert result.filesystem_offset == info['filesystem_offset']
+
+
+def test_option_change_reruns_only_affected_stages(firmware, tmp_path, monkeypatch):
+    path, info = firmware()
+    monkeypatch.chdir(tmp_path)
+    vx.extract(path, cache_dir=None)
+    # fuzzymode 是 find_table_file 的输入，其上游沿用，它和下游重新执行
+    result = vx.extract(path, cache_dir=None, fuzzymode=True)
+    assert sorted(result.metrics['reused']) == ['check_encrypted', 'extract', 'symbol_table']
+    assert result.filesystem_offset == info['filesystem_offset']
+
+
+def test_modified_extracted_tree_reruns_extraction(firmware, tmp_path, monkeypatch):
+    path, info = firmware()
+    monkeypatch.chdir(tmp_path)
+    first = vx.extract(path, cache_dir=None)
+    carved = sorted(glob.glob(os.path.join(first.extracted_dir, "*.7z")))[-1]
+    os.remove(carved)
+    result = vx.extract(path, cache_dir=None)
+    assert 'extract' not in result.metrics['reused']
+    assert os.path.isfile(carved)
+    assert len(result.file_map) == len(info['files'])
+
+
+def test_incremental_false_reruns_everything(firmware, tmp_path, monkeypatch):
+    path, _ = firmware()
+    monkeypatch.chdir(tmp_path)
+    vx.extract(path, cache_dir=None)
+    assert vx.extract(path, cache_dir=None, incremental=False).metrics['reused'] == []
+
+
+def test_interrupted_extraction_is_redone(firmware, tmp_path, monkeypatch):
+    path, info = firmware()
+    monkeypatch.chdir(tmp_path)
+    first = vx.extract(path, cache_dir=None)
+    manifest_path = os.path.join(os.path.dirname(first.extracted_dir), vx.STAGE_MANIFEST_NAME)
+    manifest = vx.StageManifest(manifest_path)
+    manifest.mark_running("extract", manifest.stages["extract"]['key'])
+    # 模拟解包中途被打断：解压目录只写了一部分
+    carved = sorted(glob.glob(os.path.join(first.extracted_dir, "*.7z")))[-1]
+    os.remove(carved)
+    result = vx.extract(path, cache_dir=None)
+    assert 'extract' not in result.metrics['reused']
+    assert os.path.isfile(carved)
+    assert len(result.file_map) == len(info['files'])
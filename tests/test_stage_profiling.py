@@ -0,0 +1,71 @@
+import asyncio
+
+import vxfile_extracter as vx
+
+
+def run_graph(serial):
+    events = []
+    graph = vx.StageGraph(serial)
+
+    def stage(name):
+        async def func(*_):
+            events.append(("start", name))
+            await asyncio.sleep(0.01)
+            events.append(("end", name))
+            return name
+        return func
+
+    graph.add("a", stage("a"))
+    graph.add("b", stage("b"))
+    graph.add("c", stage("c"), ["a"])
+    results = asyncio.run(graph.run())
+    return events, results
+
+
+def test_serial_graph_runs_one_stage_at_a_time():
+    events, results = run_graph(serial=True)
+    assert results == {"a": "a", "b": "b", "c": "c"}
+    assert events == [("start", "a"), ("end", "a"), ("start", "b"), ("end", "b"), ("start", "c"), ("end", "c")]
+
+
+def test_concurrent_graph_overlaps_independent_stages():
+    events, _ = run_graph(serial=False)
+    assert events[:2] == [("start", "a"), ("start", "b")]
+
+
+def test_profiler_records_overlapping_stages():
+    profiler = vx.StageProfiler()
+
+    async def stage(name, delay):
+        with profiler.stage(name):
+            await asyncio.sleep(delay)
+
+    async def main():
+        await asyncio.gather(stage("extract", 0.05), stage("symbol_table", 0.01))
+        await stage("restore", 0)
+
+    asyncio.run(main())
+    stages = profiler.report()['stages']
+    assert stages['extract']['overlapping_stages'] == ['symbol_table']
+    assert stages['symbol_table']['overlapping_stages'] == ['extract']
+    assert stages['restore']['overlapping_stages'] == []
+    assert stages['symbol_table']['peak_rss_scope'] == 'overlapping'
+    assert stages['extract']['peak_rss_scope'] == 'overlapping'
+    assert stages['restore']['peak_rss_scope'] in ('stage', 'process')
+
+
+def test_profiled_extract_runs_stages_serially(firmware, tmp_path, monkeypatch):
+    path, _ = firmware()
+    monkeypatch.chdir(tmp_path)
+    report = vx.extract(path, cache_dir=None, profile_stage="decode_table").metrics
+    assert report['scheduling'] == 'serial'
+    assert all(not stage['overlapping_stages'] for stage in report['stages'].values())
+    assert report['profile']['pstats']
+
+
+def test_default_extract_reports_concurrent_scheduling(firmware, tmp_path, monkeypatch):
+    path, _ = firmware()
+    monkeypatch.chdir(tmp_path)
+    report = vx.extract(path, cache_dir=None).metrics
+    assert report['scheduling'] == 'concurrent'
+    assert 'cpu_time' in report['process_wide_metrics']
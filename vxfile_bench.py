@@ -0,0 +1,465 @@
+"""
+vxfile_extractor 的合成固件生成器与分阶段基准测试。
+
+生成器按需构造合成的 vxworks 固件：props 0x5A、8MB 字典（5A 00 00 80）头部的 LZMA 数据块，
+type1 或 type2(MINIFS) 形态的文件偏移表，含 bzero 的符号表数据块，以及被 HTML 引用的 web 资源文件，
+大小端均可，文件数从几个到十万级。基准测试在生成的固件上分别计时各个处理阶段，
+可保存结果并与基线比较，作为性能改动的门禁。
+
+用法：
+    python3 vxfile_bench.py generate <输出 bin 路径> [--files=N] [--type=1|2] [--endian=big|little] [--seed=N]
+    python3 vxfile_bench.py run [--files=100,1000,10000] [--type=1,2] [--endian=big,little] [--stages=阶段1,阶段2]
+                                [--repeat=3] [--workers=N] [--save=<结果 json>] [--baseline=<基线 json>]
+                                [--max-regression=0.2] [--keep=<目录>]
+"""
+import os
+import sys
+import json
+import lzma
+import time
+import random
+import shutil
+import zlib
+import struct
+import tempfile
+import statistics
+import contextlib
+
+import vxfile_extracter as vx
+
+# 生成的 LZMA 数据流头部：props 0x5A (lc=0, lp=0, pb=2)，声明 8MB 字典；
+# 实际用小字典压缩（解压结果相同，生成十万级文件时快得多），再把头部的字典大小改写为 8MB
+LZMA_FILTERS = [{'id': lzma.FILTER_LZMA1, 'dict_size': 1 << 16, 'lc': 0, 'lp': 0, 'pb': 2}]
+LZMA_DECLARED_DICT_SIZE = 1 << 23
+# 填充数据只含 0x80-0xff 字节：不含 00，也不会组成可打印字符串或误报的 LZMA 头部
+HIGH_BYTES = bytes(b | 0x80 for b in range(256))
+# web 资源目录与扩展名
+WEB_DIRECTORIES = {"htm": "/web", "js": "/web/js", "css": "/web/css", "gif": "/web/img", "jpg": "/web/img"}
+WEB_EXTENSIONS = ("htm", "js", "css", "gif", "jpg")
+# 每个 HTML 页面引用的资源数
+HTML_REFERENCES = 4
+# 符号表中必有的符号，其余按编号生成
+SYMBOL_NAMES = ("bzero", "bcopy", "memcpy", "memset", "strlen", "printf", "malloc", "free", "taskSpawn", "semTake", "semGive")
+SYMBOL_BASE_ADDRESS = 0x80001000
+# uImage 头中的 CPU 架构（内置解包后端据此判断端序）：大端 MIPS、小端 ARM；操作系统编号 14 为 VxWorks
+UIMAGE_ARCHITECTURE = {'big': 5, 'little': 2}
+UIMAGE_OS_VXWORKS = 14
+UIMAGE_LOAD_ADDRESS = 0x80001000
+# 主程序中偏移表前后的代码区大小
+PROGRAM_FILLER_SIZE = 0x8000
+# 偏移表前后的 00 填充，与真实固件一致，也让 type1 解析从偏移表前 0x50 处开始时不会把代码区当成文件名
+TABLE_PADDING = 0x100
+
+BENCH_STAGES = (
+    "scan_offset_tables",
+    "extract_file_info_type1",
+    "extract_file_info_type2",
+    "fuzzy_search_file_contain_table",
+    "find_binary_matches",
+    "extract_function_table",
+    "export_symbol_table",
+    "rename_extracted_files",
+)
+DEFAULT_FILE_COUNTS = (100, 1000, 10000)
+DEFAULT_REPEAT = 3
+DEFAULT_MAX_REGRESSION = 0.2
+# 与基线比较时忽略小于该值的绝对差异（秒），避免毫秒级阶段的抖动误报
+REGRESSION_NOISE_FLOOR = 0.005
+
+
+def filler_bytes(rng, size):
+    """
+    生成不含 00 的伪代码区数据
+    """
+    return rng.randbytes(size).translate(HIGH_BYTES)
+
+def compress_block(data):
+    """
+    压缩为 LZMA alone 数据流，头部为 props 0x5A、8MB 字典、实际解压后大小
+    """
+    stream = bytearray(lzma.compress(data, format=lzma.FORMAT_ALONE, filters=LZMA_FILTERS))
+    stream[1:5] = struct.pack('<I', LZMA_DECLARED_DICT_SIZE)
+    stream[5:13] = struct.pack('<Q', len(data))
+    return bytes(stream)
+
+def build_web_files(file_count, rng):
+    """
+    生成 web 资源：返回 [(完整路径, 内容), ...]。
+    约五分之一是 HTML 页面，每个页面在同一行里以 src= 引用若干其他资源
+    """
+    names = []
+    for index in range(file_count):
+        extension = WEB_EXTENSIONS[0] if index % 5 == 0 else rng.choice(WEB_EXTENSIONS[1:])
+        names.append(f"{WEB_DIRECTORIES[extension]}/f{index}.{extension}")
+    assets = [name for name in names if not name.endswith(".htm")]
+
+    files = []
+    for index, name in enumerate(names):
+        extension = name.rsplit('.', 1)[1]
+        if extension == "htm":
+            references = rng.sample(assets, min(HTML_REFERENCES, len(assets)))
+            tags = "".join(f'<script src="{ref}"></script>' if ref.endswith(".js") else f'<img src="{ref}">' for ref in references)
+            content = f"<html><head><title>page {index}</title></head><body>{tags}</body></html>\n".encode('ascii')
+        elif extension in ("js", "css"):
+            content = f"/* f{index} */\nvar v{index} = {rng.randrange(1 << 30)};\n".encode('ascii') * rng.randint(1, 8)
+        else:
+            magic = b"GIF89a" if extension == "gif" else b"\xff\xd8\xff\xe0\x00\x10JFIF\x00"
+            content = magic + rng.randbytes(rng.randint(64, 1024))
+        files.append((name, content))
+    return files
+
+def build_type1_table(files, offsets, endian):
+    """
+    type1 偏移表：每个表项为 定长文件名字段(00 补齐，至少 4 个 00) + 文件偏移 + 文件大小
+    """
+    prefix = vx.get_struct_prefix(endian)
+    name_width = vx.align_up(max(len(name) for name, _ in files) + 4)
+    return b"".join(
+        name.encode('ascii').ljust(name_width, b"\x00") + struct.pack(prefix + "II", offsets[name], len(content))
+        for name, content in files
+    )
+
+def build_minifs_table(files, offsets, endian):
+    """
+    type2(MINIFS) 偏移表：0x20 字节头部(files_count 位于 +0x14)、以单个 00 分隔的 Table of Names（目录在前）、
+    4 字节对齐的 ToF（每项 20 字节）和 chunk 表（每项 12 字节，首字段为相对文件系统的偏移）。
+    第一个 ToF 表项的路径偏移为 0，保证 ToN 末尾之后紧跟 00 00。
+    """
+    prefix = vx.get_struct_prefix(endian)
+    directories = sorted({name.rsplit('/', 1)[0] for name, _ in files}, key=lambda d: (d != files[0][0].rsplit('/', 1)[0], d))
+    strings = directories + [name.rsplit('/', 1)[1] for name, _ in files]
+    string_offsets = {}
+    position = 0
+    for string in strings:
+        string_offsets.setdefault(string, position)
+        position += len(string) + 1
+
+    # 头部最后一个字段取值使其字节为 00 00 12 00，与真实 MINIFS 头部一致
+    header = b"MINIFS\x00\x00" + struct.pack(prefix + "6I", 1, 2, 3, len(files), 5, 0x1200 if endian == 'big' else 0x120000)
+    names_block = b"\x00".join(string.encode('ascii') for string in strings)
+    names_block += b"\x00" * (vx.align_up(len(header) + len(names_block)) - len(header) - len(names_block))
+    entries = []
+    chunks = []
+    for chunk_number, (name, content) in enumerate(files):
+        directory, file_name = name.rsplit('/', 1)
+        entries.append(struct.pack(prefix + "5I", string_offsets[directory], string_offsets[file_name], chunk_number, 0, len(content)))
+        chunks.append(struct.pack(prefix + "3I", offsets[name], len(content), len(content)))
+    return header + names_block + b"".join(entries) + b"".join(chunks)
+
+def build_symbol_table(symbol_count, endian):
+    """
+    符号表：头部(总大小、符号数) + 每项 8 字节的 (类型<<24 | 名字偏移, 地址) + 字符串表
+    """
+    prefix = vx.get_struct_prefix(endian)
+    names = list(SYMBOL_NAMES) + [f"func_{index:06d}" for index in range(max(0, symbol_count - len(SYMBOL_NAMES)))]
+    strings = bytearray()
+    entries = bytearray()
+    for index, name in enumerate(names):
+        entries += struct.pack(prefix + "II", (0x05 << 24) | len(strings), SYMBOL_BASE_ADDRESS + index * 0x40)
+        strings += name.encode('ascii') + b"\x00"
+    total_size = 8 + len(entries) + len(strings)
+    return struct.pack(prefix + "II", total_size, len(names)) + bytes(entries) + bytes(strings)
+
+def build_uimage_header(payload, endian, name=b"vxWorks"):
+    """
+    uImage 头：各字段大端存放，CRC 与 mkimage 的算法一致
+    """
+    fields = [struct.unpack('>I', vx.UIMAGE_MAGIC)[0], 0, 0x5F5E1000, len(payload), UIMAGE_LOAD_ADDRESS, UIMAGE_LOAD_ADDRESS,
+              zlib.crc32(payload), UIMAGE_OS_VXWORKS, UIMAGE_ARCHITECTURE[endian], 2, 0, name]
+    fields[1] = zlib.crc32(vx.UIMAGE_HEADER.pack(*fields))
+    return vx.UIMAGE_HEADER.pack(*fields)
+
+def generate_firmware(output_path, file_count=1000, table_type=2, endian='big', seed=1, symbol_count=2000):
+    """
+    生成一个合成 vxworks 固件并返回其说明（预期的偏移表位置、文件系统偏移和文件映射等）。
+    布局：uImage 头 | 代码区 | [type1 偏移表] | 主程序 LZMA 块 | 符号表 LZMA 块 | 文件系统（每个文件一个 LZMA 块）| 代码区
+    type1 偏移表以明文放在固件本身中；type2 (MINIFS) 偏移表放在主程序里，解包后才能看到。
+    文件系统开头有一个不在偏移表里的头部数据块，所有文件的相对偏移都不为 0。
+    """
+    if table_type not in (1, 2):
+        raise ValueError(f"未知的偏移表形态: {table_type}")
+    if endian not in ('big', 'little'):
+        raise ValueError(f"未知的端序: {endian}")
+    rng = random.Random(seed)
+    files = build_web_files(file_count, rng)
+
+    # 文件系统：先排好每个文件的相对偏移，偏移表需要用到
+    filesystem = bytearray(compress_block(b"VXFS" + filler_bytes(rng, 60)))
+    offsets = {}
+    blocks = []
+    for name, content in files:
+        offsets[name] = len(filesystem)
+        block = compress_block(content)
+        blocks.append(block)
+        filesystem += block
+    filesystem = bytes(filesystem)
+
+    # 主程序：代码区 + [MINIFS 偏移表] + httpd 引用的资源名字符串 + 代码区
+    referenced_names = b"\x00".join(name.encode('ascii') for name, _ in files[:64]) + b"\x00"
+    program = bytearray(filler_bytes(rng, PROGRAM_FILLER_SIZE))
+    program_table_offset = None
+    if table_type == 2:
+        program += b"\x00" * TABLE_PADDING
+        program_table_offset = len(program)
+        program += build_minifs_table(files, offsets, endian)
+        program += b"\x00" * TABLE_PADDING
+    program += referenced_names + filler_bytes(rng, PROGRAM_FILLER_SIZE)
+
+    image = bytearray(filler_bytes(rng, 0x400 - vx.UIMAGE_HEADER.size))
+    image_table_offset = None
+    if table_type == 1:
+        image += b"\x00" * TABLE_PADDING
+        image_table_offset = vx.UIMAGE_HEADER.size + len(image)
+        image += build_type1_table(files, offsets, endian)
+        image += b"\x00" * TABLE_PADDING
+        image += b"\x00" * (-len(image) % 0x10)
+    program_offset = vx.UIMAGE_HEADER.size + len(image)
+    image += compress_block(bytes(program))
+    image += b"\x00" * (-len(image) % 0x10)
+    symbol_table_offset = vx.UIMAGE_HEADER.size + len(image)
+    image += compress_block(build_symbol_table(symbol_count, endian))
+    image += b"\x00" * (-len(image) % 0x10)
+    filesystem_offset = vx.UIMAGE_HEADER.size + len(image)
+    image += filesystem
+    image += filler_bytes(rng, 0x400)
+
+    with open(output_path, 'wb') as f:
+        f.write(build_uimage_header(bytes(image), endian))
+        f.write(image)
+
+    return {
+        "table_type": table_type,
+        "endian": endian,
+        "file_count": file_count,
+        "seed": seed,
+        "table_in_image": table_type == 1,
+        "table_offset": image_table_offset if table_type == 1 else program_table_offset,
+        "program_offset": program_offset,
+        "symbol_table_offset": symbol_table_offset,
+        "symbol_count": max(symbol_count, len(SYMBOL_NAMES)),
+        "filesystem_offset": filesystem_offset,
+        "files": offsets,
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    屏蔽被测函数的过程输出
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def time_stage(func, repeat, before_each=None):
+    """
+    执行 func repeat 次并计时，返回 (每次耗时列表, 最后一次的返回值)；before_each 在每次计时前执行，不计入耗时
+    """
+    runs = []
+    result = None
+    for _ in range(repeat):
+        if before_each:
+            before_each()
+        with quiet():
+            start_time = time.perf_counter()
+            result = func()
+            runs.append(time.perf_counter() - start_time)
+    return runs, result
+
+def check_file_map(decoded, expected):
+    """
+    校验解析出的偏移表：返回 "正确项数/预期项数"
+    """
+    correct = 0
+    for name, offset in expected.items():
+        try:
+            if int(decoded.get(name, -1)) == offset:
+                correct += 1
+        except (TypeError, ValueError):
+            continue
+    return f"{correct}/{len(expected)}"
+
+def count_files(directory):
+    return sum(len(files) for _, _, files in os.walk(directory))
+
+def run_scenario(work_dir, file_count, table_type, endian, stages, repeat, workers, seed):
+    """
+    生成一个固件、用内置后端解包一次（不计时），然后分别计时各阶段，返回 {阶段: 结果}
+    """
+    image_path = os.path.join(work_dir, f"synthetic_type{table_type}_{endian}_{file_count}.bin")
+    info = generate_firmware(image_path, file_count, table_type, endian, seed)
+    with quiet():
+        scan_output, extracted_dir, _, _ = vx.run_native_extract(image_path, workers, os.path.join(work_dir, "out"))
+        program_path = os.path.join(extracted_dir, vx.offset_to_carved_name(info["program_offset"]))
+        table_file = image_path if info["table_in_image"] else program_path
+        table_offset = vx.find_files_offset_table(table_file)
+        web_names = vx.extract_web_source_filenames(extracted_dir) or []
+    expected = info["files"]
+    result_dir = os.path.join(os.path.dirname(extracted_dir), "result_vxworks_file")
+    symbol_table_path = os.path.join(work_dir, f"SYMBOL_Table_{endian}_{info['symbol_count']}")
+    with open(symbol_table_path, 'wb') as f:
+        f.write(build_symbol_table(info["symbol_count"], endian))
+
+    # type2 的候选偏移为 MINIFS 头部之后的 ToN 开头
+    expected_table = (info["table_offset"] + (0x20 if table_type == 2 else 0), table_type)
+    cases = {
+        "scan_offset_tables": (
+            lambda: vx.scan_offset_tables(table_file),
+            lambda candidates: "ok" if candidates and (candidates[0].offset, candidates[0].mode) == expected_table
+            else f"返回 {[(hex(candidate.offset), candidate.mode) for candidate in candidates[:3]] or '空'}",
+            None,
+        ),
+        "extract_file_info_type1": (
+            lambda: vx.extract_file_info_type1(table_file, table_offset, endian),
+            lambda decoded: check_file_map(decoded, expected),
+            None,
+        ),
+        "extract_file_info_type2": (
+            lambda: vx.extract_file_info_type2(table_file, table_offset, endian),
+            lambda decoded: check_file_map(decoded, expected),
+            None,
+        ),
+        "fuzzy_search_file_contain_table": (
+            lambda: vx.fuzzy_search_file_contain_table(extracted_dir, workers),
+            lambda found: "ok" if found == program_path else f"返回 {found or '空'}",
+            None,
+        ),
+        "find_binary_matches": (
+            lambda: vx.find_binary_matches(extracted_dir, web_names, workers),
+            lambda found: "ok" if found == program_path else f"返回 {found or '空'}",
+            None,
+        ),
+        "extract_function_table": (
+            lambda: vx.extract_function_table(image_path, extracted_dir, workers),
+            lambda path: "ok" if path and os.path.isfile(path) else "未找到符号表",
+            None,
+        ),
+        "export_symbol_table": (
+            lambda: (vx.export_symbol_table(symbol_table_path), vx.SymbolTable.load(symbol_table_path)),
+            lambda exported: "ok" if exported[0][0] == info["symbol_count"] and exported[1].address_of("bzero") == SYMBOL_BASE_ADDRESS
+            else f"解析出 {exported[0][0]} 个符号",
+            None,
+        ),
+        "rename_extracted_files": (
+            lambda: vx.rename_extracted_files(expected, extracted_dir, info["filesystem_offset"], scan_output, "copy", workers, stop_on_misses=False),
+            lambda _: f"{count_files(result_dir)}/{len(expected)}",
+            lambda: shutil.rmtree(result_dir, ignore_errors=True),
+        ),
+    }
+    skipped = "extract_file_info_type2" if table_type == 1 else "extract_file_info_type1"
+
+    results = {}
+    for stage in stages:
+        if stage == skipped:
+            continue
+        func, check, before_each = cases[stage]
+        runs, value = time_stage(func, repeat, before_each)
+        results[stage] = {
+            "min": min(runs),
+            "median": statistics.median(runs),
+            "runs": runs,
+            "check": check(value),
+        }
+    return results
+
+def compare_with_baseline(results, baseline, max_regression):
+    """
+    与基线比较最短耗时，返回超过允许退化比例的 [(场景, 阶段, 基线耗时, 当前耗时), ...]
+    """
+    regressions = []
+    for scenario, stages in results["scenarios"].items():
+        for stage, current in stages.items():
+            base = baseline.get("scenarios", {}).get(scenario, {}).get(stage)
+            if not base:
+                continue
+            if current["min"] > base["min"] * (1 + max_regression) and current["min"] - base["min"] > REGRESSION_NOISE_FLOOR:
+                regressions.append((scenario, stage, base["min"], current["min"]))
+    return regressions
+
+def run_benchmarks(file_counts=DEFAULT_FILE_COUNTS, table_types=(1, 2), endians=('big', 'little'), stages=BENCH_STAGES,
+                   repeat=DEFAULT_REPEAT, workers=None, seed=1, keep_dir=None):
+    """
+    对每个 (偏移表形态, 端序, 文件数) 组合生成固件并计时各阶段，返回结果字典
+    """
+    unknown = [stage for stage in stages if stage not in BENCH_STAGES]
+    if unknown:
+        raise ValueError(f"未知的阶段: {', '.join(unknown)}，可选: {', '.join(BENCH_STAGES)}")
+    results = {
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "repeat": repeat,
+        "scenarios": {},
+    }
+    print(f"{'场景':<24}{'阶段':<34}{'最短(s)':>10}{'中位(s)':>10}  校验")
+    for table_type in table_types:
+        for endian in endians:
+            for file_count in file_counts:
+                scenario = f"type{table_type}-{endian}-{file_count}"
+                work_dir = os.path.join(keep_dir, scenario) if keep_dir else tempfile.mkdtemp(prefix="vxfile_bench_")
+                if keep_dir:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+                    os.makedirs(work_dir)
+                try:
+                    stage_results = run_scenario(work_dir, file_count, table_type, endian, stages, repeat, workers, seed)
+                finally:
+                    if not keep_dir:
+                        shutil.rmtree(work_dir, ignore_errors=True)
+                results["scenarios"][scenario] = stage_results
+                for stage, result in stage_results.items():
+                    print(f"{scenario:<24}{stage:<34}{result['min']:>10.4f}{result['median']:>10.4f}  {result['check']}")
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help") or sys.argv[1] not in ("generate", "run"):
+        print(__doc__)
+        sys.exit(0)
+
+    if sys.argv[1] == "generate":
+        if len(sys.argv) < 3:
+            print("错误：generate 需要指定输出路径")
+            sys.exit(1)
+        output_path = sys.argv[2]
+        info = generate_firmware(
+            output_path,
+            int(vx.get_cli_option(sys.argv, "--files", "1000")),
+            int(vx.get_cli_option(sys.argv, "--type", "2")),
+            vx.get_cli_option(sys.argv, "--endian", "big"),
+            int(vx.get_cli_option(sys.argv, "--seed", "1")),
+        )
+        with open(output_path + ".json", 'w', encoding='utf-8') as f:
+            json.dump(info, f, indent=1)
+        print(f"已生成 {output_path}（{os.path.getsize(output_path)} 字节，{info['file_count']} 个文件），说明见 {output_path}.json")
+        sys.exit(0)
+
+    file_counts = [int(count) for count in vx.get_cli_option(sys.argv, "--files", ",".join(map(str, DEFAULT_FILE_COUNTS))).split(",")]
+    table_types = [int(table_type) for table_type in vx.get_cli_option(sys.argv, "--type", "1,2").split(",")]
+    endians = vx.get_cli_option(sys.argv, "--endian", "big,little").split(",")
+    stages = vx.get_cli_option(sys.argv, "--stages", ",".join(BENCH_STAGES)).split(",")
+    repeat = int(vx.get_cli_option(sys.argv, "--repeat", str(DEFAULT_REPEAT)))
+    workers = vx.get_cli_option(sys.argv, "--workers")
+    save_path = vx.get_cli_option(sys.argv, "--save")
+    baseline_path = vx.get_cli_option(sys.argv, "--baseline")
+    max_regression = float(vx.get_cli_option(sys.argv, "--max-regression", str(DEFAULT_MAX_REGRESSION)))
+    keep_dir = vx.get_cli_option(sys.argv, "--keep")
+
+    try:
+        results = run_benchmarks(file_counts, table_types, endians, stages, repeat, int(workers) if workers else None,
+                                 keep_dir=os.path.abspath(keep_dir) if keep_dir else None)
+    except ValueError as e:
+        print(f"错误: {e}")
+        sys.exit(1)
+
+    if save_path:
+        with open(save_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+        print(f"结果已保存到 {save_path}")
+
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, max_regression)
+        for scenario, stage, base, current in regressions:
+            print(f"\033[91m[-] 性能退化：{scenario} {stage} {base:.4f}s -> {current:.4f}s\033[0m")
+        if regressions:
+            sys.exit(1)
+        print(f"\033[92m[+] 与基线 {baseline_path} 相比没有超过 {max_regression:.0%} 的退化\033[0m")
@@ -2,133 +2,914 @@ import re
 import os
 import sys
 import time
+import csv
+import json
+import logging
 import math
 import lzma
+import errno
+import mmap
+import io
 import shutil
+import tarfile
+import zipfile
+import struct
+import hashlib
+import cProfile
+import dataclasses
+import tempfile
+import traceback
+import contextlib
+import contextvars
+import signal
+import shlex
+import asyncio
+import threading
 import subprocess
 from pathlib import Path
 from random import choice, randint
-from collections import defaultdict
-# 检查当前 Python 版本，3.7 及以上版本使用 text=True，3.6 及以下版本使用 universal_newlines=True
-def get_subprocess_params():
-    if sys.version_info >= (3, 7):
-        return {'text': True}
+from array import array
+from bisect import bisect_right
+from itertools import islice
+from functools import partial
+from collections import defaultdict, deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+# 日志：过程信息都经由 logger 输出，级别和 JSON Lines 事件流由 configure_logging 设置
+LOG_LEVELS = ("debug", "info", "warning", "error")
+DEFAULT_LOG_LEVEL = "info"
+ANSI_ESCAPE_PATTERN = re.compile(r'\033\[[0-9;]*m')
+# 正在处理的固件和阶段，记入 JSON 事件；asyncio 任务和 run_in_thread 的工作线程会带上这些上下文
+LOG_FIRMWARE = contextvars.ContextVar('LOG_FIRMWARE', default=None)
+LOG_STAGE = contextvars.ContextVar('LOG_STAGE', default=None)
+# 当前上下文的日志是否输出到控制台；extract() 的 verbose=False 只在本次调用的上下文中关闭，不影响其他线程和事件流
+LOG_CONSOLE = contextvars.ContextVar('LOG_CONSOLE', default=True)
+# 当前的日志设置，批处理的工作进程启动时按它重新配置
+LOG_CONFIG = {'level': DEFAULT_LOG_LEVEL, 'json_path': None, 'console_level': None}
+logger = logging.getLogger("vxfile_extracter")
+logger.propagate = False
+
+class ConsoleHandler(logging.Handler):
+    """
+    把日志写到输出时的 sys.stdout（contextlib.redirect_stdout、--output - 时改到标准错误、批处理的每固件日志都照常生效），
+    输出目标不是终端时去掉颜色代码。progress 事件在终端上用 \\r 刷新同一行，之后的其他日志先换行再输出
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.progress_stream = None
+        self.addFilter(lambda record: LOG_CONSOLE.get())
+
+    def emit(self, record):
+        try:
+            stream = sys.stdout
+            message = self.format(record)
+            is_terminal = stream.isatty()
+            if not is_terminal:
+                message = ANSI_ESCAPE_PATTERN.sub('', message)
+            if getattr(record, 'event', None) == 'progress' and is_terminal:
+                finished = record.fields['finished']
+                stream.write("\r" + message + "\033[K" + ("\n" if finished else ""))
+                stream.flush()
+                self.progress_stream = None if finished else stream
+                return
+            if self.progress_stream is stream:
+                stream.write("\n")
+            self.progress_stream = None
+            stream.write(message + "\n")
+        except Exception:
+            self.handleError(record)
+
+class JsonLinesHandler(logging.Handler):
+    """
+    把每条日志写成一行 JSON 事件：time、level、event（普通日志为 log）、message（去掉颜色代码）、firmware、stage、pid，
+    以及 extra={'event': ..., 'fields': {...}} 传入的字段。path 为 - 时写到标准错误。
+    每行一次写入并立即 flush，批处理的多个工作进程以追加方式写同一个文件时各行不会交错
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.stream = sys.stderr if path == "-" else open(path, 'a', encoding='utf-8')
+
+    def emit(self, record):
+        try:
+            event = {
+                'time': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+                'level': record.levelname.lower(),
+                'event': getattr(record, 'event', 'log'),
+                'message': ANSI_ESCAPE_PATTERN.sub('', record.getMessage()),
+                'firmware': LOG_FIRMWARE.get(),
+                'stage': LOG_STAGE.get(),
+                'pid': record.process,
+            }
+            event.update(getattr(record, 'fields', {}))
+            self.stream.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+            self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        if self.stream is not sys.stderr:
+            self.stream.close()
+        super().close()
+
+def configure_logging(level=DEFAULT_LOG_LEVEL, json_path=None, console_level=None):
+    """
+    设置日志级别（LOG_LEVELS 之一），json_path 不为 None 时另外把日志写成 JSON Lines 事件流（追加）。
+    console_level 单独限制标准输出上的日志（如安静模式只显示警告和错误，事件流仍按 level 记录），None 时与 level 相同。
+    导入模块时已按默认设置配置好：INFO 及以上输出到标准输出；extract() 的 verbose 为 False 时该次调用的日志不输出到控制台，事件流不受影响
+    """
+    for name in (level, console_level or level):
+        if name not in LOG_LEVELS:
+            raise ValueError(f"未知的日志级别: {name}，可选: {', '.join(LOG_LEVELS)}")
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    logger.setLevel(getattr(logging, level.upper()))
+    console = ConsoleHandler()
+    console.setLevel(getattr(logging, (console_level or level).upper()))
+    logger.addHandler(console)
+    if json_path:
+        logger.addHandler(JsonLinesHandler(json_path))
+    LOG_CONFIG.update(level=level, json_path=json_path, console_level=console_level)
+
+configure_logging()
+
+# 进度行最短的刷新间隔（秒），以及各类计数的显示名
+PROGRESS_INTERVAL = 0.5
+PROGRESS_KINDS = {'copied': '已复制', 'missing': '不存在', 'skipped': '跳过', 'restored': '已恢复'}
+
+class ProgressReporter:
+    """
+    单行的限速进度：update() 只累加计数，距上次输出超过 interval 秒时才输出一次已处理数/总数、各类计数和每秒处理数，
+    close() 时输出最终结果。以 INFO 级别的 progress 事件记入日志：终端上在同一行刷新，JSON 事件流中带有各项计数
+    """
+
+    def __init__(self, label, total=None, interval=PROGRESS_INTERVAL):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.counts = defaultdict(int)
+        self.done = 0
+        self.start_time = self.last_time = time.monotonic()
+        self.enabled = logger.isEnabledFor(logging.INFO)
+
+    def update(self, kind, count=1):
+        self.counts[kind] += count
+        self.done += count
+        if self.enabled:
+            now = time.monotonic()
+            if now - self.last_time >= self.interval:
+                self.last_time = now
+                self.emit(now, False)
+
+    def emit(self, now, finished):
+        elapsed = now - self.start_time
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        counts = "，".join(f"{PROGRESS_KINDS.get(kind, kind)} {count}" for kind, count in self.counts.items())
+        logger.info(f"{self.label}：{self.done}" + (f"/{self.total}" if self.total is not None else "")
+                    + (f"（{counts}）" if counts else "") + f"，{rate:.0f}/秒，{elapsed:.1f}s",
+                    extra={'event': 'progress', 'fields': {
+                        'label': self.label, 'done': self.done, 'total': self.total, 'counts': dict(self.counts),
+                        'rate': round(rate, 1), 'elapsed': round(elapsed, 3), 'finished': finished}})
+
+    def close(self):
+        if self.enabled:
+            self.emit(time.monotonic(), True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# 本进程启动过的子进程数：外部命令、进程池工作进程，供分阶段统计使用
+SPAWN_COUNTS = defaultdict(int)
+
+async def run_subprocess_async(command, timeout=None, shell=False, check=False):
+    """
+    所有外部命令都经由这里执行，以便统计启动的子进程数。在事件循环中等待外部命令结束，不占用线程，
+    多个阶段的外部命令可以同时运行。
+    command 为参数列表，shell 为 True 时为 shell 命令行；返回 subprocess.CompletedProcess（stdout/stderr 为文本），
+    check 为 True 且退出码不为 0 时抛出 subprocess.CalledProcessError。
+    超过 timeout 秒时杀掉子进程并抛出 subprocess.TimeoutExpired；所在的任务被取消时同样先杀掉子进程。
+    posix 上子进程在独立的进程组中运行，shell 管道中的各个命令会一并被杀掉
+    """
+    SPAWN_COUNTS['subprocesses'] += 1
+    kwargs = {'stdout': asyncio.subprocess.PIPE, 'stderr': asyncio.subprocess.PIPE}
+    if os.name == 'posix':
+        kwargs['start_new_session'] = True
+    if shell:
+        process = await asyncio.create_subprocess_shell(command, **kwargs)
     else:
-        return {'universal_newlines': True}
+        process = await asyncio.create_subprocess_exec(*command, **kwargs)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        await kill_subprocess(process)
+        raise subprocess.TimeoutExpired(command, timeout) from None
+    except asyncio.CancelledError:
+        await kill_subprocess(process)
+        raise
+    stdout, stderr = stdout.decode('utf-8', 'replace'), stderr.decode('utf-8', 'replace')
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command, stdout, stderr)
+    return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+async def kill_subprocess(process):
+    """
+    杀掉 run_subprocess_async 启动的子进程（posix 上为整个进程组）并等待其退出
+    """
+    if process.returncode is None:
+        try:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+    await process.wait()
+
+async def run_in_thread(func, *args):
+    """
+    在线程池中执行同步的计算并等待其结果，事件循环中的其他阶段同时继续运行。
+    正被 cProfile 剖析的阶段（见 StageProfiler.stage）在该线程中同样开启剖析。
+    在复制的上下文中执行，线程中同样能读到当前阶段、固件等上下文变量
+    """
+    loop = asyncio.get_running_loop()
+    call = partial(call_in_profiled_stage, func, *args)
+    return await loop.run_in_executor(None, contextvars.copy_context().run, call)
+
 def get_parent_directory(folder_path):
     """
     获取指定文件夹的父文件夹路径
     """
     parent_directory = os.path.dirname(folder_path)
     return parent_directory
+
+class VxfileError(RuntimeError):
+    """
+    固件处理失败时抛出的异常基类
+    """
+
+class BinwalkNotInstalledError(VxfileError):
+    """
+    需要 binwalk 但未安装
+    """
+
+class ExtractionFailedError(VxfileError):
+    """
+    binwalk 解包或签名扫描失败
+    """
+
+class EncryptedOffsetTableError(VxfileError):
+    """
+    文件偏移表被隐藏或加密，暂不支持的固件形态
+    """
+
+class OffsetTableNotFoundError(VxfileError):
+    """
+    找不到包含文件偏移表的文件，或在其中定位不到偏移表
+    """
+
+# strings -n 5 的最小可打印串长度，以及各调用方原先 grep -E 里使用的扩展名集合
+MIN_STRING_LENGTH = 5
+TABLE_FILE_EXTENSIONS = ("jpg", "png", "js", "css", "htm", "cer", "pem", "bin")
+FUZZY_FILE_EXTENSIONS = ("jpg", "png", "js", "cer", "pem", "bin")
+# 与 GNU strings 一致：制表符加上 0x20-0x7e 的可打印字符
+PRINTABLE_RUN_CHARS = rb'[\t\x20-\x7e]'
+_printable_run_patterns = {}
+_extension_patterns = {}
+
+def get_printable_run_pattern(min_length=MIN_STRING_LENGTH):
+    """
+    获取（并缓存）匹配长度至少为 min_length 的可打印字符串的编译正则
+    """
+    pattern = _printable_run_patterns.get(min_length)
+    if pattern is None:
+        pattern = re.compile(PRINTABLE_RUN_CHARS + b'{%d,}' % min_length)
+        _printable_run_patterns[min_length] = pattern
+    return pattern
+
+def get_extension_pattern(extensions=TABLE_FILE_EXTENSIONS):
+    """
+    获取（并缓存）等价于 grep -E '\\.jpg|\\.png|...' 的编译正则
+    """
+    extensions = tuple(extensions)
+    pattern = _extension_patterns.get(extensions)
+    if pattern is None:
+        pattern = re.compile(rb'\.(?:' + b'|'.join(re.escape(ext.encode('ascii')) for ext in extensions) + rb')')
+        _extension_patterns[extensions] = pattern
+    return pattern
+
+def scan_strings_in_data(data, min_length=MIN_STRING_LENGTH, extensions=TABLE_FILE_EXTENSIONS):
+    """
+    用编译好的正则一次性找出 data 中所有长度不小于 min_length 的可打印字符串，
+    只保留包含指定扩展名的那些，返回 [(偏移, 字符串bytes), ...]
+    """
+    records = []
+    run_pattern = get_printable_run_pattern(min_length)
+    extension_pattern = get_extension_pattern(extensions) if extensions is not None else None
+    for match in run_pattern.finditer(data):
+        run = match.group()
+        if extension_pattern is None or extension_pattern.search(run):
+            records.append((match.start(), run))
+    return records
+
+def scan_file_strings(file_path, min_length=MIN_STRING_LENGTH, extensions=TABLE_FILE_EXTENSIONS):
+    """
+    进程内替代 `strings -t x -n 5 <file> | grep -E ...` 管道。
+    将文件 mmap 后用编译好的正则一次性找出所有长度不小于 min_length 的可打印字符串，
+    只保留包含指定扩展名的那些（与原先 grep 的匹配语义一致）。
+    传入 FirmwareImage 时使用其共享映射，结果缓存在映像上，同一参数只扫描一次。
+
+    :param file_path: 目标文件路径或 FirmwareImage
+    :param min_length: 最小字符串长度，对应 strings -n
+    :param extensions: 扩展名集合，为 None 时不过滤
+    :return: [(偏移, 字符串bytes), ...]，按偏移升序排列
+    """
+    with open_firmware_image(file_path) as image:
+        return image.get_index(('strings', min_length, extensions), lambda data: scan_strings_in_data(data, min_length, extensions))
+
+def format_strings_output(records):
+    """
+    将 scan_file_strings 的结果格式化为与 strings -t x 相同的文本，便于沿用原有的打印输出
+    """
+    return "".join(f"{offset:7x} {run.decode('ascii')}\n" for offset, run in records)
+
+class FirmwareImage:
+    """
+    一次运行中共享的固件映像：文件只打开并 mmap 一次，各阶段都通过它访问数据，
+    不再各自读入或映射整个文件。切片用 view() 零拷贝地取得；
+    端序、LZMA 标志/头部位置、可打印字符串等索引在第一次用到时计算并缓存在映像上。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self._indexes = {}
+        self._endian = None
+
+    @classmethod
+    def from_bytes(cls, data, name="<memory>"):
+        """
+        以内存中的数据（如解压出的主程序）构造映像，各阶段可以像访问固件文件一样访问它
+        """
+        image = cls.__new__(cls)
+        image.path = name
+        image._file = None
+        image.size = len(data)
+        image.data = data
+        image._indexes = {}
+        image._endian = None
+        return image
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap) and not self.data.closed:
+            try:
+                self.data.close()
+            except BufferError:
+                # 还有 view() 取得的切片未释放，映射随最后一个切片一起释放
+                pass
+        if self._file is not None:
+            self._file.close()
+
+    def view(self, start, end=None):
+        """
+        零拷贝地取得 [start, end) 的只读 memoryview，用完后请 release()
+        """
+        return memoryview(self.data)[start:end]
+
+    def get_index(self, key, compute):
+        """
+        取得以 key 缓存的索引，第一次访问时调用 compute(data) 计算
+        """
+        if key not in self._indexes:
+            self._indexes[key] = compute(self.data)
+        return self._indexes[key]
+
+    def lzma_marker_offsets(self):
+        """
+        vxworks 压缩数据块标志（5A 00 00 80）的所有偏移
+        """
+        return self.get_index('lzma_markers', lambda data: [match.start() for match in re.finditer(re.escape(LZMA_BLOCK_MARKER), data)])
+
+    def lzma_header_offsets(self):
+        """
+        所有形似 LZMA alone 头部的偏移
+        """
+        return self.get_index('lzma_headers', find_lzma_headers)
+
+    def uimage_header(self):
+        """
+        第一个合法 uImage 头的 (偏移, 描述, 端序)，没有时为 None
+        """
+        def compute(data):
+            offset = data.find(UIMAGE_MAGIC)
+            header = describe_uimage_header(data, offset) if offset != -1 else None
+            return (offset,) + header if header else None
+        return self.get_index('uimage', compute)
+
+    @property
+    def endian(self):
+        """
+        固件端序：解包阶段确定后记录在这里；此前根据 uImage 头中的 CPU 架构推测，推测不出时为 None
+        """
+        if self._endian is None:
+            header = self.uimage_header()
+            return header[2] if header else None
+        return self._endian
+
+    @endian.setter
+    def endian(self, value):
+        self._endian = value
+
+@contextlib.contextmanager
+def open_firmware_image(source):
+    """
+    source 为 FirmwareImage 时直接使用（用完不关闭，由创建者负责），
+    为路径时临时打开一个 FirmwareImage，用完关闭
+    """
+    if isinstance(source, FirmwareImage):
+        yield source
+        return
+    with FirmwareImage(source) as image:
+        yield image
+
+def get_image_path(source):
+    """
+    FirmwareImage 或路径对应的文件路径
+    """
+    return source.path if isinstance(source, FirmwareImage) else source
+
 def check_binwalk_installed():
     if not shutil.which("binwalk"):
-        print("错误：未找到 binwalk，请确保 binwalk 已正确安装。")
-        sys.exit(1)
+        raise BinwalkNotInstalledError("未找到 binwalk，请确保 binwalk 已正确安装。")
     else:
-        print("binwalk 已正确安装。")
+        logger.info("binwalk 已正确安装。")
+
+def get_default_output_dir(file_path):
+    """
+    默认的输出目录：vxfile_ + 固件文件名（去掉扩展名）
+    """
+    return "vxfile_" + os.path.basename(file_path).split('.')[0]
 
-def run_binwalk_extract(file_path):
+def run_binwalk_extract(file_path, output_dir=None, timeout=None):
+    """
+    run_binwalk_extract_async 的同步版本
+    """
+    return asyncio.run(run_binwalk_extract_async(file_path, output_dir, timeout))
+
+async def run_binwalk_extract_async(file_path, output_dir=None, timeout=None):
     """
     执行 binwalk -Me 命令将解压内容存入指定目录，并检查文件是否为未加密镜像。
     同时确认是否为标准的 vxworks5 镜像。
     参数:
     file_path: vxworks固件文件路径
+    output_dir: 输出目录，默认为 vxfile_ + 固件文件名
+    timeout: 每条 binwalk 命令的超时秒数，None 为不限
     """
-    output_dir = "vxfile_" + os.path.basename(file_path).split('.')[0]
+    output_dir = output_dir or get_default_output_dir(file_path)
+    extracted_subdir = os.path.join(output_dir, f"_{os.path.basename(file_path)}.extracted")
     
-    # 判断输出目录是否已经存在，防止重复解包
-    if os.path.exists(output_dir):
-        print(f"输出目录 {output_dir} 已存在，跳过解包。")
-        extracted_subdir = os.path.join(output_dir, f"_{os.path.basename(file_path)}.extracted")
-        if os.path.exists(extracted_subdir):
-            output_dir = extracted_subdir
-        print(f"使用已有解压目录：{output_dir}")
+    # 判断解压目录是否已经存在，防止重复解包（输出目录中可能已经有分阶段清单等其他文件，不能以它为准）
+    if os.path.exists(extracted_subdir):
+        logger.info(f"输出目录 {output_dir} 已存在，跳过解包。")
+        output_dir = extracted_subdir
+        logger.info(f"使用已有解压目录：{output_dir}")
     else:
         # 输出目录不存在时，执行解包
-        print("开始解包文件，并检查文件格式和加密状态...可能长达一分钟没有回显，请稍候...")
+        logger.info("开始解包文件，并检查文件格式和加密状态...可能长达一分钟没有回显，请稍候...")
         command = ['binwalk', '-Me', '-C', output_dir, file_path]
-        print(f"执行命令: {' '.join(command)}")
+        logger.debug(f"执行命令: {' '.join(command)}")
         
         try:
-            # 获取 subprocess 参数
-            subprocess_params = get_subprocess_params()
-            
-            result = subprocess.run(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True,
-                **subprocess_params
-            )
+            result = await run_subprocess_async(command, timeout, check=True)
             
             output = result.stdout
-            print(f"binwalk 解包输出:\n{output}")
+            logger.debug(f"binwalk 解包输出:\n{output}")
             
             extracted_subdir = os.path.join(output_dir, f"_{os.path.basename(file_path)}.extracted")
             if os.path.exists(extracted_subdir):
                 output_dir = extracted_subdir
             
         except subprocess.CalledProcessError as e:
-            print(f"解包失败了，错误信息如下：")
-            print(f"stdout: {e.stdout}")
-            print(f"stderr: {e.stderr}")
-            print("binwalk 可能没有正确完整安装")
-            sys.exit(1)
+            logger.error(f"解包失败了，错误信息如下：")
+            logger.error(f"stdout: {e.stdout}")
+            logger.error(f"stderr: {e.stderr}")
+            raise ExtractionFailedError(f"binwalk 解包失败（退出码 {e.returncode}），binwalk 可能没有正确完整安装") from e
+        except subprocess.TimeoutExpired as e:
+            raise ExtractionFailedError(f"binwalk 解包超过 {timeout} 秒没有结束，已终止") from e
 
     # 直接执行 binwalk 命令以获取文件信息
     command = ['binwalk', file_path]
-    print(f"执行命令: {' '.join(command)}")
+    logger.debug(f"执行命令: {' '.join(command)}")
 
     try:
-        # 获取 subprocess 参数
-        subprocess_params = get_subprocess_params()
-        
-        result = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True,
-            **subprocess_params
-        )
+        result = await run_subprocess_async(command, timeout, check=True)
         
-        output = result.stdout if isinstance(result.stdout, str) else result.stdout.decode('utf-8')
-        print(f"binwalk 分析输出:\n{output}")
+        output = result.stdout
+        logger.debug(f"binwalk 分析输出:\n{output}")
         
         # 检查端序
         endian = "big" if "big endian" in output.lower() else "little" if "little endian" in output.lower() else "unknown"
-        print(f"检测到的端序：{endian}")
+        logger.info(f"检测到的端序：{endian}")
         if endian == "unknown":
-            print(f"注意！未检测到端序字样，假定为Vxworks更一般的big")
+            logger.warning(f"注意！未检测到端序字样，假定为Vxworks更一般的big")
             endian = "big" 
 
         # 输出的三个参数
         return output, output_dir, endian
 
     except subprocess.CalledProcessError as e:
-        print(f"分析失败了，错误信息如下：")
-        print(f"stdout: {e.stdout}")
-        print(f"stderr: {e.stderr}")
-        print("binwalk 可能没有正确安装或者发生了其他错误。请访问下列网址获取安装教程：")
-        sys.exit(1)
+        logger.error(f"分析失败了，错误信息如下：")
+        logger.error(f"stdout: {e.stdout}")
+        logger.error(f"stderr: {e.stderr}")
+        raise ExtractionFailedError(f"binwalk 分析失败（退出码 {e.returncode}），binwalk 可能没有正确安装或者发生了其他错误") from e
+    except subprocess.TimeoutExpired as e:
+        raise ExtractionFailedError(f"binwalk 分析超过 {timeout} 秒没有结束，已终止") from e
+
+
+# 解包后端：内置 LZMA 解包(native) 或 binwalk -Me
+EXTRACTORS = ("native", "binwalk")
+# 输出目录中记录来源固件内容哈希的标记文件
+OUTPUT_SOURCE_MARKER = ".vxfile_source"
+# 解包结果缓存：默认位置、默认容量上限、缓存格式版本
+DEFAULT_CACHE_DIR = os.environ.get("VXFILE_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "vxfile_extractor")
+DEFAULT_CACHE_SIZE = 10 * 1024 ** 3
+CACHE_FORMAT_VERSION = 1
+HASH_CHUNK_SIZE = 0x100000
 
+def hash_file(file_path):
+    """
+    计算文件内容的 sha256，分块处理；传入 FirmwareImage 时直接在共享映射上计算，结果缓存
+    """
+    def compute(data):
+        digest = hashlib.sha256()
+        with memoryview(data) as view:
+            for start in range(0, len(view), HASH_CHUNK_SIZE):
+                digest.update(view[start:start + HASH_CHUNK_SIZE])
+        return digest.hexdigest()
+
+    with open_firmware_image(file_path) as image:
+        return image.get_index('sha256', compute)
+
+def resolve_output_dir(file_path, content_hash):
+    """
+    确定输出目录。默认目录已被另一个内容不同的同名固件占用时，
+    改用带内容哈希前缀的目录，避免两个不同的 firmware.bin 互相覆盖
+    """
+    output_dir = get_default_output_dir(file_path)
+    marker_path = os.path.join(output_dir, OUTPUT_SOURCE_MARKER)
+    if os.path.isfile(marker_path):
+        with open(marker_path, encoding='utf-8') as f:
+            if f.read().strip() != content_hash:
+                output_dir = f"{output_dir}_{content_hash[:8]}"
+                logger.warning(f"输出目录已被另一个同名但内容不同的固件占用，改用 {output_dir}")
+    return output_dir
+
+def write_output_marker(output_dir, content_hash):
+    """
+    在输出目录中记录来源固件的内容哈希
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, OUTPUT_SOURCE_MARKER), 'w', encoding='utf-8') as f:
+        f.write(content_hash + "\n")
+
+def list_tree_files(root_dir):
+    """
+    列出目录下所有普通文件，返回 {相对路径: os.stat_result}
+    """
+    files = {}
+    for root, _, names in os.walk(root_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.isfile(path) and not os.path.islink(path):
+                files[os.path.relpath(path, root_dir)] = os.stat(path)
+    return files
+
+class ExtractionCache:
+    """
+    以固件内容哈希（加解包后端）为键的持久化解包缓存。
+    每个缓存项是缓存目录下的一个子目录，包含 meta.json（端序、文件清单及其大小和修改时间）、
+    scan.txt（扫描输出）和 tree/（解包结果）。命中时先校验清单再以硬链接恢复到输出目录，
+    并跳过解包和签名扫描；总大小超过上限时按最近使用时间淘汰。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_dir(self, content_hash, extractor):
+        return os.path.join(self.cache_dir, f"{content_hash}-{extractor}")
+
+    def load(self, content_hash, extractor):
+        """
+        读取并校验缓存项，返回元数据字典；未命中或校验失败时返回 None（校验失败的缓存项会被删除）
+        """
+        entry_dir = self.entry_dir(content_hash, extractor)
+        meta_path = os.path.join(entry_dir, "meta.json")
+        if not os.path.isfile(meta_path):
+            return None
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(os.path.join(entry_dir, "scan.txt"), encoding='utf-8') as f:
+                meta['scan_output'] = f.read()
+            if meta.get('version') != CACHE_FORMAT_VERSION or meta.get('key') != content_hash:
+                raise ValueError("缓存格式或键不匹配")
+            if hashlib.sha256(meta['scan_output'].encode('utf-8')).hexdigest() != meta['scan_sha256']:
+                raise ValueError("扫描输出已损坏")
+            tree_dir = os.path.join(entry_dir, "tree")
+            files = list_tree_files(tree_dir)
+            if set(files) != set(meta['files']):
+                raise ValueError("文件清单不一致")
+            for relative_path, (size, mtime_ns) in meta['files'].items():
+                stat = files[relative_path]
+                if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+                    raise ValueError(f"文件 {relative_path} 已被修改")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"缓存项 {entry_dir} 校验失败（{e}），将重新解包")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+        # 更新最近使用时间，供 LRU 淘汰使用
+        os.utime(meta_path)
+        meta['tree_dir'] = tree_dir
+        return meta
+
+    def restore(self, meta, extracted_dir):
+        """
+        将缓存的解包结果以硬链接（跨文件系统时退回复制）恢复到 extracted_dir
+        """
+        os.makedirs(extracted_dir, exist_ok=True)
+        for relative_path in meta['files']:
+            target_path = os.path.join(extracted_dir, relative_path)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            materialize_file(os.path.join(meta['tree_dir'], relative_path), target_path, "hardlink")
+
+    def store(self, content_hash, extractor, scan_output, endian, extracted_dir, extracted_relative_dir):
+        """
+        将解包结果存入缓存：先在临时目录中建好再原子地重命名，并发写入同一项时只保留先完成的那个
+        """
+        entry_dir = self.entry_dir(content_hash, extractor)
+        if os.path.exists(entry_dir):
+            return
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=self.cache_dir)
+        try:
+            tree_dir = os.path.join(tmp_dir, "tree")
+            os.makedirs(tree_dir)
+            for relative_path in list_tree_files(extracted_dir):
+                target_path = os.path.join(tree_dir, relative_path)
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                materialize_file(os.path.join(extracted_dir, relative_path), target_path, "hardlink")
+            files = list_tree_files(tree_dir)
+            with open(os.path.join(tmp_dir, "scan.txt"), 'w', encoding='utf-8') as f:
+                f.write(scan_output)
+            meta = {
+                'version': CACHE_FORMAT_VERSION,
+                'key': content_hash,
+                'extractor': extractor,
+                'endian': endian,
+                'extracted_relative_dir': extracted_relative_dir,
+                'scan_sha256': hashlib.sha256(scan_output.encode('utf-8')).hexdigest(),
+                'files': {relative_path: [stat.st_size, stat.st_mtime_ns] for relative_path, stat in files.items()},
+                'total_size': sum(stat.st_size for stat in files.values()),
+                'created': time.time(),
+            }
+            with open(os.path.join(tmp_dir, "meta.json"), 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.rename(tmp_dir, entry_dir)
+            logger.info(f"解包结果已存入缓存：{entry_dir}")
+        except OSError as e:
+            logger.warning(f"写入缓存失败：{e}")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """
+        缓存总大小超过上限时，按最近使用时间从旧到新删除缓存项
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            meta_path = os.path.join(self.cache_dir, name, "meta.json")
+            try:
+                with open(meta_path, encoding='utf-8') as f:
+                    total_size = json.load(f).get('total_size', 0)
+                entries.append((os.path.getmtime(meta_path), total_size, os.path.join(self.cache_dir, name)))
+            except (OSError, ValueError):
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_size:
+                break
+            logger.info(f"缓存超过容量上限，淘汰最久未使用的缓存项 {entry_dir}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+# 输出目录中的分阶段清单：文件名与格式版本
+STAGE_MANIFEST_NAME = "vxfile_stages.json"
+STAGE_MANIFEST_VERSION = 1
+_tool_fingerprint = None
+
+def get_tool_fingerprint():
+    """
+    本工具源码的 sha256（缓存），工具升级后所有阶段的输入指纹随之改变
+    """
+    global _tool_fingerprint
+    if _tool_fingerprint is None:
+        _tool_fingerprint = hash_file(os.path.abspath(__file__))
+    return _tool_fingerprint
+
+def get_tree_fingerprint(root_dir):
+    """
+    目录下所有文件的 相对路径+大小+修改时间 的摘要，用来判断解压目录是否完整、是否被改动过
+    """
+    digest = hashlib.sha256()
+    files = list_tree_files(root_dir)
+    for relative_path in sorted(files):
+        stat = files[relative_path]
+        digest.update(f"{relative_path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8', 'surrogateescape'))
+    return digest.hexdigest()
+
+class StageManifest:
+    """
+    输出目录中的分阶段清单（vxfile_stages.json），支持增量重跑。
+    每个阶段记录其输入指纹（工具版本、相关选项、上游阶段的指纹）和输出；再次运行时，
+    输入指纹没有变化且输出仍然有效的阶段直接沿用上次的输出，只重新执行输入变化了的阶段及其下游。
+    阶段开始时先记为 running，完成后才记为 done，因此能识别出上次中途被打断的阶段。
+    enabled 为 False 时每个阶段都重新执行，也不读写清单。
+    """
+
+    def __init__(self, path, enabled=True, on_reuse=None):
+        self.path = path
+        self.enabled = enabled
+        self.on_reuse = on_reuse
+        self.stages = {}
+        if enabled and os.path.isfile(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('version') == STAGE_MANIFEST_VERSION:
+                    self.stages = manifest.get('stages', {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"分阶段清单 {path} 无法读取（{e}），所有阶段将重新执行")
+
+    @staticmethod
+    def key(name, *inputs):
+        """
+        由阶段名、工具版本和各项输入算出阶段的输入指纹
+        """
+        payload = json.dumps([STAGE_MANIFEST_VERSION, get_tool_fingerprint(), name, inputs], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def status(self, name):
+        return self.stages.get(name, {}).get('status')
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': STAGE_MANIFEST_VERSION, 'stages': self.stages}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def run(self, name, key, compute, verify=None):
+        """
+        执行一个阶段：清单中有相同输入指纹的完成记录、且 verify(上次输出) 为真时直接返回上次的输出，
+        否则调用 compute() 并记录其输出（须可写成 JSON）。compute 抛出异常时该阶段保持 running 状态
+        """
+        if not self.enabled:
+            return compute()
+        outputs = self.reuse(name, key, verify)
+        if outputs is not None:
+            return outputs
+        self.mark_running(name, key)
+        outputs = compute()
+        self.mark_done(name, key, outputs)
+        return outputs
+
+    async def run_async(self, name, key, compute, verify=None):
+        """
+        run() 的异步版本，compute() 返回可等待对象（协程，或 run_in_thread 的结果）。
+        并发调度的各阶段都在同一个事件循环中读写清单，不会交错
+        """
+        if not self.enabled:
+            return await compute()
+        outputs = self.reuse(name, key, verify)
+        if outputs is not None:
+            return outputs
+        self.mark_running(name, key)
+        outputs = await compute()
+        self.mark_done(name, key, outputs)
+        return outputs
+
+    def reuse(self, name, key, verify=None):
+        """
+        清单中有相同输入指纹的完成记录、且 verify(上次输出) 为真时返回上次的输出，否则返回 None
+        """
+        record = self.stages.get(name)
+        if record and record.get('status') == 'done' and record.get('key') == key:
+            outputs = record['outputs']
+            if verify is None or verify(outputs):
+                logger.info(f"阶段 {name} 的输入没有变化，沿用上次的结果")
+                if self.on_reuse:
+                    self.on_reuse(name)
+                return outputs
+            logger.warning(f"阶段 {name} 上次的输出已不完整，重新执行")
+        return None
+
+    def mark_running(self, name, key):
+        self.stages[name] = {'key': key, 'status': 'running', 'started': time.time()}
+        self.save()
 
-def extract_web_source_filenames(target_directory):
+    def mark_done(self, name, key, outputs):
+        self.stages[name] = {'key': key, 'status': 'done', 'finished': time.time(), 'outputs': outputs}
+        self.save()
+
+def run_firmware_extract(file_path, extractor="native", workers=None, cache_dir=DEFAULT_CACHE_DIR, cache_size=DEFAULT_CACHE_SIZE, output_dir=None, timeout=None):
+    """
+    run_firmware_extract_async 的同步版本
+    """
+    return asyncio.run(run_firmware_extract_async(file_path, extractor, workers, cache_dir, cache_size, output_dir, timeout))
+
+async def run_firmware_extract_async(file_path, extractor="native", workers=None, cache_dir=DEFAULT_CACHE_DIR, cache_size=DEFAULT_CACHE_SIZE, output_dir=None, timeout=None):
+    """
+    按所选后端解包固件，返回 (扫描输出, 解压目录, 端序)。
+    native 后端没有找到任何 LZMA 数据流时，如果装有 binwalk 则自动改用 binwalk。
+    cache_dir 不为空时使用以固件内容哈希为键的解包缓存：命中时直接恢复解包结果和扫描输出，
+    既不解包也不再做签名扫描。
+    内置解包和缓存恢复在线程中执行，binwalk 以异步子进程执行（timeout 为每条命令的超时秒数）
+    """
+    if extractor not in EXTRACTORS:
+        raise ValueError(f"未知的解包后端: {extractor}，可选: {', '.join(EXTRACTORS)}")
+    content_hash = hash_file(file_path)
+    output_dir = output_dir or resolve_output_dir(get_image_path(file_path), content_hash)
+    cache = ExtractionCache(cache_dir, cache_size) if cache_dir else None
+
+    if cache:
+        meta = cache.load(content_hash, extractor)
+        if meta:
+            extracted_dir = os.path.join(output_dir, meta['extracted_relative_dir'])
+            logger.info(f"命中解包缓存（sha256: {content_hash}），直接使用缓存的解包结果")
+            await run_in_thread(cache.restore, meta, extracted_dir)
+            write_output_marker(output_dir, content_hash)
+            return meta['scan_output'], os.path.normpath(extracted_dir), meta['endian']
+
+    result = None
+    if extractor == "native":
+        output, extracted_dir, endian, stream_count = await run_in_thread(run_native_extract, file_path, workers, output_dir)
+        if stream_count or not shutil.which("binwalk"):
+            result = output, extracted_dir, endian
+        else:
+            logger.warning("内置后端没有找到 LZMA 数据流，改用 binwalk 解包")
+    if result is None:
+        check_binwalk_installed()
+        result = await run_binwalk_extract_async(get_image_path(file_path), output_dir, timeout)
+
+    output, extracted_dir, endian = result
+    write_output_marker(output_dir, content_hash)
+    if cache:
+        await run_in_thread(cache.store, content_hash, extractor, output, endian, extracted_dir, os.path.relpath(extracted_dir, output_dir))
+    return result
+
+def extract_web_source_filenames(target_directory, timeout=None):
+    """
+    extract_web_source_filenames_async 的同步版本
+    """
+    return asyncio.run(extract_web_source_filenames_async(target_directory, timeout))
+
+async def extract_web_source_filenames_async(target_directory, timeout=None):
     """
     对于有页面的固件,提取那些100%正确的文件名以判断文件偏移表所在
     参数: 
     target_directory: 解压目录
+    timeout: grep 的超时秒数，None 为不限
     """
     if not os.path.isdir(target_directory):
-        raise ValueError(f"解压目录不存在: {target_directory}")
+        raise ExtractionFailedError(f"解压目录不存在: {target_directory}")
     
     # 执行 shell 指令并获取输出，指定目标目录
-    command = f"grep -r \"src=\" {target_directory} | grep -E \"\.(gif|jpg|js|css)\""
+    command = rf'grep -r "src=" {shlex.quote(target_directory)} | grep -E "\.(gif|jpg|js|css)"'
     try:
-        subprocess_params = get_subprocess_params()
-        result = subprocess.run(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, **subprocess_params)
+        result = await run_subprocess_async(command, timeout, shell=True, check=True)
     except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"命令执行失败: {e}")
+        # grep 没有匹配到任何内容时退出码为 1，说明没有web资源文件名，交给后面的模糊搜索
+        if e.returncode == 1:
+            return False
+        raise VxfileError(f"命令执行失败: {e}")
+    except subprocess.TimeoutExpired as e:
+        raise VxfileError(f"命令执行超时: {e}")
     
     shell_output = result.stdout
 
@@ -170,110 +951,168 @@ def calculate_compactness(offsets):
     
     return compactness
 
-def fuzzy_search_file_contain_table(directory_path):
+def get_worker_count(workers=None):
     """
-    遍历目录中的文件，基于 MIME 类型筛选，排除特定类型文件，筛选后文件运行 strings 命令，
-    按行数统计匹配结果并计算紧凑程度，根据 "匹配行数*10 / 紧凑程度" 比值进行排序。
-    
-    :param directory_path: 目标目录路径
-    :return: 排序后的字典，键为路径，值为匹配行数与紧凑+整齐程度比值
+    获取进程池/线程池的工作者数量，未指定时使用 CPU 核数
     """
-    result = {}
-    
-    # 排除的 MIME 类型
-    excluded_mime_types = {
-        "inode/directory",
-        "text/html",
-        "application/xml",
-        "application/json",
-        "text/css",
-    }
+    if workers:
+        return max(1, int(workers))
+    return os.cpu_count() or 1
 
+def map_in_process_pool(func, items, workers=None, chunksize=1):
+    """
+    在进程池上按顺序执行 func(item)，返回与 items 顺序一致的结果列表。
+    任务很少、只有一个工作者或当前环境无法创建进程池时退化为串行执行。
+    """
+    items = list(items)
+    workers = min(get_worker_count(workers), len(items))
+    if workers <= 1:
+        return [func(item) for item in items]
     try:
-        # 获取目录中的文件列表
-        files = os.listdir(directory_path)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            SPAWN_COUNTS['pool_workers'] += workers
+            return list(executor.map(func, items, chunksize=chunksize))
+    except (OSError, NotImplementedError, BrokenProcessPool) as e:
+        logger.warning(f"无法使用进程池（{e}），改为串行处理")
+        return [func(item) for item in items]
 
-        for file in files:
-            file_path = os.path.join(directory_path, file)
+# fuzzy 模式下排除的 MIME 类型
+FUZZY_EXCLUDED_MIME_TYPES = {
+    "inode/directory",
+    "text/html",
+    "application/xml",
+    "application/json",
+    "text/css",
+}
+# 匹配行数少于该值的文件不参与 fuzzy 排序
+FUZZY_MIN_MATCH_COUNT = 5
+MIME_SNIFF_LENGTH = 0x1000
+HTML_MAGIC_PATTERN = re.compile(
+    rb'<(?:!doctype\s+html|html|head|title|body|script|iframe|table|frameset|h1|div|font|p|style|a\s|!--)[\s>]',
+    re.IGNORECASE
+)
+CSS_MAGIC_PATTERN = re.compile(rb'^\s*(?:@(?:charset|import|media|font-face)\b|[\w\-.#*:,\s\[\]="]+\{[^{}]*:[^{}]*\})')
 
-            if os.path.isfile(file_path):
-                try:
-                    # 使用 file 命令获取 MIME 类型
-                    mime_command = f"file --mime-type \"{file_path}\""
-                    mime_process = subprocess.run(
-                        mime_command,
-                        shell=True,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        universal_newlines=True
-                    )
-                    if mime_process.returncode == 0:
-                        mime_type = mime_process.stdout.split(":")[1].strip()
-                        if mime_type in excluded_mime_types:
-                            #print(f"跳过文件（MIME 类型排除）：{file_path} [{mime_type}]")
-                            continue
-                    else:
-                        #print(f"无法获取 MIME 类型，跳过文件：{file_path}")
-                        continue
+def sniff_mime_type(file_path):
+    """
+    进程内根据文件头部的魔数/文本特征粗略判断 MIME 类型，替代 `file --mime-type`。
+    只需要区分 fuzzy 模式会排除的几种文本类型，其余一律视为 application/octet-stream。
+    """
+    if os.path.isdir(file_path):
+        return "inode/directory"
+    with open(file_path, 'rb') as f:
+        head = f.read(MIME_SNIFF_LENGTH)
+    # 含有 00 字节的一律视作二进制文件
+    if b'\x00' in head:
+        return "application/octet-stream"
+    text = head.lstrip(b'\xef\xbb\xbf').lstrip()
+    if text.startswith(b'<?xml'):
+        return "application/xml"
+    if HTML_MAGIC_PATTERN.match(text):
+        return "text/html"
+    if text[:1] in (b'{', b'['):
+        try:
+            with open(file_path, 'rb') as f:
+                json.loads(f.read().decode('utf-8'))
+            return "application/json"
+        except (ValueError, UnicodeDecodeError):
+            pass
+    if CSS_MAGIC_PATTERN.match(text):
+        return "text/css"
+    return "application/octet-stream"
 
-                    # 执行 strings 命令并计算匹配行数
-                    strings_command = f"strings -t x -n 5 {file_path} | grep -E '\\.jpg|\\.png|\\.js|\\.cer|\\.pem|\\.bin'"
-                    process = subprocess.run(
-                        strings_command,
-                        shell=True,
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        universal_newlines=True
-                    )
-
-                    matching_lines = process.stdout.strip().split("\n")
-                    match_count = len(matching_lines) if matching_lines[0] else 0
-
-                    # 获取偏移量并计算紧凑程度
-                    offsets = [int(re.match(r"^\s*([0-9a-fA-F]+)", line).group(1), 16) for line in matching_lines if re.match(r"^\s*([0-9a-fA-F]+)", line)]
-                    compactness = calculate_compactness(offsets)
-
-                    if compactness > 0:
-                        # 计算匹配次数与紧凑程度的比值
-                        # 使用*1000加权来抹平量级差距，下同
-                        ratio = match_count*0x1000 / compactness
-                    else:
-                        ratio = match_count*0x1000  # 如果紧凑+整齐程度为0，直接使用匹配次数作为比值
+def count_pattern_hits(data, pattern, limit):
+    """
+    统计 pattern 在 data 中的出现次数，数到 limit 即停止
+    """
+    hits = pattern.finditer(data)
+    count = sum(1 for _ in islice(hits, limit))
+    # 及时释放迭代器，否则其持有的 buffer 会导致 mmap 无法关闭
+    del hits
+    return count
 
-                    # 记录结果（包括路径、匹配次数、紧凑+整齐程度、比值）
-                    result[file_path] = (match_count, compactness, ratio)
+def score_fuzzy_candidate(file_path):
+    """
+    fuzzy 模式下对单个文件打分，供进程池调用。
+    返回 (文件路径, (匹配行数, 紧凑+整齐程度, 比值)) ；被排除或不可能入选的文件返回 (文件路径, None)；
+    出错时返回 (文件路径, 错误信息字符串)。
+    """
+    try:
+        # 使用魔数判断 MIME 类型
+        if sniff_mime_type(file_path) in FUZZY_EXCLUDED_MIME_TYPES:
+            return file_path, None
 
-                except Exception as e:
-                    print(f"处理文件 {file_path} 时出错：{e}")
+        with open(file_path, 'rb') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            # 太小的文件不可能容纳足够多的匹配串，直接淘汰
+            if file_size < FUZZY_MIN_MATCH_COUNT * MIN_STRING_LENGTH:
+                return file_path, None
+            # 扩展名本身出现次数都不够的文件，匹配行数不可能达到下限，也直接淘汰
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                extension_hits = count_pattern_hits(mm, get_extension_pattern(FUZZY_FILE_EXTENSIONS), FUZZY_MIN_MATCH_COUNT)
+            if extension_hits < FUZZY_MIN_MATCH_COUNT:
+                return file_path, None
 
-            elif os.path.isdir(file_path):  # 跳过文件夹
-                #print(f"跳过文件夹：{file_path}")
-                continue
-            else:
-                #print(f"跳过无效文件：{file_path}")
-                continue
+        # 进程内扫描可打印字符串并计算匹配行数
+        records = scan_file_strings(file_path, extensions=FUZZY_FILE_EXTENSIONS)
+        match_count = len(records)
+
+        # 获取偏移量并计算紧凑程度
+        compactness = calculate_compactness([offset for offset, _ in records])
+
+        if compactness > 0:
+            # 计算匹配次数与紧凑程度的比值
+            # 使用*1000加权来抹平量级差距，下同
+            ratio = match_count*0x1000 / compactness
+        else:
+            ratio = match_count*0x1000  # 如果紧凑+整齐程度为0，直接使用匹配次数作为比值
+
+        return file_path, (match_count, compactness, ratio)
+    except Exception as e:
+        return file_path, str(e)
+
+def fuzzy_search_file_contain_table(directory_path, workers=None):
+    """
+    遍历目录中的文件，基于魔数判断的 MIME 类型筛选，排除特定类型文件，筛选后文件扫描可打印字符串，
+    按行数统计匹配结果并计算紧凑程度，根据 "匹配行数*10 / 紧凑程度" 比值进行排序。
+    各文件的打分在进程池上并行完成。
+    
+    :param directory_path: 目标目录路径
+    :param workers: 进程池大小，默认为 CPU 核数
+    :return: 排序后的字典，键为路径，值为匹配行数与紧凑+整齐程度比值
+    """
+    result = {}
+
+    try:
+        # 获取目录中的文件列表，跳过文件夹和无效文件
+        files = [os.path.join(directory_path, file) for file in os.listdir(directory_path)]
+        files = [file_path for file_path in files if os.path.isfile(file_path)]
 
-        # 计算最大匹配行数
-        max_match_count = max([result[file_path][0] for file_path in result]) if result else 0
+        for file_path, values in map_in_process_pool(score_fuzzy_candidate, files, workers, chunksize=8):
+            if isinstance(values, str):
+                logger.error(f"处理文件 {file_path} 时出错：{values}")
+            elif values is not None:
+                # 记录结果（包括路径、匹配次数、紧凑+整齐程度、比值）
+                result[file_path] = values
 
         # 只选择匹配行数大于5 的文件
-        result = {file_path: values for file_path, values in result.items() if values[0] >= 5}
+        result = {file_path: values for file_path, values in result.items() if values[0] >= FUZZY_MIN_MATCH_COUNT}
 
         # 按照比值排序（从高到低），并在比值相同的情况下按文件名长度升序排列
         sorted_result = dict(sorted(result.items(), key=lambda item: (item[1][2], -len(item[0])), reverse=True))
 
         # 输出排序后的前几个文件
-        print("根据匹配行数 / 紧凑程度的比值排序后的结果：")
+        logger.info("根据匹配行数 / 紧凑程度的比值排序后的结果：")
         for file_path, (count, compactness, ratio) in sorted_result.items():
-            print(f"{file_path} - 匹配行数: {count}, 紧凑+整齐程度: {compactness}, 比值: {ratio:.4f}")
+            logger.debug(f"{file_path} - 匹配行数: {count}, 紧凑+整齐程度: {compactness}, 比值: {ratio:.4f}")
 
         # 获取并返回排序后的第一个文件
         best_match_file = list(sorted_result.items())[0]  # 获取排序后的第一个文件
-        print(f"最优匹配文件: {best_match_file[0]}")
+        logger.info(f"最优匹配文件: {best_match_file[0]}")
         return best_match_file[0]
 
     except Exception as e:
-        print(f"处理目录时出错：{e}")
+        logger.error(f"处理目录时出错：{e}")
         return {}
 
 
@@ -283,363 +1122,983 @@ def get_file_size(file_path):
     """
     try:
         if not os.path.exists(file_path):  # 检查文件是否存在
-            print(f"文件不存在: {file_path}")
+            logger.error(f"文件不存在: {file_path}")
             return -1
         return os.path.getsize(file_path)  # 获取文件大小
     except FileNotFoundError:
-        print(f"无法找到文件: {file_path}")
+        logger.error(f"无法找到文件: {file_path}")
         return -1  # 文件不存在时返回 -1
     except Exception as e:
-        print(f"获取文件大小时出错: {file_path}, 错误: {e}")
+        logger.error(f"获取文件大小时出错: {file_path}, 错误: {e}")
         return -1
 
-def find_binary_matches(target_directory, filenames):
+def build_trie_regex(names):
     """
-    包含http服务固件的特有方案，其使用web静态资源引用的文件名来对包含文件偏移表的可能文件进行查找
+    按文件名构建前缀树(trie)，再把前缀树展开成正则，在每个位置上只需沿着树向下比较，
+    效果上等价于 Aho-Corasick 自动机的单遍扫描。同一位置正则只给出最长的那个匹配。
     """
-    matching_files = None
-    print(f"开始查找目标目录 {target_directory} 中的二进制文件...")
+    trie = {}
+    for name in names:
+        node = trie
+        for byte in name:
+            node = node.setdefault(byte, {})
+        node[None] = name
 
-    for filename in filenames:
-        #print(f"\n正在查找文件名: {filename}")
-        
-        # 执行 grep 查找包含文件名的二进制文件
-        command = f"grep -r {filename} {target_directory} | grep Binary"
-        #print(f"执行命令: {command}")
-        
-        try:
-            subprocess_params = get_subprocess_params()
-            result = subprocess.run(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, **subprocess_params)
-            #print("命令执行成功，开始处理输出...")
-        except subprocess.CalledProcessError:
-            #print(f"没有找到匹配的文件，跳过文件: {filename}")
-            continue
-        
-        # 检查 stdout 是否为字节类型，若是则解码为字符串
-        if isinstance(result.stdout, bytes):
-            #print("输出为字节类型，正在解码...")
-            shell_output = result.stdout.decode('utf-8')  # 需要解码
+    def trie_to_regex(node):
+        children = sorted((byte, child) for byte, child in node.items() if byte is not None)
+        alternatives = [re.escape(bytes([byte])) + trie_to_regex(child) for byte, child in children]
+        if not alternatives:
+            return b''
+        body = alternatives[0] if len(alternatives) == 1 else b'(?:' + b'|'.join(alternatives) + b')'
+        # 当前节点本身就是一个完整文件名时，后续部分可选（贪婪，优先匹配更长的文件名）
+        if None in node:
+            return b'(?:' + body + b')?'
+        return body
+
+    return re.compile(trie_to_regex(trie))
+
+def get_prefix_closure(items):
+    """
+    记录每一项自身及其所有同在集合内的前缀，用于补全正则在同一位置只给出最长匹配的情况
+    """
+    item_set = set(items)
+    return {item: [item[:length] for length in range(1, len(item) + 1) if item[:length] in item_set] for item in items}
+
+def build_name_matcher(names):
+    """
+    将一组文件名编译为多模式匹配器。
+    带扩展名的文件名以 ".扩展名" 作为锚点：先用一个正则快速找出所有锚点，
+    再在锚点前按可能的文件名长度查表确认，二进制数据里锚点极少，几乎是线性扫描的速度；
+    没有扩展名的文件名则退回前缀树正则。
+    """
+    names = sorted({name.encode('utf-8') if isinstance(name, str) else name for name in names})
+    anchored = defaultdict(set)
+    plain_names = []
+    for name in names:
+        dot = name.rfind(b'.')
+        if dot == -1:
+            plain_names.append(name)
         else:
-            #print("输出已经是字符串类型，无需解码。")
-            shell_output = result.stdout  # 已经是字符串类型，无需解码
+            anchored[name[dot:]].add(dot)
 
-        # 输出命令结果
-        #print(f"命令输出:\n{shell_output}")
-        
-        # 提取匹配到的文件
-        pattern = r'Binary file ([^\s]+) matches'
-        matches = re.findall(pattern, shell_output)
-        #print(f"匹配到的文件: {matches}")
-        
-        # 如果没有匹配到任何文件，继续下一次循环
-        if not matches:
-            print(f"没有匹配到任何二进制文件，继续查找下一个文件名。")
+    anchors = sorted(anchored, key=len, reverse=True)
+    anchor_pattern = re.compile(b'|'.join(re.escape(anchor) for anchor in anchors)) if anchors else None
+    # 每个锚点对应 [(其自身或同为锚点的前缀, 可能的前缀长度列表), ...]
+    anchor_table = {
+        anchor: [(prefix, sorted(anchored[prefix])) for prefix in closure]
+        for anchor, closure in get_prefix_closure(anchors).items()
+    }
+    plain_pattern = build_trie_regex(plain_names) if plain_names else None
+    return {
+        'names': set(names),
+        'anchor_pattern': anchor_pattern,
+        'anchor_table': anchor_table,
+        'plain_pattern': plain_pattern,
+        'plain_closure': get_prefix_closure(plain_names),
+    }
+
+_name_matchers = {}
+
+def get_name_matcher(names):
+    """
+    获取（并缓存）names 对应的多模式匹配器，进程池中的每个工作进程只需编译一次
+    """
+    names = tuple(names)
+    matcher = _name_matchers.get(names)
+    if matcher is None:
+        matcher = build_name_matcher(names)
+        _name_matchers[names] = matcher
+    return matcher
+
+def match_names(matcher, data):
+    """
+    在 data 中单遍查找 matcher 里的所有文件名（包括相互重叠的情况），返回出现过的文件名集合
+    """
+    found = set()
+    names = matcher['names']
+    if matcher['anchor_pattern'] is not None:
+        for anchor_match in matcher['anchor_pattern'].finditer(data):
+            dot = anchor_match.start()
+            for anchor, prefix_lengths in matcher['anchor_table'][anchor_match.group()]:
+                for length in prefix_lengths:
+                    if length > dot:
+                        break
+                    candidate = data[dot - length:dot + len(anchor)]
+                    if candidate in names:
+                        found.add(candidate)
+    plain_pattern = matcher['plain_pattern']
+    if plain_pattern is not None:
+        position = 0
+        while True:
+            match = plain_pattern.search(data, position)
+            if match is None:
+                break
+            if match.end() > match.start():
+                found.update(matcher['plain_closure'][match.group()])
+            # 从下一个字节继续，保证相互重叠的文件名也能被找到
+            position = match.start() + 1
+    return found
+
+def find_names_in_file(names, file_path):
+    """
+    单遍扫描文件，返回 (文件路径, 是否为二进制文件, 文件中出现过的文件名列表)，供进程池调用。
+    与 grep 一致，含有 00 字节的文件被视为二进制文件。
+    """
+    matcher = get_name_matcher(names)
+    try:
+        with open(file_path, 'rb') as f:
+            if not names or os.fstat(f.fileno()).st_size == 0:
+                return file_path, False, []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                is_binary = mm.find(b'\x00') != -1
+                found = match_names(matcher, mm)
+    except OSError:
+        return file_path, False, []
+    return file_path, is_binary, [name.decode('utf-8') for name in found]
+
+def scan_tree_for_names(target_directory, filenames, workers=None):
+    """
+    多模式单遍扫描整个目录树（替代对每个文件名执行一次 grep -r），
+    返回 {文件名: [包含该文件名的二进制文件路径, ...]}。
+    与 grep -r 一致，不跟随目录中的符号链接。
+    """
+    file_paths = []
+    for root, _, files in os.walk(target_directory):
+        for file in sorted(files):
+            file_path = os.path.join(root, file)
+            if os.path.isfile(file_path) and not os.path.islink(file_path):
+                file_paths.append(file_path)
+
+    names = tuple(sorted(set(filenames)))
+    name_to_files = defaultdict(list)
+    for file_path, is_binary, found in map_in_process_pool(partial(find_names_in_file, names), file_paths, workers, chunksize=16):
+        if not is_binary:
             continue
+        for name in found:
+            name_to_files[name].append(file_path)
+    return name_to_files
+
+def find_binary_matches(target_directory, filenames, workers=None):
+    """
+    包含http服务固件的特有方案，其使用web静态资源引用的文件名来对包含文件偏移表的可能文件进行查找
+    """
+    matching_files = None
+    logger.info(f"开始查找目标目录 {target_directory} 中的二进制文件...")
 
+    # 整个解压目录只读一遍，一次性记录每个文件名出现在哪些二进制文件中
+    name_to_files = scan_tree_for_names(target_directory, filenames, workers)
+
+    for filename in filenames:
         # 将匹配到的文件转换为集合
-        current_matches = set(matches)
-        #print(f"当前匹配文件：{current_matches}")
+        current_matches = name_to_files.get(filename)
+        if not current_matches:
+            #print(f"没有找到匹配的文件，跳过文件: {filename}")
+            continue
         
         if matching_files is None:
-            matching_files = current_matches
+            matching_files = set(current_matches)
         else:
             # 求交集
             matching_files.intersection_update(current_matches)
-    print(f"\033[32m最后匹配到的存在文件偏移表文件集：{matching_files}\033[0m")
+    logger.info(f"\033[32m最后匹配到的存在文件偏移表文件集：{matching_files}\033[0m")
 
     # 如果没有匹配到任何文件，返回空列表
     if matching_files is None:
-        print("找不到binwalk -Me解压后的、明文可接触的文件偏移表，很可能该表已被加密或进一步压缩。")
-        print("尝试手动解密分析固件，然后把该表的二进制形式放在解压文件夹里，仍旧可以正常恢复文件名。")
+        logger.warning("找不到binwalk -Me解压后的、明文可接触的文件偏移表，很可能该表已被加密或进一步压缩。")
+        logger.warning("尝试手动解密分析固件，然后把该表的二进制形式放在解压文件夹里，仍旧可以正常恢复文件名。")
         return []
 
-    # 比较文件大小并返回最小的文件
+    # 比较文件大小并返回最小的文件。只在真正包含这些文件名的文件中挑选：
+    # 同名的 .7z 是未解压的压缩数据，里面没有明文的偏移表
     smallest_size = float('inf')  # 初始化为无穷大
     smallest_file = None
 
-    for match in matching_files:
-        # 对每个匹配的文件，生成去除 .7z 后缀的文件名和带 .7z 后缀的文件名
-        path_without_extension =  match.strip("\.7z")
-        path_with_extension = f"{path_without_extension}.7z"  # 拼接 .7z 扩展名
-
+    for match in sorted(matching_files):
         # 输出路径和大小调试信息
-        print(f"检查文件: {path_without_extension}")
-        print(f"检查文件: {path_with_extension}")
+        logger.debug(f"检查文件: {match}")
+        size = get_file_size(match)
+        if size != -1 and size < smallest_size:
+            smallest_size = size
+            smallest_file = match
 
-        # 获取文件大小
-        size_without_extension = get_file_size(path_without_extension)
-        size_with_extension = get_file_size(path_with_extension)
+    # 输出最终结果
+    logger.info(f"\033[1;32m文件偏移表所在位置: {smallest_file}")
+    return smallest_file
 
-        #print(f"文件大小 (无扩展名): {size_without_extension}")
-        #print(f"文件大小 (.7z): {size_with_extension}")
+# 结构化偏移表扫描：偏移表中的文件名（带扩展名，以 00 结尾；只从字符段的开头匹配，避免在长字符段上反复回溯）；
+# 相邻文件名的间隔在 TABLE_CLUSTER_GAP 以内的归为同一区域，区域中至少要有 TABLE_MIN_ENTRIES 个符合 type1/type2 布局的表项才算候选
+TABLE_NAME_PATTERN = re.compile(rb'(?<![A-Za-z0-9_./\-])[A-Za-z0-9_./\-]{1,250}\.[A-Za-z0-9]{1,4}\x00')
+TABLE_CLUSTER_GAP = 0x100
+TABLE_MIN_ENTRIES = 8
+# type1 表项中文件名之后的字段区（00 补齐 + 偏移 + 其他字段）里不应出现成段的文本，否则只是代码中相邻的字符串
+TYPE1_FIELD_TEXT_PATTERN = re.compile(rb'[\x20-\x7e]{4}')
+# type2 的 ToN 中两个带扩展名的文件名之间只能是单个 00 分隔的其他名字（如目录名）
+TYPE2_NAME_GAP_PATTERN = re.compile(rb'\x00(?:[\x21-\x7e]+\x00)*')
+TYPE2_NAME_RUN_PATTERN = re.compile(rb'[\x21-\x7e]+')
+# 校验 type2 候选时抽查的 ToF 表项数，以及向前寻找 ToN 开头、在 ToN 之前寻找 MINIFS 头部的范围
+TYPE2_SAMPLE_ENTRIES = 64
+TYPE2_BLOCK_LOOKBACK = 0x1000
+MINIFS_HEADER_LOOKBACK = 0x100
+# 排在前面的候选解析不出任何文件时，最多依次尝试的候选数
+TABLE_CANDIDATE_ATTEMPTS = 4
 
-        # 确定文件0xoffset最小的文件
-        if size_without_extension != -1 and size_without_extension < smallest_size:
-            smallest_size = size_without_extension
-            smallest_file = path_without_extension
+@dataclasses.dataclass
+class TableCandidate:
+    """
+    scan_offset_tables 找到的一个偏移表候选：offset 为交给 extract_file_info_type1/type2 的起始偏移，
+    mode 为偏移表形态(1/2)，entries 为符合该布局的表项数（即排序用的得分），
+    endian 为由 ToF 表项判断出的端序（type1 无法判断时为 None）
+    """
+    offset: int
+    mode: int
+    entries: int
+    endian: str = None
 
-        if size_with_extension != -1 and size_with_extension < smallest_size:
-            smallest_size = size_with_extension
-            smallest_file = path_with_extension
+def find_name_block_start(data, offset):
+    """
+    从 offset 处的名字向前，跨过以单个 00 分隔的其他名字，找到整块名字的开头
+    """
+    start = offset
+    while start >= 2 and data[start - 1] == 0 and data[start - 2] != 0 and offset - start < TYPE2_BLOCK_LOOKBACK:
+        previous_nul = data.rfind(b'\x00', max(0, start - 0x100), start - 1)
+        if previous_nul == -1 or not TYPE2_NAME_RUN_PATTERN.fullmatch(data, previous_nul + 1, start - 1):
+            break
+        start = previous_nul + 1
+    return start
 
-    # 输出最终结果
-    smallist_with7z=get_file_size(path_with_extension)
-    smallist_without7z=get_file_size(path_without_extension)
-    #返回更大的那个文件
-    if (smallist_with7z<smallist_without7z) & smallist_without7z in matching_files:
-        print(f"\033[1;32m文件偏移表所在位置: {smallest_file}")
-        return smallest_file
-    else:
-        print(f"\033[1;32m文件偏移表所在位置: {smallest_file+'.7z'}")
-        return smallest_file+'.7z'
+def score_type1_cluster(data, names):
+    """
+    type1：每个文件名 4 字节对齐，之后是 00 补齐和至少一个 4 字节字段，再接下一个文件名。
+    前一项字段的末尾字节可能恰好是可打印字符而被并入文件名，与 extract_file_info_type1 一样取对齐后的位置为文件名开头。
+    返回符合该布局的表项数
+    """
+    entries = 0
+    for (start, end), (next_start, next_end) in zip(names, names[1:]):
+        next_start = align_up(next_start)
+        if align_up(start) >= end or next_start >= next_end or not 5 <= next_start - end <= TABLE_CLUSTER_GAP:
+            continue
+        fields_start = align_up(end + 1)
+        fields = data[fields_start:next_start]
+        if fields.strip(b'\x00') and not TYPE1_FIELD_TEXT_PATTERN.search(fields):
+            entries += 1
+    return entries + 1 if entries else 0
+
+def score_type2_cluster(data, names):
+    """
+    type2 (MINIFS)：文件名以单个 00 分隔连成 ToN，其后 4 字节对齐处是每项 20 字节的 ToF，
+    表项数位于 ToN 开头前 12 字节处（有 MINIFS 头部时即头部 +0x14）。
+    抽查 ToF 表项：路径、文件名偏移都落在 ToN 内，chunk 编号小于表项数。
+    返回 (ToN 开头, 表项数, 端序)；不符合该布局时返回 None
+    """
+    if not all(TYPE2_NAME_GAP_PATTERN.fullmatch(data, end, next_start) for (_, end), (next_start, _) in zip(names, names[1:])):
+        return None
+    minifs_offset = data.rfind(b'MINIFS', max(0, names[0][0] - MINIFS_HEADER_LOOKBACK), names[0][0])
+    ton_start = minifs_offset + 0x20 if minifs_offset != -1 else find_name_block_start(data, names[0][0])
+    ton_end = TON_END_PATTERN.search(data, names[-1][0], names[-1][1] + TYPE2_BLOCK_LOOKBACK)
+    if ton_end is None or ton_start < 12:
+        return None
+    ton_length = ton_end.start() + 1 - ton_start
+    tof_start = align_up(ton_end.start() + 1)
+    best = None
+    for endian in ('big', 'little'):
+        struct_prefix = get_struct_prefix(endian)
+        files_count = struct.unpack_from(struct_prefix + 'I', data, ton_start - 12)[0]
+        if not len(names) <= files_count <= (len(data) - tof_start) // TYPE2_ENTRY_SIZE:
+            continue
+        sample_count = min(files_count, TYPE2_SAMPLE_ENTRIES)
+        sample = struct.iter_unpack(struct_prefix + '5I', data[tof_start:tof_start + sample_count * TYPE2_ENTRY_SIZE])
+        valid = sum(1 for path_offset, name_offset, chunk_number, _, _ in sample
+                    if path_offset < ton_length and name_offset < ton_length and chunk_number < files_count)
+        if valid * 2 > sample_count and (best is None or files_count > best[1]):
+            best = (ton_start, files_count, endian)
+    return best
+
+def scan_offset_tables_in_data(data):
+    """
+    scan_offset_tables 的实现：一遍正则扫描找出所有带扩展名的文件名，按间隔分成区域，
+    再按 type1、type2 的表项布局为每个区域打分
+    """
+    clusters = []
+    for match in TABLE_NAME_PATTERN.finditer(data):
+        name = (match.start(), match.end() - 1)
+        if clusters and name[0] - clusters[-1][-1][1] <= TABLE_CLUSTER_GAP:
+            clusters[-1].append(name)
+        else:
+            clusters.append([name])
+
+    candidates = []
+    for names in clusters:
+        if len(names) < TABLE_MIN_ENTRIES:
+            continue
+        type2 = score_type2_cluster(data, names)
+        if type2 is not None:
+            candidates.append(TableCandidate(type2[0], 2, type2[1], type2[2]))
+            continue
+        entries = score_type1_cluster(data, names)
+        if entries >= TABLE_MIN_ENTRIES:
+            candidates.append(TableCandidate(names[0][0], 1, entries))
+    candidates.sort(key=lambda candidate: (-candidate.entries, candidate.offset))
+    return candidates
+
+def scan_offset_tables(file_path):
+    """
+    对整个文件（或映像）做一遍结构化扫描，找出所有在结构上成立的文件偏移表，按表项数从多到少排序，
+    返回 [TableCandidate, ...]。与只看第一个带扩展名字符串的做法不同，代码中零散引用的资源名
+    （相邻字符串之间没有偏移字段，或没有 ToF 跟在后面）不会被当作偏移表；形态也由布局直接判断。
+    传入 FirmwareImage 时结果缓存在映像上
+    """
+    with open_firmware_image(file_path) as image:
+        return image.get_index('offset_tables', scan_offset_tables_in_data)
 
 def find_files_offset_table(file_path):
     """
-    针对已确定内含有偏移表的文件，使用strings自带的字符串偏移提取，从而寻找整个偏移表开头的位置
+    针对已确定内含有偏移表的文件，寻找整个偏移表开头的位置：取 scan_offset_tables 排在最前的候选；
+    结构化扫描没有结果时，退回到 scan_file_strings 的第一个带扩展名的字符串
     """
-    cmd = f"strings -t x -n 5 {file_path} | grep -E '\\.jpg|\\.png|\\.js|\\.css|\\.htm|\\.cer|\\.pem|\\.bin'"
-    
     try:
-        # 执行命令并获取结果，使用 universal_newlines=True 代替 text=True
-        result = subprocess.check_output(cmd, shell=True, universal_newlines=True)
-        print(result)
-        # 按行分割结果并获取第一行
-        first_line = result.splitlines()[0]
-        
-        # 提取偏移值（假设偏移和文件名之间有空格）
-        offset = first_line.split()[0]
-        
+        candidates = scan_offset_tables(file_path)
+        for rank, candidate in enumerate(candidates, 1):
+            logger.info(f"偏移表候选 #{rank}：偏移 {hex(candidate.offset)}，type{candidate.mode}，{candidate.entries} 个表项"
+                  + (f"，{candidate.endian} endian" if candidate.endian else ""))
+        if candidates:
+            offset = candidates[0].offset
+        else:
+            logger.info("结构化扫描没有找到偏移表，改用第一个带扩展名的字符串的位置")
+            records = scan_file_strings(file_path, extensions=TABLE_FILE_EXTENSIONS)
+            logger.debug(format_strings_output(records))
+            # 取第一条结果的偏移
+            offset = records[0][0]
+
         # 打印带红色的偏移位置（使用 ANSI 转义代码控制颜色）
-        print(f"\033[31m文件偏移表在【{file_path}】的【偏移({offset})】处\033[0m")
-        return int(offset,16)
-    except subprocess.CalledProcessError as e:
-        print(f"执行命令时出错: {e}")
+        logger.info(f"\033[31m文件偏移表在【{get_image_path(file_path)}】的【偏移({offset:x})】处\033[0m")
+        return offset
+    except OSError as e:
+        logger.error(f"读取文件时出错: {e}")
     except IndexError:
-        print(f"未找到符合条件的结果，无法提取偏移。")
+        logger.warning(f"未找到符合条件的结果，无法提取偏移。")
+
+# 偏移表按窗口流式解析：每次向后推进一个窗口，最后一个表项之后超过 TABLE_END_GAP 字节没有新表项时表格结束
+TABLE_SCAN_WINDOW = 0x10000
+TABLE_END_GAP = 0x1000
+TYPE1_MAX_NAME_LENGTH = 0x100
+TYPE1_FILE_NAME_PATTERN = re.compile(rb'^[A-Za-z0-9_\/\-]*\.[A-Za-z0-9_\/\-]*$')
+NON_ZERO_BYTE_PATTERN = re.compile(rb'[^\x00]')
+HEX_NAME_PATTERN = re.compile(r'[0-9A-F]+')
+
+def align_up(value, alignment=4):
+    """
+    向上对齐到 alignment 的倍数
+    """
+    return (value + alignment - 1) // alignment * alignment
+
+def match_type1_name(data, name_start, name_end):
+    """
+    data[name_start:name_end] 是合法的 type1 文件名时返回匹配结果，否则返回 None
+    """
+    match = TYPE1_FILE_NAME_PATTERN.match(data[name_start:name_end])
+    # 添加文件名长度的判断,帮助判断文件名合法性
+    if not match or len(match.group()) < 5:
+        return None
+    return match
+
+def starts_type1_name(data, position, data_length):
+    """
+    判断 position 处是否是一个以 00 结尾的合法 type1 文件名
+    """
+    name_end = data.find(b'\x00', position, min(data_length, position + TYPE1_MAX_NAME_LENGTH))
+    return name_end != -1 and match_type1_name(data, position, name_end) is not None
+
+def iter_type1_entries(data, start, data_length, byteorder):
+    """
+    流式解析 type1 表项，依次产生 (文件名, 偏移值)。
+    以 TABLE_SCAN_WINDOW 为单位向后推进：第一个窗口内没有表项时放弃，此后每个窗口处理完时，
+    只要最后一个表项之后还不到 TABLE_END_GAP 字节就继续处理下一个窗口，表格大小没有上限。
+    当前位置和最后一个表项的位置跨窗口保留，跨越窗口边界的文件名和偏移字段照常读取；
+    每次只从 data 中切出单个文件名或字段，不复制整个表格
+    """
+    window_end = min(data_length, start + TABLE_SCAN_WINDOW)
+    last_entry_end = None
+    while start < data_length:
+        if start >= window_end:
+            if last_entry_end is None or start - last_entry_end > TABLE_END_GAP:
+                break
+            window_end = min(data_length, window_end + TABLE_SCAN_WINDOW)
+
+        # 跳过00字节，找到第一个非00字节
+        non_zero = NON_ZERO_BYTE_PATTERN.search(data, start, window_end)
+        if non_zero is None:
+            start = window_end
+            continue
+        # 找到第一个非00字节后的4字节对齐位置，记录从这里开始到下一个00字节为止的字符串
+        name_start = align_up(non_zero.start())
+        name_limit = min(data_length, name_start + TYPE1_MAX_NAME_LENGTH)
+        name_end = data.find(b'\x00', name_start, name_limit)
+
+        # 长度达到0x100，说明已经是接下来的大片程序代码区域而非表格，跳过整段字符串，不必截取出来匹配
+        if name_end == -1:
+            name_end = data.find(b'\x00', name_limit, window_end)
+            start = name_end + 1 if name_end != -1 else window_end
+            continue
+
+        match = match_type1_name(data, name_start, name_end)
+        if not match:
+            start = name_end + 1
+            continue
+
+        # 文件名之后是 00 补齐，偏移字段从 align_up(文件名末尾+1) 开始，按整4字节读取
+        # （大端的偏移值以 00 开头，不能按第一个非00字节定位）。
+        # 补齐可能更长：整字为0且下一个字不是文件名的开头时，它只是补齐，跳过；
+        # 紧挨着下一个文件名的全0字即偏移为0的字段。一直没有非00字节时偏移值为0，不去远处找
+        field_start = align_up(name_end + 1)
+        if field_start + 4 > data_length:
+            break
+        non_zero = NON_ZERO_BYTE_PATTERN.search(data, field_start, min(data_length, field_start + TABLE_END_GAP))
+        if non_zero is not None:
+            word_start = non_zero.start() // 4 * 4
+            if word_start == field_start or not starts_type1_name(data, word_start, data_length):
+                field_start = word_start
+            else:
+                field_start = word_start - 4
+        yield match.group().decode('ascii', 'ignore'), int.from_bytes(data[field_start:field_start + 4], byteorder)
+        start = last_entry_end = field_start + 4
 
 def extract_file_info_type1(file_path, start_offset, endian='big'):
     """
     type1: 文件名1+"00"*n+文件偏移1+文件名2+"00"*n+文件偏移2 形态
     从指定的偏移量开始提取文件名和偏移信息，返回文件名及其偏移的键值对。
-    在找到文件名后，继续向后找非零字符，然后对齐4字节，读取4字节内容作为偏移值。
+    在找到文件名后，跳过 00 补齐读取4字节对齐的偏移字段作为偏移值（偏移为0的表项读出0）。
+    注意这改变了以前的解析语义：以前是跳到文件名后第一个非零字节再向上对齐4字节读取，
+    因此大端且小于 0x01000000 的偏移值（以 00 开头）与以前解析的结果不同，以前会读到下一个4字节；
+    偏移为0的表项以前会读到后面第一个非零的字段。
     如果匹配到的文件名长度达到 0x100，说明已经是接下来的大片程序代码区域而非表格，则放弃继续匹配。
+    文件通过（共享的）mmap 访问，由 iter_type1_entries 按窗口流式解析，表格超过一个窗口时继续向后解析直到表格结束。
     参数:
-    file_path: uImage镜像路径
+    file_path: uImage镜像路径或 FirmwareImage
     start_offset: 偏移表的开头
     endian: 端序，little或big
     """
-    print(f"从偏移量 {hex(start_offset)} 减0x50处开始提取文件信息,增加容错率...")
-    start_offset = start_offset - 0x50 
-    file_name_pattern = re.compile(rb'^[A-Za-z0-9_\/\-]*\.[A-Za-z0-9_\/\-]*$')
+    logger.info(f"从偏移量 {hex(start_offset)} 减0x50处开始提取文件信息,增加容错率...")
+    start_offset = max(0, start_offset - 0x50)
+    byteorder = 'big' if endian == 'big' else 'little'
     file_info = {}
-    with open(file_path, 'rb') as f:
-        data = f.read()
-    start = start_offset
-    max_scan_length = 0x10000  
-    end_position = min(len(data), start + max_scan_length)
-
-    while start < end_position:
-        # 跳过00字节，找到第一个非00字节
-        while start < end_position and data[start] == 0x00:
-            start += 1
-        # 找到第一个非00字节后的4字节对齐位置
-        first_non_zero_start = start
-        if first_non_zero_start % 4 != 0:
-            first_non_zero_start += 4 - (first_non_zero_start % 4)
-        # 记录4字节对齐开始的字符串
-        temp_str = b''
-        while first_non_zero_start < end_position and data[first_non_zero_start] != 0x00:
-            temp_str += data[first_non_zero_start:first_non_zero_start + 1]
-            first_non_zero_start += 1
-
-        # 检查是否符合文件名模式并且长度是否超过0x100
-        if len(temp_str) >= 0x100:
-            #print("检测到文件名长度达到0x100，可能已到达表的末尾，停止匹配。")
-            start = first_non_zero_start + 1
-            continue
-
-        match = file_name_pattern.match(temp_str)
-        if match:
-            file_name = match.group().decode('ascii', 'ignore')
-            #print(f"匹配到的文件名: {file_name}, 位置: {hex(memory_first_non_zero_start)}")
-
-            if len(file_name) >= 5:  # 添加文件名长度的判断,帮助判断文件名合法性
-                # 找到文件名后，继续向后跳过00字节
-                current_position = first_non_zero_start
-                while current_position < end_position and data[current_position] == 0x00:
-                    current_position += 1
-
-                # 对齐到下一个4字节边界
-                if current_position % 4 != 0:
-                    current_position += 4 - (current_position % 4)
-
-                # 读取当前偏移值（4字节）
-                if current_position + 4 <= len(data):
-                    raw_offset_bytes = data[current_position:current_position + 4]
-                    offset_hex = (
-                        raw_offset_bytes.hex().lstrip("0").upper() if endian == 'big'
-                        else raw_offset_bytes[::-1].hex().lstrip("0").upper()
-                    )
-                    offset_hex = offset_hex if offset_hex else "0"
-                    offset_int = int(offset_hex, 16)
-                    adjusted_offset = offset_int #+ filesystem_offset
-                    #adjusted_offset = hex(adjusted_offset).lstrip("0x").upper() or "0"
-                    # 如果文件名已经存在，则只保留最小的偏移量
-                    if file_name in file_info:
-                        file_info[file_name] = min(file_info[file_name], adjusted_offset)
-                    else:
-                        file_info[file_name] = adjusted_offset
-                    print(f"文件名: {file_name}，相对文件系统偏移值: {hex(file_info[file_name]).upper()}")
-                start = current_position + 4
+    # 每个表项一条的 DEBUG 日志在未启用时连消息都不生成
+    debug = logger.isEnabledFor(logging.DEBUG)
+    with open_firmware_image(file_path) as image:
+        for file_name, adjusted_offset in iter_type1_entries(image.data, start_offset, image.size, byteorder):
+            # 如果文件名已经存在，则只保留最小的偏移量
+            if file_name in file_info:
+                file_info[file_name] = min(file_info[file_name], adjusted_offset)
             else:
-                start = first_non_zero_start + 1
-        else:
-            start = first_non_zero_start + 1
+                file_info[file_name] = adjusted_offset
+            if debug:
+                logger.debug(f"文件名: {file_name}，相对文件系统偏移值: {hex(file_info[file_name]).upper()}")
     if not file_info:
-        print("未找到任何文件名和偏移信息，可能文件格式不正确")
+        logger.warning("未找到任何文件名和偏移信息，可能文件格式不正确")
+    else:
+        logger.info(f"从 type1 偏移表解析出 {len(file_info)} 个文件")
     file_info_str = {file_name: str(offset) for file_name, offset in file_info.items()}
+    return file_info_str
+
+def iter_table_entries(data, start, count, entry_struct):
     """
-    min_offset_file = min(file_info, key=file_info.get) if file_info else None
-    if min_offset_file:
-        print(f"最小偏移量的文件名: {min_offset_file}, 偏移值: {hex(file_info[min_offset_file])}")
+    按 TABLE_SCAN_WINDOW 大小的窗口依次解码 data 中从 start 开始的 count 个定长表项，每次只复制一个窗口
     """
-    return file_info_str
+    window_entries = max(1, TABLE_SCAN_WINDOW // entry_struct.size)
+    for first in range(0, count, window_entries):
+        window_start = start + first * entry_struct.size
+        yield from entry_struct.iter_unpack(data[window_start:window_start + min(window_entries, count - first) * entry_struct.size])
+
+def find_ton_end(data, start, data_length):
+    """
+    从 start 开始逐个窗口查找 非00字节+00+00，即 Table of Name 的末尾，找不到时返回 None。
+    相邻窗口的查找范围重叠 2 字节，跨越窗口边界的结尾也能找到
+    """
+    while start < data_length:
+        window_end = min(data_length, start + TABLE_SCAN_WINDOW)
+        ton_end = TON_END_PATTERN.search(data, start, min(data_length, window_end + 2))
+        if ton_end:
+            return ton_end.start()
+        start = window_end
+    return None
+
+# type2 (MINIFS) 的 ToF 表项：ToN中路径偏移、ToN中文件名偏移、chunk编号、chunk内偏移、文件大小，各4字节
+TYPE2_ENTRY_SIZE = 5 * 4
+TYPE2_CHUNK_ENTRY_SIZE = 12
+TON_END_PATTERN = re.compile(rb'[^\x00]\x00\x00')
+NAME_PATTERN = re.compile(rb'[^\x00]+')
+
+def get_struct_prefix(endian):
+    """
+    端序对应的 struct 格式前缀
+    """
+    return '>' if endian == 'big' else '<'
+
+class NameTable:
+    """
+    Table of Names 的 偏移→字符串 索引。
+    ToN 区域只解析一遍，每个名字只解码一次；表项指向名字中间（后缀共享）或区域之外时，
+    退回到从该处向后找 00 的方式，结果同样缓存。
+    """
+
+    def __init__(self, data, ton_start, ton_end):
+        self.data = data
+        self.ton_start = ton_start
+        # 直接在 data 上按范围匹配，不复制整个 ToN
+        matches = NAME_PATTERN.finditer(data, ton_start, ton_end + 1) if ton_end is not None else ()
+        self.names = {match.start() - ton_start: match.group().decode('utf-8', 'ignore') for match in matches}
 
+    def get(self, offset):
+        name = self.names.get(offset)
+        if name is None:
+            absolute_offset = self.ton_start + offset
+            name_end = self.data.find(b'\x00', absolute_offset)
+            name = self.data[absolute_offset:name_end].decode('utf-8', 'ignore') if name_end != -1 else ""
+            self.names[offset] = name
+        return name
+
+@dataclasses.dataclass
+class MinifsTable:
+    """
+    MINIFS 偏移表的完整解析结果：files 为 [(完整路径, chunk编号, chunk内偏移, 文件大小), ...]，
+    chunks 为 chunk 表 [(相对文件系统的偏移, 压缩后大小, 解压后大小), ...]，下标即 chunk 编号
+    """
+    files: list
+    chunks: list
 
-def extract_file_info_type2(file_path, start_offset, endian='big'):
+def extract_file_info_type2(file_path, start_offset, endian='big', return_table=False):
     """
     type2: 文件名1+"00"*1+文件名2+"00"*1+文件名3 
     然后 文件偏移1+"00"*1+文件偏移2+"00"*1+文件偏移3 这种形态
+    文件通过（共享的）mmap 访问；ToN 的末尾逐个窗口向后查找，ToF 表项按窗口用 struct.iter_unpack 流式解码，
+    ToN 预先解析为 偏移→字符串 索引，表格大小没有上限。
+    return_table 为 True 时返回 (file_info, MinifsTable)，后者还包含 ToF 之后的 chunk 表，
+    供 restore_minifs_files 直接按 chunk 解压切分文件；chunk 表不完整时为 None。
     """
     #print(f"从偏移量 {hex(start_offset)} 处开始提取文件信息, 增加容错率...")
     
     file_info = {}
     
-    with open(file_path, 'rb') as f:
-        data = f.read()
-
-    # 前向0x100范围内搜索MINIFS字符串
-    search_range_start = max(0, start_offset - 0x100)
-    search_range_end = start_offset
-    minifs_offset = data.find(b'MINIFS', search_range_start, search_range_end)
-    
-    if minifs_offset != -1:
-        start_offset = minifs_offset + 0x20
-        print(f"找到MINIFS字符串，新的起始偏移量为: {hex(start_offset)}")
-    else:
-        print(f"未找到MINIFS字符串，使用原始起始偏移量: {hex(start_offset)}")
-
-    start = start_offset
-    max_scan_length = 0x10000  # 最大扫描长度
-    end_position = min(len(data), start + max_scan_length)
-
-    # 检测ToN_start_offset-N最前面的非空处
-    ToN_start_offset = start - 2
-    while ToN_start_offset > 0 and data[ToN_start_offset-1] != 0x00:
-        ToN_start_offset -= 1
+    with open_firmware_image(file_path) as image:
+        data = image.data
+        data_length = image.size
+        # 前向0x100范围内搜索MINIFS字符串
+        search_range_start = max(0, start_offset - 0x100)
+        search_range_end = start_offset
+        minifs_offset = data.find(b'MINIFS', search_range_start, search_range_end)
+        
+        if minifs_offset != -1:
+            start_offset = minifs_offset + 0x20
+            logger.info(f"找到MINIFS字符串，新的起始偏移量为: {hex(start_offset)}")
+        else:
+            logger.info(f"未找到MINIFS字符串，使用原始起始偏移量: {hex(start_offset)}")
 
-    # 记录当前偏移的4的倍数上取值
-    ToN_start_offset = math.ceil(ToN_start_offset / 4) * 4
-    print(f"ToN_start_offset: {hex(ToN_start_offset).upper()}")
+        start = start_offset
 
-    # 从ToN_start_offset开始读取数据
-    current_position = ToN_start_offset
-    ToN_end_offset = None
+        # 检测ToN_start_offset-N最前面的非空处
+        ToN_start_offset = start - 2
+        if ToN_start_offset > 0:
+            ToN_start_offset = data.rfind(b'\x00', 0, ToN_start_offset) + 1
 
-    while current_position < end_position - 1:  # 需要至少两个字节进行检查
-        if data[current_position] != 0x00 and data[current_position + 1] == 0x00 and data[current_position + 2] == 0x00:
-            ToN_end_offset = current_position
-            break
-        current_position += 1
+        # 记录当前偏移的4的倍数上取值
+        ToN_start_offset = align_up(ToN_start_offset)
+        logger.debug(f"ToN_start_offset: {hex(ToN_start_offset).upper()}")
 
-    if ToN_end_offset is not None:
-        print(f"找到Table of Name末尾，ToN_end_offset: {hex(ToN_end_offset).upper()}")
-    else:
-        print("未找到Table of Name末尾")
+        # 从ToN_start_offset开始查找 非00字节+00+00，即Table of Name末尾
+        ToN_end_offset = find_ton_end(data, ToN_start_offset, data_length)
 
-    # 上取4的倍数于ToN_end_offset偏移值
-    if ToN_end_offset is not None:
-        ToF_start = math.ceil((ToN_end_offset+1) / 4) * 4
-        print(f"ToF_start: {hex(ToF_start).upper()}")
-    else:
-        ToF_start = None
+        if ToN_end_offset is not None:
+            logger.debug(f"找到Table of Name末尾，ToN_end_offset: {hex(ToN_end_offset).upper()}")
+        else:
+            logger.warning("未找到Table of Name末尾")
 
-    # 读取ToN_start_offset-12开始的4字节，得到files_count
-    if ToN_start_offset >= 12:
-        files_count_offset = ToN_start_offset - 12
-        files_count = int.from_bytes(data[files_count_offset:files_count_offset + 4], byteorder=endian)
-        print(f"files_count: {hex(files_count)}")
-    else:
-        files_count = None
-        print("无法读取files_count，偏移量不足")
-
-    # 从ToF_start开始读取文件信息
-    file_entries = []
-    if ToF_start is not None and files_count is not None:
-        current_position = ToF_start
-        entry_size = 5 * 4  # 每组由5个4字节组成
-
-        for _ in range(files_count):
-            if current_position + entry_size <= len(data):
-                entry = {
-                    'ToN_offset_path': int.from_bytes(data[current_position:current_position + 4], byteorder=endian),
-                    'ToN_offset_filename': int.from_bytes(data[current_position + 4:current_position + 8], byteorder=endian),
-                    'chunk_number': int.from_bytes(data[current_position + 8:current_position + 12], byteorder=endian),
-                    'offset_within_chunk': int.from_bytes(data[current_position + 12:current_position + 16], byteorder=endian),
-                    'file_size': int.from_bytes(data[current_position + 16:current_position + 20], byteorder=endian)
-                }
-                file_entries.append(entry)
-                current_position += entry_size
-            else:
-                print("文件数据不足，无法继续读取文件条目。")
-                break
+        # 上取4的倍数于ToN_end_offset偏移值
+        if ToN_end_offset is not None:
+            ToF_start = align_up(ToN_end_offset + 1)
+            logger.debug(f"ToF_start: {hex(ToF_start).upper()}")
+        else:
+            ToF_start = None
 
-        print(f"读取到的文件条目数: {len(file_entries)}")
-    else:
-        print("无法读取文件条目，ToF_start未找到或files_count无效")
-
-    # 从file_entries中读取路径和文件名，构造文件字典
-    for entry in file_entries:
-        # 从ToN_start_offset + ToN_offset_path读取路径，直到\x00
-        path_offset = ToN_start_offset + entry['ToN_offset_path']
-        path_end = data.find(b'\x00', path_offset)
-        if path_end != -1:
-            path = data[path_offset:path_end].decode('utf-8', 'ignore')
+        # 读取ToN_start_offset-12开始的4字节，得到files_count
+        struct_prefix = get_struct_prefix(endian)
+        if 12 <= ToN_start_offset <= data_length + 8:
+            files_count = struct.unpack_from(struct_prefix + 'I', data, ToN_start_offset - 12)[0]
+            logger.debug(f"files_count: {hex(files_count)}")
         else:
-            path = ""
+            files_count = None
+            logger.warning("无法读取files_count，偏移量不足")
 
-        # 从ToN_start_offset + ToN_offset_filename读取文件名，直到\x00
-        filename_offset = ToN_start_offset + entry['ToN_offset_filename']
-        filename_end = data.find(b'\x00', filename_offset)
-        if filename_end != -1:
-            filename = data[filename_offset:filename_end].decode('utf-8', 'ignore')
+        # 从ToF_start开始按窗口流式解码文件信息
+        entries_count = 0
+        if ToF_start is not None and files_count is not None:
+            available_count = max(0, (data_length - ToF_start) // TYPE2_ENTRY_SIZE)
+            entries_count = min(files_count, available_count)
+            if entries_count < files_count:
+                logger.warning("文件数据不足，无法继续读取文件条目。")
+            logger.info(f"读取到的文件条目数: {entries_count}")
         else:
-            filename = ""
+            logger.warning("无法读取文件条目，ToF_start未找到或files_count无效")
+        file_entries = iter_table_entries(data, ToF_start, entries_count, struct.Struct(struct_prefix + '5I')) if entries_count else ()
 
-        # 组合路径和文件名作为字典的键
-        full_path = f"{path}/{filename}" if path else filename
+        # 从file_entries中读取路径和文件名，构造文件字典
+        names = NameTable(data, ToN_start_offset, ToN_end_offset)
+        chunk_table_start = ToF_start + files_count * TYPE2_ENTRY_SIZE if entries_count else 0
+        offset_struct = struct.Struct(struct_prefix + 'I')
+        minifs_files = []
+        for path_offset, filename_offset, chunk_number, offset_within_chunk, file_size in file_entries:
+            # 组合路径和文件名作为字典的键
+            path = names.get(path_offset)
+            filename = names.get(filename_offset)
+            full_path = f"{path}/{filename}" if path else filename
+            minifs_files.append((full_path, chunk_number, offset_within_chunk, file_size))
 
-        # 计算file_offset_in_filesystem
-        file_offset_in_filesystem = ToF_start + files_count * 20 + entry['chunk_number'] * 12 + entry['offset_within_chunk']
-        if file_offset_in_filesystem + 4 <= len(data):
-            value = int.from_bytes(data[file_offset_in_filesystem:file_offset_in_filesystem + 4], byteorder=endian)
-            #value_str = str(value)
-        else:
-            value = None
+            # 计算file_offset_in_filesystem
+            file_offset_in_filesystem = chunk_table_start + chunk_number * TYPE2_CHUNK_ENTRY_SIZE + offset_within_chunk
+            if file_offset_in_filesystem + 4 > data_length:
+                continue
+            value = offset_struct.unpack_from(data, file_offset_in_filesystem)[0]
 
-        # 将键值对存入字典
-        if value is not None:
+            # 将键值对存入字典
             if full_path in file_info:
                 file_info[full_path] = min(file_info[full_path], value)
             else:
                 file_info[full_path] = value
 
+        # 紧跟在 ToF 之后的 chunk 表，每项 12 字节，项数由最大的 chunk 编号决定
+        table = None
+        if return_table and minifs_files:
+            chunk_count = max(chunk_number for _, chunk_number, _, _ in minifs_files) + 1
+            if chunk_table_start + chunk_count * TYPE2_CHUNK_ENTRY_SIZE <= data_length:
+                chunks = list(iter_table_entries(data, chunk_table_start, chunk_count, struct.Struct(struct_prefix + '3I')))
+                table = MinifsTable(minifs_files, chunks)
+                logger.info(f"chunk 表位于 {hex(chunk_table_start).upper()}，共 {chunk_count} 个 chunk")
+            else:
+                logger.warning(f"chunk 表需要 {chunk_count} 项，超出了文件范围，无法直接按 chunk 解压")
+
     # 打印并返回键值对
-    for key, value in file_info.items():
-        print(f"文件名: {key}，相对文件系统偏移值: {hex(value)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        for key, value in file_info.items():
+            logger.debug(f"文件名: {key}，相对文件系统偏移值: {hex(value)}")
+    logger.info(f"从 MINIFS 偏移表解析出 {len(file_info)} 个文件")
 
+    if return_table:
+        return file_info, table
     return file_info
 
+# MINIFS 文件的提取方式：按 chunk 表解压切分(native) 或匹配解包切出的文件(carved)
+MINIFS_EXTRACTORS = ("native", "carved")
+# 定位 MINIFS chunk 数据时用来打分的 chunk 数，以及作为锚点尝试的 chunk 数
+MINIFS_LOCATE_SAMPLE = 32
+MINIFS_LOCATE_ANCHORS = 4
+
+def locate_minifs_chunks(source, table):
+    """
+    chunk 表中的偏移相对于文件系统的起点，而起点本身不在表里，见 locate_filesystem_base。
+    返回文件系统在 source 中的偏移，定位不到时返回 None
+    """
+    base = locate_filesystem_base(source, [chunk[0] for chunk in table.chunks])
+    if base is not None:
+        logger.info(f"MINIFS chunk 数据位于 {get_image_path(source)}，文件系统偏移 {hex(base)}")
+    return base
+
+def locate_filesystem_base(source, relative_offsets):
+    """
+    由一组相对文件系统起点的数据流偏移反推起点：用 source 中所有 LZMA 头部的位置，以靠前的几个偏移为锚点，
+    取使最多偏移恰好落在 LZMA 头部上的起点。先用前 MINIFS_LOCATE_SAMPLE 个偏移打分，再用全部偏移确认，
+    命中不到一半时返回 None
+    """
+    with open_firmware_image(source) as image:
+        header_offsets = image.lzma_header_offsets()
+    header_set = set(header_offsets)
+    chunk_offsets = sorted(set(relative_offsets))
+    if not chunk_offsets or not header_set:
+        return None
+    sample = chunk_offsets[:MINIFS_LOCATE_SAMPLE]
+    best_base, best_hits = None, 0
+    for anchor in sample[:MINIFS_LOCATE_ANCHORS]:
+        for header_offset in header_offsets:
+            base = header_offset - anchor
+            if base < 0:
+                continue
+            hits = sum(1 for offset in sample if base + offset in header_set)
+            if hits > best_hits:
+                best_base, best_hits = base, hits
+        if best_hits == len(sample):
+            break
+    if best_base is None:
+        return None
+    total_hits = sum(1 for offset in chunk_offsets if best_base + offset in header_set)
+    if total_hits * 2 < len(chunk_offsets):
+        return None
+    logger.info(f"文件系统偏移 {hex(best_base)}：{total_hits}/{len(chunk_offsets)} 个数据流偏移对应 LZMA 数据")
+    return best_base
+
+def decompress_chunk(data, chunk_offset, raw_size=0):
+    """
+    解压 data 中 chunk_offset 处的一个 LZMA 数据流；该处不是 LZMA 数据时视为 raw_size 字节的未压缩数据。
+    返回 (解压结果, 出错信息)，数据流中途损坏时返回已解出的部分和出错信息，正常时出错信息为 None
+    """
+    if not LZMA_HEADER_PATTERN.match(data, chunk_offset):
+        return bytes(data[chunk_offset:chunk_offset + raw_size]), None
+    outputs = []
+    error = None
+    try:
+        for output in LZMABlockReader(data, chunk_offset, len(data), format=lzma.FORMAT_ALONE):
+            outputs.append(output)
+    except lzma.LZMAError as e:
+        error = f"chunk {hex(chunk_offset)} 解压出错（{e}），只使用已解出的部分"
+    return b"".join(outputs), error
+
+def extract_minifs_chunk(source_path, output_root, job):
+    """
+    解压一个 chunk（只解压一次），按 chunk 内偏移和大小切出其中的各个文件，写到 output_root 下。供进程池调用。
+    chunk 处不是 LZMA 数据时按未压缩的数据处理。
+    job 为 (chunk 在 source 中的偏移, 解压后大小, [(相对路径, chunk内偏移, 文件大小), ...])，
+    返回 ([(相对路径, 写出的路径), ...], [出错信息, ...])
+    """
+    chunk_offset, uncompressed_size, files = job
+    written = []
+    errors = []
+    with open(source_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        content, error = decompress_chunk(data, chunk_offset, uncompressed_size)
+    if error:
+        errors.append(error)
+    for relative_path, offset, size in files:
+        if offset + size > len(content):
+            errors.append(f"{relative_path}：chunk {hex(chunk_offset)} 解压后只有 {len(content)} 字节，不足 {offset + size} 字节")
+            continue
+        target_path = os.path.join(output_root, relative_path)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        with open(target_path, 'wb') as out, memoryview(content) as view:
+            out.write(view[offset:offset + size])
+        written.append((relative_path, target_path))
+    return written, errors
+
+def restore_minifs_files(table, source, filesystem_offset, result_dir, workers=None, sink=None):
+    """
+    内置的 MINIFS 提取：按 chunk 表在进程池上把每个 chunk 解压一次，按偏移和大小精确切出各个文件，
+    不依赖 binwalk 的切分和命名（binwalk 合并或拆分了数据流的文件也能正确恢复）。
+    sink 为 None 时直接写到 result_dir 下；否则先写到临时目录再交给 sink，由调用者负责关闭 sink。
+    返回恢复的文件数
+    """
+    chunk_files = defaultdict(list)
+    for path, chunk_number, offset_within_chunk, file_size in table.files:
+        relative_path = os.path.normpath(path.replace("\\", "/").lstrip("/"))
+        if relative_path in (".", "") or relative_path.startswith(".."):
+            logger.warning(f"跳过不安全的路径: {path}")
+            continue
+        if chunk_number >= len(table.chunks):
+            logger.warning(f"文件 {path} 的 chunk 编号 {chunk_number} 超出了 chunk 表，跳过")
+            continue
+        chunk_files[chunk_number].append((relative_path, offset_within_chunk, file_size))
+    jobs = sorted(
+        (filesystem_offset + table.chunks[chunk_number][0], table.chunks[chunk_number][2], files)
+        for chunk_number, files in chunk_files.items()
+    )
+    logger.info(f"开始按 chunk 表解压 {len(jobs)} 个 chunk，恢复 {sum(len(files) for _, _, files in jobs)} 个文件...")
+
+    output_root = result_dir if sink is None else tempfile.mkdtemp(prefix=".minifs-", dir=get_parent_directory(result_dir) or ".")
+    restored = 0
+    debug = logger.isEnabledFor(logging.DEBUG)
+    progress = ProgressReporter("按 chunk 表恢复文件", sum(len(files) for _, _, files in jobs))
+    try:
+        results = map_in_process_pool(partial(extract_minifs_chunk, get_image_path(source), output_root), jobs, workers)
+        for written, errors in results:
+            for error in errors:
+                logger.warning(error)
+            for relative_path, target_path in written:
+                if debug:
+                    logger.debug(f"已恢复文件 {relative_path}")
+                if sink is not None:
+                    sink.submit(target_path, relative_path)
+                restored += 1
+                progress.update('restored')
+    finally:
+        progress.close()
+        if sink is not None:
+            shutil.rmtree(output_root, ignore_errors=True)
+    logger.info(f"\033[92m按 chunk 表恢复了 {restored} 个文件\033[0m")
+    return restored
+
+# 懒加载归档：chunk 缓存的默认容量，以及固件本身没有偏移表时最多尝试解压的数据流个数（按声明的解压后大小从大到小）
+DEFAULT_CHUNK_CACHE_SIZE = 64 * 1024 ** 2
+ARCHIVE_TABLE_PROBE_STREAMS = 8
+
+class LRUChunkCache:
+    """
+    以 chunk 在固件中的偏移为键缓存解压结果，总大小不超过 max_size 字节，超出时淘汰最久未使用的 chunk；
+    单个 chunk 比容量还大时不缓存。hits/misses/decompressed_bytes 记录命中、解压次数和解压总量
+    """
+
+    def __init__(self, max_size=DEFAULT_CHUNK_CACHE_SIZE):
+        self.max_size = max_size
+        self.chunks = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.decompressed_bytes = 0
+
+    def get(self, key, load):
+        """
+        取出 key 对应的 chunk，不在缓存中时调用 load() 解压
+        """
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            self.hits += 1
+            return chunk
+        self.misses += 1
+        chunk = load()
+        self.decompressed_bytes += len(chunk)
+        if len(chunk) <= self.max_size:
+            self.chunks[key] = chunk
+            self.size += len(chunk)
+            while self.size > self.max_size:
+                _, evicted = self.chunks.popitem(last=False)
+                self.size -= len(evicted)
+        return chunk
+
+@dataclasses.dataclass
+class ArchiveEntry:
+    """
+    FirmwareArchive 中的一个文件：所在 chunk 在固件中的偏移、chunk 内偏移和大小。
+    size 为 None 表示整个 chunk 就是这个文件（type1 及没有 chunk 表的情况，大小要解压后才知道）；
+    raw_size 为 chunk 不是 LZMA 数据时按未压缩数据读取的长度
+    """
+    name: str
+    chunk_offset: int
+    offset: int = 0
+    size: int = None
+    raw_size: int = 0
+
+class FirmwareArchive:
+    """
+    只读的、类似 zipfile.ZipFile 的懒加载访问接口：只定位并解析偏移表，不解包、不落盘。
+    namelist() 列出恢复出的路径，open(name) 以文件对象的形式读取其中一个文件。
+    文件所在的 chunk（MINIFS 为 chunk 表中的一项，type1 为单个 LZMA 数据流）在第一次读取时才解压，
+    解压结果放在容量为 cache_size 字节的 LRUChunkCache 中，取出一个文件只需解压它所在的 chunk。
+    偏移表不在固件本身中时，按声明的解压后大小从大到小解压少数几个数据流（通常第一个就是主程序）寻找偏移表。
+    定位不到偏移表或文件系统时抛出 OffsetTableNotFoundError。verbose 为 False 时不在控制台输出解析过程（同 extract()，不改动 sys.stdout）。
+    """
+
+    def __init__(self, file_path, cache_size=DEFAULT_CHUNK_CACHE_SIZE, endian=None, verbose=False):
+        self.image = FirmwareImage(file_path)
+        try:
+            self.cache = LRUChunkCache(cache_size)
+            self.endian = endian or self.image.endian or "big"
+            console_token = LOG_CONSOLE.set(verbose)
+            try:
+                self.entries = self._load_entries()
+            finally:
+                LOG_CONSOLE.reset(console_token)
+        except BaseException:
+            self.image.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.cache.chunks.clear()
+        self.image.close()
+
+    def read_chunk(self, chunk_offset, raw_size=0):
+        """
+        取出 chunk_offset 处 chunk 的解压结果（经过 LRU 缓存）
+        """
+        return self.cache.get(chunk_offset, lambda: decompress_chunk(self.image.data, chunk_offset, raw_size)[0])
+
+    def _find_table_source(self):
+        """
+        返回包含偏移表的映像：固件本身，或解压出的某个数据流
+        """
+        if check_if_firmware_itself_have_table(self.image):
+            return self.image
+        streams = []
+        for offset in self.image.lzma_header_offsets():
+            uncompressed_size = struct.unpack_from('<Q', self.image.data, offset + 5)[0]
+            if uncompressed_size != LZMA_UNKNOWN_SIZE:
+                streams.append((uncompressed_size, offset))
+        for _, offset in sorted(streams, reverse=True)[:ARCHIVE_TABLE_PROBE_STREAMS]:
+            source = FirmwareImage.from_bytes(self.read_chunk(offset), f"{self.image.path}@{hex(offset)}")
+            if check_if_firmware_itself_have_table(source):
+                return source
+        raise OffsetTableNotFoundError(f"在 {self.image.path} 及其最大的 {ARCHIVE_TABLE_PROBE_STREAMS} 个数据流中都没有找到文件偏移表")
+
+    def _load_entries(self):
+        source = self._find_table_source()
+        infile_offset = find_files_offset_table(source)
+        if infile_offset is None:
+            raise OffsetTableNotFoundError(f"无法在 {source.path} 中定位文件偏移表")
+        entries = {}
+        if decide_extract_mode(source, infile_offset, self.endian) == 2:
+            # 结构化扫描由 ToF 判断出了端序时以它为准
+            endian = next((candidate.endian for candidate in scan_offset_tables(source) if candidate.offset == infile_offset and candidate.endian), self.endian)
+            file_info, table = extract_file_info_type2(source, infile_offset, endian, return_table=True)
+            base = locate_minifs_chunks(self.image, table) if table else None
+            if base is not None:
+                for name, chunk_number, offset_within_chunk, file_size in table.files:
+                    if chunk_number < len(table.chunks):
+                        chunk_offset, _, uncompressed_size = table.chunks[chunk_number]
+                        name = name.lstrip("/")
+                        entries[name] = ArchiveEntry(name, base + chunk_offset, offset_within_chunk, file_size, uncompressed_size)
+                return entries
+        else:
+            file_info = extract_file_info_type1(source, infile_offset, self.endian)
+
+        # 没有 chunk 表时每个文件是一个独立的数据流，由表项的相对偏移反推文件系统的起点
+        relative_offsets = {name: int(offset) for name, offset in file_info.items()}
+        base = locate_filesystem_base(self.image, relative_offsets.values())
+        if base is None:
+            raise OffsetTableNotFoundError(f"无法确定文件系统在 {self.image.path} 中的偏移")
+        for name, relative_offset in relative_offsets.items():
+            if base + relative_offset < self.image.size:
+                name = name.lstrip("/")
+                entries[name] = ArchiveEntry(name, base + relative_offset)
+        return entries
+
+    def namelist(self):
+        return list(self.entries)
+
+    def getinfo(self, name):
+        try:
+            return self.entries[name.lstrip("/")]
+        except KeyError:
+            raise KeyError(f"归档中没有文件 {name}") from None
+
+    def __contains__(self, name):
+        return name.lstrip("/") in self.entries
+
+    def read(self, name):
+        """
+        读出一个文件的全部内容，只解压它所在的 chunk
+        """
+        entry = self.getinfo(name)
+        chunk = self.read_chunk(entry.chunk_offset, entry.raw_size)
+        if entry.size is None:
+            return chunk
+        if entry.offset + entry.size > len(chunk):
+            raise ExtractionFailedError(f"{name}：chunk {hex(entry.chunk_offset)} 解压后只有 {len(chunk)} 字节，不足 {entry.offset + entry.size} 字节")
+        return chunk[entry.offset:entry.offset + entry.size]
+
+    def open(self, name):
+        """
+        以只读的二进制文件对象打开一个文件
+        """
+        return io.BytesIO(self.read(name))
+
+    def extract(self, name, target_dir="."):
+        """
+        把一个文件按其恢复出的路径写到 target_dir 下，返回写出的路径
+        """
+        target_path = os.path.join(target_dir, os.path.normpath(name.lstrip("/")))
+        os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+        with open(target_path, 'wb') as out:
+            out.write(self.read(name))
+        return target_path
+
 
 
 def extract_offsets_from_output(data):
@@ -675,154 +2134,643 @@ def extract_offsets_from_output(data):
 
 
 
-def rename_extracted_files(file_info, extracted_dir, filesystem_offset,binwalk_shell_output):  
-    """ 
-    根据给定的文件信息复制并重命名解压的文件，创建必要的文件夹结构。
-    将文件复制到解压后的根目录之下并保留相对路径结构。
+# 恢复文件的落盘方式：普通复制、硬链接、符号链接、reflink(写时复制)；后三者不被支持时自动退回复制
+MATERIALIZE_METHODS = ("copy", "hardlink", "symlink", "reflink")
+MATERIALIZE_FALLBACK_ERRNOS = {
+    errno.EXDEV, errno.EPERM, errno.EACCES, errno.EMLINK, errno.EINVAL,
+    errno.ENOSYS, errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF,
+}
+# linux 下 ioctl(FICLONE) 的请求号
+FICLONE = 0x40049409
+MATERIALIZE_WORKERS = 8
 
-    参数：
-    file_info : 文件信息，键为目标文件名，值为调整后的偏移值。
-    extracted_dir : 解压后的文件所在的目录。
-    filesystem_offset : 文件系统的偏移值。
-    binwalk_shell_output: binwalk输出,仅用于提取最后一行的偏移值,用来限制文件名的修复过程
+def reflink_file(src, dst):
     """
-    lines = binwalk_shell_output.strip().splitlines()
-    if lines:
-        last_line = lines[-1].strip()
-        # 使用正则表达式匹配行的十进制偏移
-        match = re.match(r'^(\d+)', last_line)
-        max_file_offset = int(match.group(1))
-    print(f"文件偏移最大值{hex(max_file_offset)}")
-    # 输出目录已经是解压后的目录，例如：vxfile_mw313rv4/_mw313rv4.bin.extracted
-    print(f"正在尝试文件系统偏移为：{hex(filesystem_offset)}")
-    print(f"开始复制文件并移动到结果目录...")
-    # 正确数大于10则再也无视错误
-    true_count = 0
-    filesystem_offset_is_true = 0
-    #一直错则有可能不是这个文件偏移
-    false_count = 0    
-    for target_name, adjusted_offset in file_info.items():
+    以写时复制的方式复制文件：优先使用 ioctl(FICLONE)（btrfs/xfs 等），
+    其次使用 os.copy_file_range 在内核中完成复制，均不可用时抛出 OSError
+    """
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
         try:
-            # 将十六进制偏移值转换为整数并加上文件系统偏移量
-            original_offset = int(adjusted_offset) + filesystem_offset
-            original_offset_hex = hex(original_offset).lstrip("0x").upper()  # 转换为八位十六进制字符串，去掉 0x 前缀，补足前导零
-            #print(f"文件: {target_name}, 相对文件系统偏移值: {hex(adjusted_offset)}, 加文件系统偏移后的偏移值: {original_offset_hex}")  #DEBUG用
-        except ValueError as e:
-            print(f"无效的偏移值: {adjusted_offset}, 跳过该文件。错误: {e}")
-            continue
-        if(original_offset>max_file_offset):
-            continue
-        # 生成旧的文件路径（以偏移值为文件名，在解压后的目录中）
-        old_file_path = os.path.join(extracted_dir, original_offset_hex)
-        # 生成新的文件路径 (解压路径/result_vxworks_file/binwalk把内存偏移所在作为文件的名称)
-        new_file_path = os.path.join(get_parent_directory(extracted_dir) + "/","result_vxworks_file",target_name.lstrip(os.sep))
-        # 如果目标文件名包含路径，创建相应的目录结构
-        target_directory = os.path.dirname(new_file_path)
-        if target_directory and not os.path.exists(target_directory):
-            os.makedirs(target_directory, exist_ok=True)
-
-        # 复制文件
-        if os.path.exists(old_file_path):
-            try:
-                print(f"已重命名文件 {old_file_path} 并复制到 {new_file_path}")
-                true_count += 1
+            import fcntl
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except (ImportError, OSError):
+            if not hasattr(os, "copy_file_range"):
+                raise OSError(errno.ENOSYS, "copy_file_range 不可用")
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+    shutil.copystat(src, dst)
 
-                shutil.copy2(old_file_path, new_file_path)
-            except IOError as e:
-                print(f"复制文件失败: {old_file_path} 到 {new_file_path}，错误: {e}")
-                pass
-        else:
-            false_count += 1
-            print(f"文件 {old_file_path} 不存在，无法复制。")
+def materialize_file(src, dst, method="copy"):
+    """
+    按指定方式把 src 落盘为 dst，目标已存在时先删除。
+    所选方式在当前文件系统上不被支持时自动退回普通复制，返回实际使用的方式。
+    """
+    if os.path.lexists(dst) and not os.path.isdir(dst):
+        os.remove(dst)
+    if method != "copy":
+        try:
+            if method == "hardlink":
+                os.link(src, dst)
+            elif method == "symlink":
+                os.symlink(os.path.relpath(src, os.path.dirname(dst) or "."), dst)
+            elif method == "reflink":
+                reflink_file(src, dst)
+            else:
+                raise ValueError(f"未知的落盘方式: {method}")
+            return method
+        except OSError as e:
+            if e.errno not in MATERIALIZE_FALLBACK_ERRNOS:
+                raise
+            if os.path.lexists(dst):
+                os.remove(dst)
+    shutil.copy2(src, dst)
+    return "copy"
 
-        if(true_count>=5):
-            filesystem_offset_is_true = 1
-        
-        if((false_count>=10) & (filesystem_offset_is_true == 0)):
-            print(f"文件系统偏移值{hex(filesystem_offset)}很可能不正确！正在换一个试试")
-            return filesystem_offset_is_true
-        
-    return filesystem_offset_is_true
-    
-def check_if_firmware_itself_have_table(firmware_path):
+class FileMaterializer:
     """
-    检查固件文件本身是否包含指定的文件偏移表。
-    使用 strings 工具提取文本并通过正则过滤指定文件类型。
-    
-    :param firmware_path: 固件文件路径
-    :return: 如果返回的行数超过 10 行，返回 True，否则返回 False。
+    在有界线程池上执行恢复文件的落盘。
+    某种方式一旦因文件系统不支持而退回复制，后续文件直接复制，不再反复尝试。
     """
-    try:
-        # 获取兼容性参数
-        subprocess_params = get_subprocess_params()
-
-        # 构造 strings 命令
-        command = ["strings", "-t", "x", "-n", "5", firmware_path]
-        # 执行 strings 命令
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            **subprocess_params
-        )
-        # 过滤特定文件类型
-        grep_process = subprocess.Popen(
-            ["grep", "-E", r"\.jpg|\.png|\.js|\.css|\.htm|\.cer|\.pem|\.bin"],
-            stdin=process.stdout,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            **subprocess_params
-        )
-        process.stdout.close()  # 关闭 strings 的标准输出，传递给 grep
-        stdout, stderr = grep_process.communicate()
 
-        if stderr:
-            print(f"[-] 执行错误: {stderr}")
-            return False
+    def __init__(self, method="copy", workers=None):
+        if method not in MATERIALIZE_METHODS:
+            raise ValueError(f"未知的落盘方式: {method}，可选: {', '.join(MATERIALIZE_METHODS)}")
+        self.method = method
+        self.executor = ThreadPoolExecutor(max_workers=workers or MATERIALIZE_WORKERS)
+        self.futures = []
+        self.lock = threading.Lock()
 
-        # 统计返回的行数
-        line_count = len(stdout.strip().split("\n")) if stdout else 0
-        return line_count > 10
-    except FileNotFoundError:
-        print("[-] 未找到 strings 或 grep 命令，请确保已安装这些工具。")
-        return False
-    except Exception as e:
-        print(f"[-] 检查固件时出错: {e}")
-        return False
+    def _materialize(self, src, dst):
+        used_method = materialize_file(src, dst, self.method)
+        if used_method != self.method:
+            with self.lock:
+                if self.method != "copy":
+                    logger.warning(f"当前文件系统不支持 {self.method}，改为普通复制")
+                    self.method = "copy"
+        return used_method
+
+    def submit(self, src, dst):
+        # 在提交者的上下文中执行，落盘线程的日志同样带上固件、阶段和是否输出到控制台
+        self.futures.append((src, dst, self.executor.submit(contextvars.copy_context().run, self._materialize, src, dst)))
+
+    def close(self):
+        """
+        等待所有落盘任务完成，返回成功落盘的文件数
+        """
+        self.executor.shutdown(wait=True)
+        done = 0
+        for src, dst, future in self.futures:
+            try:
+                future.result()
+                done += 1
+            except OSError as e:
+                logger.warning(f"复制文件失败: {src} 到 {dst}，错误: {e}")
+        self.futures = []
+        return done
+
+# 恢复结果的目录名（在归档中作为顶层目录），以及支持的归档格式和对应的 tarfile 流式写入模式
+RESULT_DIR_NAME = "result_vxworks_file"
+ARCHIVE_FORMATS = ("tar", "tar.gz", "tar.xz", "tar.zst", "zip")
+ARCHIVE_TAR_MODES = {"tar": "w|", "tar.gz": "w|gz", "tar.xz": "w|xz", "tar.zst": "w|"}
+ARCHIVE_SUFFIXES = {
+    ".tar": "tar", ".tar.gz": "tar.gz", ".tgz": "tar.gz", ".tar.xz": "tar.xz", ".txz": "tar.xz",
+    ".tar.zst": "tar.zst", ".tzst": "tar.zst", ".zip": "zip",
+}
+
+def guess_archive_format(path):
+    """
+    根据归档文件名的后缀推断格式，推断不出时返回 None
+    """
+    name = path.lower()
+    for suffix, archive_format in sorted(ARCHIVE_SUFFIXES.items(), key=lambda item: -len(item[0])):
+        if name.endswith(suffix):
+            return archive_format
+    return None
+
+def get_zstd_module():
+    """
+    优先使用 Python 3.14 自带的 compression.zstd，其次使用第三方 zstandard 模块，都没有时抛出 ValueError
+    """
+    try:
+        from compression import zstd
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        raise ValueError("tar.zst 格式需要 Python 3.14 及以上版本或安装 zstandard 模块（pip install zstandard）")
+
+def open_zstd_writer(fileobj):
+    """
+    在 fileobj 外包一层 zstd 压缩流，关闭时不关闭 fileobj
+    """
+    zstd = get_zstd_module()
+    if hasattr(zstd, "ZstdFile"):
+        return zstd.ZstdFile(fileobj, 'w')
+    return zstd.ZstdCompressor().stream_writer(fileobj, closefd=False)
+
+def resolve_archive_format(output, archive_format=None):
+    """
+    确定归档格式：未指定时按路径后缀推断，输出为文件对象或 - 时默认为 tar；
+    格式不合法或所需的压缩模块不可用时抛出 ValueError
+    """
+    if archive_format is None:
+        archive_format = guess_archive_format(output) if isinstance(output, str) and output != "-" else "tar"
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"无法确定归档格式: {archive_format or output}，请指定格式，可选: {', '.join(ARCHIVE_FORMATS)}")
+    if archive_format == "tar.zst":
+        get_zstd_module()
+    return archive_format
+
+class ArchiveSink:
+    """
+    把恢复出的文件按恢复后的路径直接流式写入 tar（可选 gz/xz/zstd 压缩）或 zip 归档，
+    不在磁盘上生成 result_vxworks_file 目录树。
+    output 为归档路径，或可写的二进制文件对象（如 sys.stdout.buffer，此时不需要可 seek）。
+    归档只能顺序写入，submit 时立即写入该文件；接口与 FileMaterializer 一致。
+    """
+
+    def __init__(self, output, archive_format=None, root=RESULT_DIR_NAME):
+        archive_format = resolve_archive_format(output, archive_format)
+        self.archive_format = archive_format
+        self.root = root
+        self.names = set()
+        self.count = 0
+        self.owns_output = isinstance(output, str)
+        self.output = open(output, 'wb') if self.owns_output else output
+        self.compressor = None
+        try:
+            if archive_format == "zip":
+                self.archive = zipfile.ZipFile(self.output, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+            else:
+                stream = self.output
+                if archive_format == "tar.zst":
+                    self.compressor = stream = open_zstd_writer(self.output)
+                self.archive = tarfile.open(fileobj=stream, mode=ARCHIVE_TAR_MODES[archive_format], format=tarfile.PAX_FORMAT)
+        except BaseException:
+            if self.owns_output:
+                self.output.close()
+            raise
+
+    def submit(self, src, target_name):
+        """
+        把 src 以 <root>/<target_name> 的名字写入归档；同名文件只保留第一个
+        """
+        arcname = "/".join(part for part in (self.root, target_name.replace(os.sep, "/").lstrip("/")) if part)
+        if arcname in self.names:
+            logger.warning(f"归档中已有 {arcname}，跳过 {src}")
+            return
+        self.names.add(arcname)
+        try:
+            if self.archive_format == "zip":
+                self.archive.write(src, arcname)
+            else:
+                self.archive.add(src, arcname, recursive=False)
+            self.count += 1
+        except OSError as e:
+            logger.warning(f"写入归档失败: {src} 到 {arcname}，错误: {e}")
+
+    def close(self):
+        """
+        写完归档尾部并关闭，返回写入的文件数
+        """
+        self.archive.close()
+        if self.compressor is not None:
+            self.compressor.close()
+        if self.owns_output:
+            self.output.close()
+        else:
+            self.output.flush()
+        return self.count
+
+# 内容寻址存储中每个固件输出目录里的清单文件名，以及结果目录的两种形式：指向存储对象的硬链接树 / 只有清单
+BLOB_MANIFEST_NAME = "blob_manifest.json"
+# 存储根目录下的锁文件：写入中的运行持共享锁，gc() 持排他锁
+BLOB_LOCK_NAME = "lock"
+BLOB_LAYOUTS = ("hardlink", "manifest")
+
+class BlobStore:
+    """
+    跨固件共享的内容寻址存储：恢复出的每个文件按内容 sha256 只存一份（只读），路径为 objects/<前两位>/<sha256>，
+    判断“是否已经见过这个文件”只需一次 stat。每个固件在 refs/ 下登记一份引用清单（文件路径→哈希），
+    对象的引用计数由全部有效的引用清单统计得出，gc() 删除引用计数为 0 的对象。
+    引用清单记录了该固件输出目录中 blob_manifest.json 的位置，这个文件被删除（输出目录被清理）后引用即失效。
+    正在写入的运行在登记引用之前，它存入（或因内容重复而复用）的对象还没有被任何引用清单计数，
+    因此用存储锁而不是时间窗口来保护：写入方（BlobStoreSink）从创建到登记完引用一直持有共享锁，
+    gc() 持排他锁，等所有写入中的运行结束后才统计引用计数；进程异常退出时锁由系统自动释放，不会留下需要过期清理的状态。
+    直接调用 put() 的代码同样应先取得 lock()。没有 fcntl 的平台上不加锁。
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = os.path.abspath(store_dir)
+        self.objects_dir = os.path.join(self.store_dir, "objects")
+        self.refs_dir = os.path.join(self.store_dir, "refs")
+        self.lock_path = os.path.join(self.store_dir, BLOB_LOCK_NAME)
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.refs_dir, exist_ok=True)
+
+    def lock(self, shared=True, blocking=True):
+        """
+        取得存储锁（shared 为 False 时为排他锁），返回持有锁的文件对象，关闭即释放（可用于 with 语句）。
+        blocking 为 False 且锁被占用时抛出 BlockingIOError
+        """
+        lock_file = open(self.lock_path, 'a')
+        try:
+            import fcntl
+        except ImportError:
+            return lock_file
+        try:
+            fcntl.flock(lock_file.fileno(), (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+        except BaseException:
+            lock_file.close()
+            raise
+        return lock_file
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def contains(self, digest):
+        return os.path.isfile(self.object_path(digest))
+
+    def put(self, src):
+        """
+        存入文件 src，返回 (sha256, 是否为新对象)。先复制（可能时用 reflink）到临时文件再以硬链接原子地放到位，
+        多个进程同时存入同一内容时只保留一份
+        """
+        digest = hash_file(src)
+        object_path = self.object_path(digest)
+        if os.path.exists(object_path):
+            return digest, False
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=self.store_dir)
+        os.close(fd)
+        try:
+            materialize_file(src, tmp_path, "reflink")
+            # 对象可能被硬链接到各固件的结果目录中，设为只读，防止通过结果目录改坏共享的内容
+            os.chmod(tmp_path, 0o444)
+            try:
+                os.link(tmp_path, object_path)
+            except FileExistsError:
+                return digest, False
+        finally:
+            os.remove(tmp_path)
+        return digest, True
+
+    def add_ref(self, ref_name, files, manifest_path):
+        """
+        登记（或替换）一份引用清单
+        """
+        ref = {'manifest': os.path.abspath(manifest_path), 'files': files, 'created': time.time()}
+        tmp_path = os.path.join(self.refs_dir, f".tmp-{ref_name}-{os.getpid()}")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(ref, f)
+        os.replace(tmp_path, os.path.join(self.refs_dir, ref_name + ".json"))
+
+    def load_refs(self):
+        """
+        读取所有引用清单，返回 {引用名: 清单}，无法解析的清单被忽略
+        """
+        refs = {}
+        for name in os.listdir(self.refs_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.refs_dir, name), encoding='utf-8') as f:
+                    refs[name[:-len(".json")]] = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"无法读取引用清单 {name}：{e}")
+        return refs
+
+    def refcounts(self, refs=None):
+        """
+        统计每个对象被引用的次数（同一对象在一个固件中出现多次时计多次）
+        """
+        counts = defaultdict(int)
+        for ref in (self.load_refs() if refs is None else refs).values():
+            for digest in ref.get('files', {}).values():
+                counts[digest] += 1
+        return counts
+
+    def gc(self, dry_run=False):
+        """
+        先删除对应输出目录已不存在的失效引用，再删除引用计数为 0 的对象。
+        dry_run 为 True 时只统计不删除。返回统计字典。
+        整个过程持有排他的存储锁，有运行正在写入时先等它们登记完引用
+        """
+        try:
+            store_lock = self.lock(shared=False, blocking=False)
+        except BlockingIOError:
+            logger.info(f"有运行正在写入存储 {self.store_dir}，等待其完成后再回收")
+            store_lock = self.lock(shared=False)
+        with store_lock:
+            return self._gc(dry_run)
+
+    def _gc(self, dry_run):
+        refs = self.load_refs()
+        stale = [name for name, ref in refs.items() if ref.get('manifest') and not os.path.isfile(ref['manifest'])]
+        for name in stale:
+            logger.info(f"引用 {name} 对应的输出已不存在（{refs[name]['manifest']}），{'将被' if dry_run else '已'}删除")
+            if not dry_run:
+                os.remove(os.path.join(self.refs_dir, name + ".json"))
+            del refs[name]
+        counts = self.refcounts(refs)
+
+        stats = {'refs': len(refs), 'stale_refs': len(stale), 'objects': 0, 'removed': 0, 'freed_bytes': 0, 'kept_bytes': 0}
+        for root, _, names in os.walk(self.objects_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                size = os.path.getsize(path)
+                stats['objects'] += 1
+                if counts.get(name):
+                    stats['kept_bytes'] += size
+                    continue
+                stats['removed'] += 1
+                stats['freed_bytes'] += size
+                if not dry_run:
+                    os.remove(path)
+        return stats
+
+class BlobStoreSink:
+    """
+    rename_extracted_files 的输出后端：恢复的文件存入 BlobStore，结果目录中只有指向存储对象的硬链接
+    （layout=hardlink，跨文件系统时退回复制），或者不建结果目录、只写清单（layout=manifest）。
+    close() 时把 {恢复路径: sha256} 清单写入输出目录并在存储中登记引用。接口与 FileMaterializer 一致。
+    从创建到 close() 一直持有存储的共享锁，其间 gc() 不会删除本次存入或复用、但还没有登记引用的对象。
+    """
+
+    def __init__(self, store, result_dir, manifest_path, ref_name, layout="hardlink", firmware_path=None):
+        if layout not in BLOB_LAYOUTS:
+            raise ValueError(f"未知的结果目录形式: {layout}，可选: {', '.join(BLOB_LAYOUTS)}")
+        self.store = store
+        self.result_dir = result_dir
+        self.manifest_path = manifest_path
+        self.ref_name = ref_name
+        self.layout = layout
+        self.firmware_path = firmware_path
+        self.files = {}
+        self.new_objects = 0
+        self.new_bytes = 0
+        self.deduplicated_bytes = 0
+        self.link_fallback = False
+        self.store_lock = store.lock()
+
+    def submit(self, src, target_name):
+        target_name = target_name.replace(os.sep, "/").lstrip("/")
+        try:
+            digest, added = self.store.put(src)
+            size = os.path.getsize(src)
+            if added:
+                self.new_objects += 1
+                self.new_bytes += size
+            else:
+                self.deduplicated_bytes += size
+            self.files[target_name] = digest
+            if self.layout == "hardlink":
+                dst = os.path.join(self.result_dir, target_name)
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                if materialize_file(self.store.object_path(digest), dst, "hardlink") != "hardlink" and not self.link_fallback:
+                    logger.warning(f"结果目录与存储 {self.store.store_dir} 不在同一文件系统上，无法硬链接，改为复制")
+                    self.link_fallback = True
+        except OSError as e:
+            logger.warning(f"存入内容寻址存储失败: {src}（{target_name}），错误: {e}")
+
+    def close(self):
+        """
+        写出清单并登记引用后释放存储锁，返回存入的文件数
+        """
+        manifest = {
+            'firmware': os.path.abspath(self.firmware_path) if self.firmware_path else None,
+            'ref': self.ref_name,
+            'store': self.store.store_dir,
+            'files': self.files,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+            with open(self.manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=1)
+            self.store.add_ref(self.ref_name, self.files, self.manifest_path)
+        finally:
+            self.store_lock.close()
+        logger.info(f"\033[92m已将 {len(self.files)} 个恢复的文件存入 {self.store.store_dir}：新增 {self.new_objects} 个对象（{self.new_bytes} 字节），"
+              f"与已有内容重复 {len(self.files) - self.new_objects} 个（省去 {self.deduplicated_bytes} 字节），清单：{self.manifest_path}\033[0m")
+        return len(self.files)
+
+def offset_to_carved_name(offset):
+    """
+    binwalk 以十六进制偏移（大写、无前导零）作为解压出的文件名
+    """
+    return hex(offset).lstrip("0x").upper()
+
+def get_max_file_offset(binwalk_shell_output):
+    """
+    取 binwalk 输出最后一行的十进制偏移，作为可修复的文件偏移最大值
+    """
+    lines = binwalk_shell_output.strip().splitlines()
+    if lines:
+        match = re.match(r'^(\d+)', lines[-1].strip())
+        if match:
+            return int(match.group(1))
+    return None
+
+def list_carved_offsets(extracted_dir):
+    """
+    将解压目录只列一次，返回其中以十六进制偏移命名的项对应的偏移集合
+    """
+    carved_offsets = set()
+    for name in os.listdir(extracted_dir):
+        if HEX_NAME_PATTERN.fullmatch(name):
+            offset = int(name, 16)
+            if offset_to_carved_name(offset) == name:
+                carved_offsets.add(offset)
+    return carved_offsets
+
+def score_filesystem_offsets(file_info, extracted_dir, candidate_offsets, max_file_offset):
+    """
+    在内存中为每个候选文件系统偏移打分：统计 file_info 中有多少表项加上该偏移后
+    恰好落在一个 binwalk 解压出的文件上。整个过程不读写任何文件，
+    复杂度为 O(候选数 × 表项数) 次集合查找。
+    返回 [(候选偏移, 命中数), ...]，顺序与 candidate_offsets 一致。
+    """
+    carved_offsets = list_carved_offsets(extracted_dir)
+    relative_offsets = []
+    for adjusted_offset in file_info.values():
+        try:
+            relative_offsets.append(int(adjusted_offset))
+        except ValueError:
+            continue
+
+    scores = []
+    for candidate in candidate_offsets:
+        limit = max_file_offset - candidate if max_file_offset is not None else None
+        hits = sum(1 for relative in relative_offsets if (limit is None or relative <= limit) and relative + candidate in carved_offsets)
+        scores.append((candidate, hits))
+    return scores
+
+def choose_filesystem_offset(file_info, extracted_dir, candidate_offsets, binwalk_shell_output):
+    """
+    选出命中数最多的文件系统偏移；并列时取 binwalk 输出中靠前的那个并给出提示，
+    所有候选都没有命中时返回 None
+    """
+    max_file_offset = get_max_file_offset(binwalk_shell_output)
+    scores = score_filesystem_offsets(file_info, extracted_dir, candidate_offsets, max_file_offset)
+    for candidate, hits in scores:
+        logger.debug(f"文件系统偏移 {hex(candidate)} 命中 {hits}/{len(file_info)} 个文件")
+
+    best_hits = max((hits for _, hits in scores), default=0)
+    if best_hits == 0:
+        logger.warning("所有候选文件系统偏移都对应不上解压出的文件，无法恢复文件名")
+        return None
+    best_offsets = [candidate for candidate, hits in scores if hits == best_hits]
+    if len(best_offsets) > 1:
+        logger.warning(f"有多个文件系统偏移命中数并列最高({best_hits})：{', '.join(hex(offset) for offset in best_offsets)}，取第一个")
+    logger.info(f"选定文件系统偏移：{hex(best_offsets[0])}")
+    return best_offsets[0]
+
+def rename_extracted_files(file_info, extracted_dir, filesystem_offset,binwalk_shell_output, materialize="copy", workers=None, stop_on_misses=True, sink=None):  
+    """ 
+    根据给定的文件信息复制并重命名解压的文件，创建必要的文件夹结构。
+    将文件复制到解压后的根目录之下并保留相对路径结构。
+
+    参数：
+    file_info : 文件信息，键为目标文件名，值为调整后的偏移值。
+    extracted_dir : 解压后的文件所在的目录。
+    filesystem_offset : 文件系统的偏移值。
+    binwalk_shell_output: binwalk输出,仅用于提取最后一行的偏移值,用来限制文件名的修复过程
+    materialize : 落盘方式，copy/hardlink/symlink/reflink，不支持时自动退回 copy
+    workers : 落盘线程池大小
+    stop_on_misses : 为 True 时连续找不到文件就提前放弃（试探偏移用）；偏移已事先选定时传 False
+    sink : 不为 None 时（如 ArchiveSink）把文件交给它写出，不在磁盘上建立结果目录；由调用者负责关闭
+    """
+    max_file_offset = get_max_file_offset(binwalk_shell_output)
+    if max_file_offset is not None:
+        logger.info(f"文件偏移最大值{hex(max_file_offset)}")
+    # 输出目录已经是解压后的目录，例如：vxfile_mw313rv4/_mw313rv4.bin.extracted
+    logger.info(f"正在尝试文件系统偏移为：{hex(filesystem_offset)}")
+    logger.info(f"开始复制文件并移动到结果目录...")
+    # 正确数大于10则再也无视错误
+    true_count = 0
+    filesystem_offset_is_true = 0
+    #一直错则有可能不是这个文件偏移
+    false_count = 0    
+    materializer = sink or FileMaterializer(materialize, workers)
+    debug = logger.isEnabledFor(logging.DEBUG)
+    progress = ProgressReporter("复制文件", len(file_info))
+    try:
+        for target_name, adjusted_offset in file_info.items():
+            try:
+                # 将十六进制偏移值转换为整数并加上文件系统偏移量
+                original_offset = int(adjusted_offset) + filesystem_offset
+                original_offset_hex = offset_to_carved_name(original_offset)  # 转换为十六进制字符串，去掉 0x 前缀
+                #print(f"文件: {target_name}, 相对文件系统偏移值: {hex(adjusted_offset)}, 加文件系统偏移后的偏移值: {original_offset_hex}")  #DEBUG用
+            except ValueError as e:
+                logger.debug(f"无效的偏移值: {adjusted_offset}, 跳过该文件。错误: {e}")
+                progress.update('skipped')
+                continue
+            if max_file_offset is not None and original_offset > max_file_offset:
+                progress.update('skipped')
+                continue
+            # 生成旧的文件路径（以偏移值为文件名，在解压后的目录中）
+            old_file_path = os.path.join(extracted_dir, original_offset_hex)
+            if sink is not None:
+                # 直接写入归档，不建立结果目录
+                new_file_path = target_name
+            else:
+                # 生成新的文件路径 (解压路径/result_vxworks_file/binwalk把内存偏移所在作为文件的名称)
+                new_file_path = os.path.join(get_parent_directory(extracted_dir) + "/",RESULT_DIR_NAME,target_name.lstrip(os.sep))
+                # 如果目标文件名包含路径，创建相应的目录结构
+                target_directory = os.path.dirname(new_file_path)
+                if target_directory and not os.path.exists(target_directory):
+                    os.makedirs(target_directory, exist_ok=True)
+
+            # 交给线程池落盘（或写入归档）
+            if os.path.exists(old_file_path):
+                if debug:
+                    logger.debug(f"已重命名文件 {old_file_path} 并复制到 {new_file_path}")
+                true_count += 1
+                materializer.submit(old_file_path, new_file_path)
+                progress.update('copied')
+            else:
+                false_count += 1
+                if debug:
+                    logger.debug(f"文件 {old_file_path} 不存在，无法复制。")
+                progress.update('missing')
+
+            if(true_count>=5):
+                filesystem_offset_is_true = 1
+            
+            if stop_on_misses and ((false_count>=10) & (filesystem_offset_is_true == 0)):
+                logger.warning(f"文件系统偏移值{hex(filesystem_offset)}很可能不正确！正在换一个试试")
+                return filesystem_offset_is_true
+    finally:
+        progress.close()
+        if sink is None:
+            materializer.close()
+        
+    return filesystem_offset_is_true
+    
+def check_if_firmware_itself_have_table(firmware_path):
+    """
+    检查固件文件本身是否包含指定的文件偏移表。
+    使用 scan_offset_tables 做结构化扫描，只有成片文件名而没有偏移表布局的（如代码中引用的资源名）不算。
+    
+    :param firmware_path: 固件文件路径或 FirmwareImage
+    :return: 找到了至少一个偏移表候选时返回 True，否则返回 False。
+    """
+    try:
+        return bool(scan_offset_tables(firmware_path))
+    except OSError as e:
+        logger.error(f"[-] 读取固件时出错: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"[-] 检查固件时出错: {e}")
+        return False
     
 
-def check_crypted_fileoffset_table(folder_path):
+def check_crypted_fileoffset_table(folder_path, timeout=None):
+    """
+    check_crypted_fileoffset_table_async 的同步版本
+    """
+    return asyncio.run(check_crypted_fileoffset_table_async(folder_path, timeout))
+
+async def check_crypted_fileoffset_table_async(folder_path, timeout=None):
     """
     使用 grep -r 搜索目标文件夹中的关键字,如果有以下两个关键字之一，
     就意味着是一类文件偏移表被压缩并且作者逆向了好几天以及尝试解密可疑地方也找不到，暂时实在技穷了无能为力QwQ的固件
     :param folder_path: 目标文件夹路径
+    :param timeout: grep 的超时秒数，None 为不限；超时按没有找到关键字处理
     """
     # 要搜索的关键字
     search_patterns = ["Decryption for config.bin", "des_min_do"]
     
     try:
         # 构造 grep 命令，支持多个关键字
-        result = subprocess.run(
+        result = await run_subprocess_async(
             ["grep", "-r", "-e", search_patterns[0], "-e", search_patterns[1], folder_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True  # 替换 text=True 为 universal_newlines=True
+            timeout
         )
 
-        # 如果 stdout 有内容，说明找到了匹配项
-        if result.stdout:
-            print("\033[91m[-] 此形态的vxworks固件由于文件偏移表极有可能被以某种形式隐藏，sorry暂不支持，作者在积极想办法，\033[0m")
-            print("\033[91m[-] 如果您找到了这类文件偏移表的显现方法请务必issue，我会立刻学习的QwQ\033[0m")
-            sys.exit(1)
-
         # 如果 stderr 有权限错误提示
         if "Permission denied" in result.stderr:
-            print("\033[93m[!] 警告：一些文件由于权限问题无法读取，请检查权限配置。\033[0m")
+            logger.warning("\033[93m[!] 警告：一些文件由于权限问题无法读取，请检查权限配置。\033[0m")
 
     except FileNotFoundError:
-        print("[-] 未找到 grep 命令，请确保在环境中安装了 grep。")
+        logger.error("[-] 未找到 grep 命令，请确保在环境中安装了 grep。")
+        return
     except Exception as e:
-        print(f"[-] 执行 grep 命令时出错: {e}")
+        logger.error(f"[-] 执行 grep 命令时出错: {e}")
+        return
+
+    # 如果 stdout 有内容，说明找到了匹配项
+    if result.stdout:
+        logger.error("\033[91m[-] 此形态的vxworks固件由于文件偏移表极有可能被以某种形式隐藏，sorry暂不支持，作者在积极想办法，\033[0m")
+        logger.error("\033[91m[-] 如果您找到了这类文件偏移表的显现方法请务必issue，我会立刻学习的QwQ\033[0m")
+        raise EncryptedOffsetTableError("文件偏移表极有可能被以某种形式隐藏，暂不支持此形态的 vxworks 固件")
 
 def decide_extract_mode(file_path, infile_offset, endian):
     """
@@ -831,92 +2779,581 @@ def decide_extract_mode(file_path, infile_offset, endian):
     mode 2: 文件名1+"00"*1+文件名2+"00"*1+文件名3  
             文件偏移1+"00"*1+文件偏移2+"00"*1+文件偏移3  
             形态
+    infile_offset 是 scan_offset_tables 的候选时直接采用其按布局判断出的形态，否则看偏移处 0x50 字节内有没有 4 个连续的 00
     """
     mode = 2  # 默认设置为 mode 2
     
     try:
-        with open(file_path, 'rb') as file:
-            # 移动到指定偏移位置
-            file.seek(infile_offset)
-            
-            # 检索0x50字节的数据
+        with open_firmware_image(file_path) as image:
+            for candidate in scan_offset_tables(image):
+                if candidate.offset == infile_offset:
+                    return candidate.mode
+            # 检索指定偏移位置起0x50字节的数据，查找连续的 0x00 00 00 00 字节
             bytes_to_read = 0x50
-            data = file.read(bytes_to_read)
-            
-            # 查找连续的 0x00 00 00 00 字节
-            if b'\x00\x00\x00\x00' in data:
+            if image.data.find(b'\x00\x00\x00\x00', infile_offset, infile_offset + bytes_to_read) != -1:
                 mode = 1
     
     except FileNotFoundError:
-        print(f"Error: File '{file_path}' not found.")
+        logger.error(f"Error: File '{get_image_path(file_path)}' not found.")
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error(f"Error: {e}")
     
     return mode
 
 
-def extract_function_table(firmware_path, output_path):
+# vxworks 压缩数据块的标志（LZMA 头部 5A 00 00 80），以及符号表中必然存在的符号名
+LZMA_BLOCK_MARKER = b"\x5A\x00\x00\x80"
+SYMBOL_TABLE_MARKER = b"bzero"
+# 增量解压时每次喂入的压缩数据大小、每次最多产出的解压数据大小，以及单个数据块解压总量的上限
+LZMA_INPUT_CHUNK_SIZE = 0x10000
+LZMA_OUTPUT_CHUNK_SIZE = 0x100000
+LZMA_MAX_OUTPUT_SIZE = 0x10000000
+
+class LZMABlockReader:
+    """
+    增量解压 data[start_offset:end_offset] 中的 LZMA 数据，迭代时逐块产出解压结果。
+    每次最多产出 LZMA_OUTPUT_CHUNK_SIZE 字节，内存占用与数据块大小无关；
+    数据不合法、在结束标记前耗尽或解压总量超过 max_output（疑似压缩炸弹）时抛出 lzma.LZMAError。
+    迭代结束后可通过 consumed_end 得到压缩数据实际结束的位置。
+    """
+
+    def __init__(self, data, start_offset, end_offset, max_output=LZMA_MAX_OUTPUT_SIZE, format=lzma.FORMAT_AUTO):
+        self.data = data
+        self.start_offset = start_offset
+        self.end_offset = end_offset
+        self.max_output = max_output
+        self.decompressor = lzma.LZMADecompressor(format=format)
+        self.position = start_offset
+        self.total_output = 0
+
+    def __iter__(self):
+        decompressor = self.decompressor
+        while not decompressor.eof:
+            if decompressor.needs_input:
+                if self.position >= self.end_offset:
+                    raise lzma.LZMAError("Compressed data ended before the end-of-stream marker was reached")
+                chunk = self.data[self.position:min(self.position + LZMA_INPUT_CHUNK_SIZE, self.end_offset)]
+                self.position += len(chunk)
+            else:
+                chunk = b""
+            output = decompressor.decompress(chunk, max_length=LZMA_OUTPUT_CHUNK_SIZE)
+            self.total_output += len(output)
+            if self.total_output > self.max_output:
+                raise lzma.LZMAError(f"Decompressed data exceeds {self.max_output} bytes")
+            if output:
+                yield output
+
+    @property
+    def consumed_end(self):
+        if self.decompressor.eof:
+            return self.position - len(self.decompressor.unused_data)
+        return self.position
+
+def iter_lzma_block(data, start_offset, end_offset, max_output=LZMA_MAX_OUTPUT_SIZE):
+    """
+    增量解压 data[start_offset:end_offset] 中的 LZMA 数据，逐块产出解压结果，见 LZMABlockReader
+    """
+    return iter(LZMABlockReader(data, start_offset, end_offset, max_output))
+
+def probe_lzma_block(data, start_offset, end_offset, marker, stop_event=None):
+    """
+    增量解压一个数据块，只判断其中是否包含 marker：一旦找到或确认数据块无效就立即停止，
+    不保留解压结果。stop_event 被置位时（已经有更靠前的数据块命中）也会提前放弃。
+    """
+    tail = b""
+    try:
+        for output in iter_lzma_block(data, start_offset, end_offset):
+            if stop_event is not None and stop_event.is_set():
+                return False
+            # 保留上一块末尾的 len(marker)-1 字节，防止 marker 被切在两块之间
+            window = tail + output
+            if marker in window:
+                return True
+            tail = window[-(len(marker) - 1):]
+    except lzma.LZMAError:
+        return False
+    return False
+
+def write_lzma_block(data, start_offset, end_offset, output_file):
+    """
+    将一个数据块流式解压写入 output_file，不在内存中缓存整个解压结果。
+    数据块无效时删除写了一半的文件并返回 False。
+    """
+    try:
+        with open(output_file, 'wb') as out:
+            for output in iter_lzma_block(data, start_offset, end_offset):
+                out.write(output)
+        return True
+    except lzma.LZMAError:
+        os.remove(output_file)
+        return False
+
+def extract_function_table(firmware_path, output_path, workers=None):
     """
     处理固件文件，提取符号表。如果存在符号表，将其保存并返回路径。
-    所有操作在 tmp_ 文件夹下进行，执行完毕后删除临时文件。
+    各压缩数据块在线程池上并发增量解压探测（lzma 解压时会释放 GIL），
+    按偏移顺序取第一个包含 bzero 的数据块，流式写入 SYMBOL_Table，不在当前目录下创建任何文件。
     """
     if not firmware_path:
-        print("\033[91m请提供目标固件文件路径\033[0m")
+        logger.error("\033[91m请提供目标固件文件路径\033[0m")
         return None
 
-    tmp_dir = "tmp_"
-    os.makedirs(tmp_dir, exist_ok=True)
-    
-    try:
-        firmware_name = os.path.basename(firmware_path)
-        result_dir = os.path.join(tmp_dir, f"result_file_{firmware_name}")
-        os.makedirs(result_dir, exist_ok=True)
-
-        # 读取文件内容
-        with open(firmware_path, "rb") as _fd:
-            content = _fd.read()
+    # 使用共享的映像映射，不整体读入内存
+    with open_firmware_image(firmware_path) as image:
+        content = image.data
 
-        # 查找所有压缩数据的偏移（5A 00 00 80）
-        compress_offset_list = [i.start() for i in re.finditer(b"\x5A\x00\x00\x80", content)]
+        # 查找所有压缩数据的偏移（5A 00 00 80），索引缓存在映像上
+        compress_offset_list = image.lzma_marker_offsets()
         if not compress_offset_list:
-            print("\033[91m[-] 未找到压缩数据!\033[0m")
+            logger.error("\033[91m[-] 未找到压缩数据!\033[0m")
             return None
 
-        # 循环处理所有压缩数据块
-        symbol_table_found = False
-        for i in range(len(compress_offset_list) - 1):
-            start_offset = compress_offset_list[i]
-            end_offset = compress_offset_list[i + 1]
+        # 修改符号表保存路径为上一层目录，去掉最后的 '_xxx.extracted' 部分
+        base_output_path = re.sub(r'_[^/\\]+\.extracted$', '', output_path)
+        symbol_table_path = os.path.join(base_output_path, "SYMBOL_Table")
 
-            # 提取 LZMA 数据块
-            lzma_data = content[start_offset:end_offset]
-
-            # 解压 LZMA 数据
+        # 并发探测所有压缩数据块（相邻两个标志之间的数据）
+        blocks = list(zip(compress_offset_list[:-1], compress_offset_list[1:]))
+        stop_event = threading.Event()
+        with ThreadPoolExecutor(max_workers=get_worker_count(workers)) as executor:
+            futures = [
+                executor.submit(probe_lzma_block, content, start_offset, end_offset, SYMBOL_TABLE_MARKER, stop_event)
+                for start_offset, end_offset in blocks
+            ]
             try:
-                decompressed_data = lzma.decompress(lzma_data)
-            except lzma.LZMAError as e:
+                for (start_offset, end_offset), future in zip(blocks, futures):
+                    if not future.result():
+                        continue
+                    # 检查是否包含 'bzero'，如果是则保存为符号表
+                    # 确保符号表保存的父目录存在
+                    os.makedirs(os.path.dirname(symbol_table_path) or ".", exist_ok=True)
+                    if write_lzma_block(content, start_offset, end_offset, symbol_table_path):
+                        logger.info(f"\033[92m[+]有符号表，已保存为: {symbol_table_path}\033[0m")
+                        return symbol_table_path
+            finally:
+                # 已经得到结果（或出错）后，让仍在运行的探测尽快退出
+                stop_event.set()
+                for future in futures:
+                    future.cancel()
+
+    logger.info("\033[92m[-]没有符号表\033[0m")
+    return None
+
+# 符号表：头部(总大小、符号数) + 每项 8 字节的 (类型<<24 | 名字偏移, 地址) + 以 00 分隔的名字串，端序与固件一致
+SYMBOL_HEADER_SIZE = 8
+SYMBOL_ENTRY_SIZE = 8
+SYMBOL_NAME_OFFSET_MASK = 0xFFFFFF
+# 类型字节中 N_EXT=0x01，其余位为段：N_ABS=0x02、N_TEXT=0x04、N_DATA=0x06、N_BSS=0x08
+SYMBOL_SEGMENT_MASK = 0x0E
+SYMBOL_SEGMENT_TEXT = 0x04
+SYMBOL_EXPORT_FORMATS = ("json", "csv", "ida", "ghidra")
+SYMBOL_EXPORT_SUFFIXES = {"json": ".json", "csv": ".csv", "ida": "_ida.py", "ghidra": "_ghidra.py"}
+# 载入脚本的头尾，中间为 (地址, 名字, 是否函数) 列表；Ghidra 的 Jython 不一定按 utf-8 读脚本，因此只用 ASCII
+SYMBOL_SCRIPT_TEMPLATES = {
+    "ida": (
+        "# VxWorks symbols recovered by vxfile_extracter, run with File > Script file in IDA\n"
+        "import idc\nimport ida_funcs\n\nSYMBOLS = [\n",
+        "]\n\nfor address, name, is_function in SYMBOLS:\n"
+        "    if is_function:\n        ida_funcs.add_func(address)\n"
+        "    idc.set_name(address, name, idc.SN_NOWARN | idc.SN_NOCHECK)\n"
+        "print(\"%d symbols imported\" % len(SYMBOLS))\n",
+    ),
+    "ghidra": (
+        "# VxWorks symbols recovered by vxfile_extracter, run from the Ghidra Script Manager\n"
+        "# @category VxWorks\nfrom ghidra.program.model.symbol import SourceType\n\nSYMBOLS = [\n",
+        "]\n\nfor address, name, is_function in SYMBOLS:\n"
+        "    addr = toAddr(address)\n"
+        "    if is_function and getFunctionAt(addr) is None:\n        createFunction(addr, name)\n"
+        "    createLabel(addr, name, True, SourceType.IMPORTED)\n"
+        "print(\"%d symbols imported\" % len(SYMBOLS))\n",
+    ),
+}
+
+@dataclasses.dataclass(frozen=True)
+class Symbol:
+    """
+    符号表中的一项，type 为 VxWorks 的类型字节
+    """
+    name: str
+    address: int
+    type: int
+
+    @property
+    def is_function(self):
+        return self.type & SYMBOL_SEGMENT_MASK == SYMBOL_SEGMENT_TEXT
+
+class SymbolTable:
+    """
+    SYMBOL_Table 的紧凑索引：各项按地址排序后存放在 addresses（地址）、name_offsets（名字在 strings 中的偏移）
+    两个 array 和 types（类型字节）中，另有 名字→下标 的字典。
+    symbol_at() 用二分查找返回包含某地址的符号，O(log n)；address_of() 按名字查地址，O(1)。
+    export() 按地址顺序遍历一遍，同时写出 JSON、CSV 和 IDA/Ghidra 载入脚本。
+    """
+
+    def __init__(self, addresses, name_offsets, types, strings, endian):
+        self.addresses = addresses
+        self.name_offsets = name_offsets
+        self.types = types
+        self.strings = strings
+        self.endian = endian
+        # 同名的符号只记录地址最小的一个
+        self.index = {}
+        for position, name_offset in enumerate(name_offsets):
+            self.index.setdefault(self.name(name_offset), position)
+
+    @classmethod
+    def parse(cls, data, endian=None):
+        """
+        从 SYMBOL_Table 的数据建立索引；endian 为 None 时两种端序都试，格式不符时返回 None
+        """
+        for candidate in ((endian,) if endian else ('big', 'little')):
+            symbols = cls._parse_endian(data, candidate)
+            if symbols is not None:
+                return symbols
+        return None
+
+    @classmethod
+    def _parse_endian(cls, data, endian):
+        if len(data) < SYMBOL_HEADER_SIZE:
+            return None
+        total_size, count = struct.unpack_from(get_struct_prefix(endian) + "II", data)
+        strings_start = SYMBOL_HEADER_SIZE + count * SYMBOL_ENTRY_SIZE
+        if not count or strings_start >= total_size or total_size > len(data):
+            return None
+        # 表项整体转成 array，端序与本机不同时原地翻转，不逐项 unpack
+        words = array('I', bytes(data[SYMBOL_HEADER_SIZE:strings_start]))
+        if endian != sys.byteorder:
+            words.byteswap()
+        strings = bytes(data[strings_start:total_size])
+        infos, addresses = words[0::2], words[1::2]
+        order = sorted(range(count), key=addresses.__getitem__)
+        name_offsets = array('I', (infos[position] & SYMBOL_NAME_OFFSET_MASK for position in order))
+        if max(name_offsets) >= len(strings) or strings[-1:] != b'\x00':
+            return None
+        try:
+            symbols = cls(array('I', (addresses[position] for position in order)), name_offsets,
+                          bytes(infos[position] >> 24 for position in order), strings, endian)
+        except UnicodeDecodeError:
+            return None
+        if "" in symbols.index:
+            return None
+        return symbols
+
+    @classmethod
+    def load(cls, path, endian=None):
+        with open(path, 'rb') as f:
+            return cls.parse(f.read(), endian)
+
+    def name(self, name_offset):
+        return self.strings[name_offset:self.strings.index(b'\x00', name_offset)].decode('ascii')
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __getitem__(self, position):
+        return Symbol(self.name(self.name_offsets[position]), self.addresses[position], self.types[position])
+
+    def __iter__(self):
+        return (self[position] for position in range(len(self)))
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def symbol_at(self, address):
+        """
+        返回地址不大于 address 的最后一个符号（即 address 所在的函数或变量），address 在所有符号之前时返回 None
+        """
+        position = bisect_right(self.addresses, address) - 1
+        return self[position] if position >= 0 else None
+
+    def address_of(self, name):
+        """
+        按名字查地址，没有该符号时抛出 KeyError
+        """
+        return self.addresses[self.index[name]]
+
+    def export(self, paths):
+        """
+        paths 为 {格式: 路径}，格式为 SYMBOL_EXPORT_FORMATS 之一；按地址顺序只遍历一遍索引，同时写出所有格式
+        """
+        with contextlib.ExitStack() as stack:
+            files = {fmt: stack.enter_context(open(path, 'w', encoding='utf-8', newline='')) for fmt, path in paths.items()}
+            csv_writer = csv.writer(files['csv']) if 'csv' in files else None
+            scripts = [files[fmt] for fmt in SYMBOL_SCRIPT_TEMPLATES if fmt in files]
+            if 'json' in files:
+                files['json'].write(f'{{"endian": "{self.endian}", "count": {len(self)}, "symbols": [')
+            if csv_writer:
+                csv_writer.writerow(["name", "address", "type", "function"])
+            for fmt, (header, _) in SYMBOL_SCRIPT_TEMPLATES.items():
+                if fmt in files:
+                    files[fmt].write(header)
+            for position, symbol in enumerate(self):
+                # 名字只含 ASCII，加引号转义后既是 JSON 字符串也是 Python 字符串字面量
+                quoted_name = json.dumps(symbol.name)
+                if 'json' in files:
+                    files['json'].write(f'{"," if position else ""}\n{{"name": {quoted_name}, "address": {symbol.address}, '
+                                        f'"type": {symbol.type}, "function": {"true" if symbol.is_function else "false"}}}')
+                if csv_writer:
+                    csv_writer.writerow([symbol.name, f"0x{symbol.address:08X}", f"0x{symbol.type:02X}", int(symbol.is_function)])
+                if scripts:
+                    line = f"    (0x{symbol.address:08X}, {quoted_name}, {symbol.is_function}),\n"
+                    for f in scripts:
+                        f.write(line)
+            if 'json' in files:
+                files['json'].write("\n]}\n")
+            for fmt, (_, footer) in SYMBOL_SCRIPT_TEMPLATES.items():
+                if fmt in files:
+                    files[fmt].write(footer)
+
+def export_symbol_table(symbol_table_path, formats=SYMBOL_EXPORT_FORMATS):
+    """
+    解析 SYMBOL_Table，在其旁边写出各格式的导出文件（SYMBOL_Table.json、SYMBOL_Table_ida.py 等），
+    返回 (符号数, {格式: 路径})；格式无法识别时只保留原始的 SYMBOL_Table，返回 (None, {})
+    """
+    symbols = SymbolTable.load(symbol_table_path)
+    if symbols is None:
+        logger.warning("\033[93m[!]符号表的格式无法识别，只保留原始的 SYMBOL_Table\033[0m")
+        return None, {}
+    paths = {fmt: symbol_table_path + SYMBOL_EXPORT_SUFFIXES[fmt] for fmt in formats}
+    symbols.export(paths)
+    logger.info(f"\033[92m[+]符号表中有 {len(symbols)} 个符号" + (f"，已导出为: {', '.join(paths.values())}" if paths else "") + "\033[0m")
+    return len(symbols), paths
+
+# LZMA alone 格式头部：属性字节(lc/lp/pb)、4字节字典大小、8字节解压后大小（全 FF 表示未知），均为小端。
+# 与 binwalk 的签名一样收紧以减少误报：属性字节须为合法的 lc/lp/pb（liblzma 另要求 lc+lp<=4），
+# 并排除 00（lc=lp=pb=0，编码器实际不会生成，却是数据中最常见的字节）；
+# 字典大小只接受编码器会写出的 2^n 或 2^n+2^(n-1)（4 KiB 到 64 MiB）
+LZMA_VALID_PROPERTIES = sorted({(pb * 5 + lp) * 9 + lc for lc in range(9) for lp in range(5) for pb in range(5) if lc + lp <= 4} - {0})
+LZMA_DICTIONARY_SIZES = sorted({1 << n for n in range(12, 27)} | {(1 << n) + (1 << (n - 1)) for n in range(12, 26)})
+LZMA_HEADER_PATTERN = re.compile(
+    b'[' + b''.join(re.escape(bytes([props])) for props in LZMA_VALID_PROPERTIES) + b']'
+    + b'(?:' + b'|'.join(re.escape(struct.pack('<I', size)) for size in LZMA_DICTIONARY_SIZES) + b')'
+)
+LZMA_HEADER_SIZE = 13
+LZMA_UNKNOWN_SIZE = 0xFFFFFFFFFFFFFFFF
+LZMA_MAX_DECLARED_SIZE = 0x40000000
+UIMAGE_MAGIC = b"\x27\x05\x19\x56"
+UIMAGE_HEADER = struct.Struct('>7I4B32s')
+# uImage 头中 CPU 架构编号：名称，以及 vxworks 固件上常见的端序
+UIMAGE_ARCHITECTURES = {
+    1: ("Alpha", "little"), 2: ("ARM", "little"), 3: ("Intel x86", "little"), 4: ("IA64", "little"),
+    5: ("MIPS", "big"), 6: ("MIPS64", "big"), 7: ("PowerPC", "big"), 8: ("IBM S390", "big"),
+    9: ("SuperH", "little"), 10: ("SPARC", "big"), 11: ("SPARC64", "big"), 12: ("M68K", "big"),
+}
+BINWALK_OUTPUT_HEADER = "\nDECIMAL       HEXADECIMAL     DESCRIPTION\n" + "-" * 80 + "\n"
+
+def find_lzma_headers(data):
+    """
+    快速签名扫描：找出所有形似 LZMA alone 头部（合法且非 00 的属性字节 + 2^n 或 2^n+2^(n-1) 的字典大小
+    + 未知或不超过 LZMA_MAX_DECLARED_SIZE 的解压后大小）的偏移，对应 binwalk 输出中的 "LZMA compressed data"
+    """
+    headers = []
+    for match in LZMA_HEADER_PATTERN.finditer(data):
+        offset = match.start()
+        if offset + LZMA_HEADER_SIZE > len(data):
+            break
+        uncompressed_size = struct.unpack_from('<Q', data, offset + 5)[0]
+        if uncompressed_size == LZMA_UNKNOWN_SIZE or 0 < uncompressed_size <= LZMA_MAX_DECLARED_SIZE:
+            headers.append(offset)
+    return headers
+
+# 解包时每个工作进程最多同时排队的疑似数据流个数
+LZMA_CARVE_INFLIGHT_PER_WORKER = 2
+
+def discard_carved_stream(output_dir, offset):
+    """
+    删除 offset 处数据流的解压结果及其 .7z（不存在时忽略）
+    """
+    carved_path = os.path.join(output_dir, offset_to_carved_name(offset))
+    for path in (carved_path, carved_path + ".7z"):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+def carve_lzma_streams(file_path, output_dir, header_offsets, workers=None):
+    """
+    按偏移顺序解压各个疑似 LZMA 数据流，返回有效数据流的信息列表。
+    落在已解出的数据流内部的签名是误报（压缩数据偶然形似头部），在提交给进程池之前就跳过，不去解压；
+    为此任务按偏移顺序提交和收取，同时在途的任务不超过 工作者数*LZMA_CARVE_INFLIGHT_PER_WORKER 个。
+    在途期间前面的数据流还没有解完，这些任务返回后仍按偏移顺序复查，落在前一个数据流内部的结果被删除
+    """
+    carve = partial(carve_lzma_stream, file_path, output_dir)
+    streams = []
+    stream_end = -1
+
+    def accept(stream):
+        nonlocal stream_end
+        if stream is None:
+            return
+        if stream['offset'] < stream_end:
+            discard_carved_stream(output_dir, stream['offset'])
+            return
+        streams.append(stream)
+        stream_end = stream['end']
+
+    def carve_serially():
+        for offset in header_offsets:
+            if offset < stream_end:
+                # 进程池中途失败时可能留下了在途任务的结果
+                discard_carved_stream(output_dir, offset)
                 continue
+            accept(carve(offset))
+        return streams
 
-            # 检查是否包含 'bzero'，如果是则保存为符号表
-            if b"bzero" in decompressed_data:
-                # 修改符号表保存路径为上一层目录，去掉最后的 '_xxx.extracted' 部分
-                base_output_path = re.sub(r'_[^/\\]+\.extracted$', '', output_path)
-                symbol_table_path = os.path.join(base_output_path, "SYMBOL_Table")
-                # 确保符号表保存的父目录存在
-                os.makedirs(os.path.dirname(symbol_table_path), exist_ok=True)
-                with open(symbol_table_path, 'wb') as sym_file:
-                    sym_file.write(decompressed_data)
-                print(f"\033[92m[+]有符号表，已保存为: {symbol_table_path}\033[0m")
-                symbol_table_found = True
-                return symbol_table_path
-
-        if not symbol_table_found:
-            print("\033[92m[-]没有符号表\033[0m")
+    workers = min(get_worker_count(workers), len(header_offsets))
+    if workers <= 1:
+        return carve_serially()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            SPAWN_COUNTS['pool_workers'] += workers
+            pending = deque()
+            for offset in header_offsets:
+                # 先按顺序收取已经完成（或在途已满时最早提交）的任务，推进已解出的范围
+                while pending and (len(pending) >= workers * LZMA_CARVE_INFLIGHT_PER_WORKER or pending[0].done()):
+                    accept(pending.popleft().result())
+                if offset < stream_end:
+                    continue
+                pending.append(executor.submit(carve, offset))
+            while pending:
+                accept(pending.popleft().result())
+        return streams
+    except (OSError, NotImplementedError, BrokenProcessPool) as e:
+        logger.warning(f"无法使用进程池（{e}），改为串行处理")
+        streams.clear()
+        stream_end = -1
+        return carve_serially()
+
+def carve_lzma_stream(file_path, output_dir, offset):
+    """
+    流式解压 offset 处的一个 LZMA 数据流，按 binwalk 的布局写出：
+    <十六进制偏移> 为解压结果，<十六进制偏移>.7z 为对应的压缩数据。供进程池调用。
+    一个字节都解不出来时视为误报，不留下文件并返回 None；
+    否则返回该数据流的信息字典（数据流中途损坏时保留已解出的部分，与 binwalk 一致）。
+    """
+    carved_path = os.path.join(output_dir, offset_to_carved_name(offset))
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        properties = data[offset]
+        dictionary_size, uncompressed_size = struct.unpack_from('<IQ', data, offset + 1)
+        max_output = LZMA_MAX_OUTPUT_SIZE if uncompressed_size == LZMA_UNKNOWN_SIZE else uncompressed_size
+        reader = LZMABlockReader(data, offset, len(data), max_output, format=lzma.FORMAT_ALONE)
+        with open(carved_path, 'wb') as out:
+            try:
+                for output in reader:
+                    out.write(output)
+            except lzma.LZMAError:
+                pass
+        if reader.total_output == 0:
+            os.remove(carved_path)
             return None
-    
-    finally:
-        # 清理 tmp_ 目录
-        shutil.rmtree(tmp_dir)
+
+        stream_end = reader.consumed_end
+        with open(carved_path + ".7z", 'wb') as out:
+            for position in range(offset, stream_end, LZMA_OUTPUT_CHUNK_SIZE):
+                out.write(data[position:min(position + LZMA_OUTPUT_CHUNK_SIZE, stream_end)])
+
+    return {
+        'offset': offset,
+        'end': stream_end,
+        'properties': properties,
+        'dictionary_size': dictionary_size,
+        'uncompressed_size': -1 if uncompressed_size == LZMA_UNKNOWN_SIZE else uncompressed_size,
+        'written': reader.total_output,
+    }
+
+def describe_uimage_header(data, offset):
+    """
+    解析 uImage 头，返回 (binwalk 风格的描述, 根据 CPU 架构推测的端序)；不是合法的 uImage 头时返回 None
+    """
+    if offset + UIMAGE_HEADER.size > len(data):
+        return None
+    (_, header_crc, timestamp, image_size, load_address, entry_point, data_crc,
+     os_type, architecture, image_type, compression, image_name) = UIMAGE_HEADER.unpack_from(data, offset)
+    if architecture not in UIMAGE_ARCHITECTURES:
+        return None
+    cpu, endian = UIMAGE_ARCHITECTURES[architecture]
+    created = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(timestamp))
+    name = image_name.split(b'\x00', 1)[0].decode('ascii', 'ignore')
+    description = (
+        f"uImage header, header size: 64 bytes, header CRC: 0x{header_crc:X}, created: {created}, "
+        f"image size: {image_size} bytes, Data Address: 0x{load_address:X}, Entry Point: 0x{entry_point:X}, "
+        f"data CRC: 0x{data_crc:X}, CPU: {cpu}, image name: \"{name}\""
+    )
+    return description, endian
+
+def format_binwalk_line(offset, description):
+    """
+    按 binwalk 的列宽格式化一行扫描结果
+    """
+    return f"{offset:<14d}{'0x%X' % offset:<16}{description}\n"
+
+def run_native_extract(file_path, workers=None, output_dir=None):
+    """
+    内置的解包后端，替代 binwalk -Me：签名扫描找出所有 LZMA 数据流，在进程池上并行解压，
+    按 binwalk 的目录布局（vxfile_xxx/_xxx.bin.extracted/<十六进制偏移>）写出，
+    同时生成与 binwalk 扫描输出格式一致的文本，供后续流程解析。
+    与 binwalk 的 -M 不同，不会对解压结果再递归解包。
+    参数:
+    file_path: vxworks固件文件路径或 FirmwareImage（解压进程仍按路径各自映射）
+    output_dir: 输出目录，默认为 vxfile_ + 固件文件名
+    返回: (扫描输出文本, 解压目录, 端序, 解出的数据流个数)；没有找到任何 LZMA 数据流时扫描输出中只有表头
+    """
+    with open_firmware_image(file_path) as image:
+        return native_extract_image(image, workers, output_dir)
+
+def native_extract_image(image, workers=None, output_dir=None):
+    """
+    run_native_extract 的实现，签名扫描使用 image 上缓存的 uImage 头和 LZMA 头部索引
+    """
+    file_path = image.path
+    output_dir = output_dir or get_default_output_dir(file_path)
+    extracted_subdir = os.path.join(output_dir, f"_{os.path.basename(file_path)}.extracted")
+
+    lines = []
+    endian = "unknown"
+    uimage = image.uimage_header()
+    if uimage:
+        lines.append((uimage[0], uimage[1]))
+        endian = uimage[2]
+
+    header_offsets = image.lzma_header_offsets()
+    logger.info(f"签名扫描找到 {len(header_offsets)} 个疑似 LZMA 数据流")
+
+    # 判断输出目录是否已经存在，防止重复解包
+    if os.path.exists(extracted_subdir):
+        logger.info(f"输出目录 {output_dir} 已存在，跳过解包。")
+        logger.info(f"使用已有解压目录：{extracted_subdir}")
+        streams = []
+        for offset in header_offsets:
+            carved_path = os.path.join(extracted_subdir, offset_to_carved_name(offset))
+            if os.path.isfile(carved_path):
+                properties, dictionary_size, uncompressed_size = struct.unpack_from('<BIQ', image.data, offset)
+                streams.append({
+                    'offset': offset,
+                    'properties': properties,
+                    'dictionary_size': dictionary_size,
+                    'uncompressed_size': -1 if uncompressed_size == LZMA_UNKNOWN_SIZE else uncompressed_size,
+                })
+    else:
+        logger.info("开始使用内置 LZMA 解包后端解包文件...")
+        os.makedirs(extracted_subdir, exist_ok=True)
+        # 落在已解出数据流内部的签名是误报，不解压
+        streams = carve_lzma_streams(file_path, extracted_subdir, header_offsets, workers)
+        logger.info(f"内置后端解出 {len(streams)} 个 LZMA 数据流")
+
+    for stream in streams:
+        lines.append((stream['offset'], (
+            f"LZMA compressed data, properties: 0x{stream['properties']:02X}, "
+            f"dictionary size: {stream['dictionary_size']} bytes, uncompressed size: {stream['uncompressed_size']} bytes"
+        )))
+    output = BINWALK_OUTPUT_HEADER + "".join(format_binwalk_line(offset, description) for offset, description in sorted(lines))
+    logger.debug(f"内置后端分析输出:\n{output}")
+
+    logger.info(f"检测到的端序：{endian}")
+    if endian == "unknown":
+        logger.warning(f"注意！未检测到端序字样，假定为Vxworks更一般的big")
+        endian = "big"
+
+    return output, extracted_subdir, endian, len(streams)
+
 
 def find_max_uncompressed_offset(binwalk_output):
     # 正则表达式匹配每一行包含偏移和uncompressed size的信息,最大的那个解压后大小的文件就是主程序，返回其偏移量
@@ -938,59 +3375,945 @@ def find_max_uncompressed_offset(binwalk_output):
 
     return max_offset
 
-def main(file_path,fuzzymode):
-    # 检查 binwalk 是否安装
-    check_binwalk_installed()
+# 分阶段统计的处理阶段，按 run_extraction 中的依赖顺序排列
+PROFILE_STAGES = (
+    "extract", "symbol_table", "check_encrypted", "web_names", "find_table_file",
+    "locate_offset", "decode_table", "choose_offset", "restore",
+)
+DEFAULT_PROFILE_REPORT = "vxfile_profile.json"
+
+def read_process_io():
+    """
+    读取 /proc/self/io 中的 (rchar, read_bytes)，不支持时返回 (None, None)
+    """
     try:
-        # 运行 binwalk 并获取解压目录
-        binwalk_shell_output, vxfile_directory, endian = run_binwalk_extract(file_path)
-        function_offset_table = extract_function_table(file_path,vxfile_directory)
-        main_program_offset = find_max_uncompressed_offset(binwalk_shell_output)
-        main_program_name = str(main_program_offset).lstrip("0x").upper()
-        print(f"\033[92m主程序位于{vxfile_directory}/{main_program_name}\033[0m")
-        check_crypted_fileoffset_table(vxfile_directory)
-        
-        # 有些固件直接就在本身就有文件偏移表了,会省不少功夫，如C80v1
-        firm_itself_have_the_table = check_if_firmware_itself_have_table(file_path)
-        if firm_itself_have_the_table:
-            best_matching_file = file_path
-        # 大多数固件的文件偏移表还是在解包的内容里面的
+        with open('/proc/self/io', 'r') as f:
+            fields = dict(line.split(':', 1) for line in f.read().splitlines() if ':' in line)
+        return int(fields['rchar']), int(fields['read_bytes'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+def get_resource_usage():
+    """
+    返回本进程与已回收子进程的 getrusage 结果，不支持 resource 模块的平台上返回 (None, None)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    return resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+
+def reset_peak_rss():
+    """
+    通过 /proc/self/clear_refs 重置本进程的峰值 RSS(VmHWM)，成功时返回 True
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def read_peak_rss_kb():
+    """
+    本进程的峰值 RSS（KB）：优先读取 /proc/self/status 的 VmHWM，其次为 getrusage 的 ru_maxrss
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    usage_self, _ = get_resource_usage()
+    if usage_self is None:
+        return None
+    return usage_self.ru_maxrss // 1024 if sys.platform == 'darwin' else usage_self.ru_maxrss
+
+# 分阶段统计中按整个进程计量的指标（并发执行时包含同时运行的其他阶段），
+# 以及峰值 RSS 的统计范围：按阶段重置 / 与其他阶段重叠 / 进程启动以来，依次由准确到粗略
+PROCESS_WIDE_METRICS = (
+    'cpu_time', 'children_cpu_time', 'bytes_read', 'storage_bytes_read', 'major_faults',
+    'children_storage_bytes_read', 'subprocesses', 'pool_workers', 'peak_rss_kb',
+)
+PEAK_RSS_SCOPES = ('stage', 'overlapping', 'process')
+
+# 正在被剖析的阶段的 cProfile.Profile；run_in_thread 把上下文带进工作线程，在其中同样开启剖析
+PROFILED_STAGE = contextvars.ContextVar('PROFILED_STAGE', default=None)
+
+def call_in_profiled_stage(func, *args):
+    cprofile = PROFILED_STAGE.get()
+    if cprofile is None:
+        return func(*args)
+    try:
+        cprofile.enable()
+    except ValueError:
+        # Python 3.12 起 cProfile 基于 sys.monitoring，已经对所有线程生效
+        return func(*args)
+    try:
+        return func(*args)
+    finally:
+        cprofile.disable()
+
+class StageProfiler:
+    """
+    记录每个处理阶段的墙钟时间、CPU 时间、读取字节数、启动的子进程数和峰值 RSS，可用 cProfile 剖析指定阶段；
+    同一阶段分几段执行时各项累加。
+    - cpu_time 为本进程（含所有线程），children_cpu_time 为该阶段内结束的子进程（外部命令、进程池工作进程）
+    - bytes_read 为 /proc/self/io 的 rchar，只统计 read 类系统调用；mmap 读入的数据体现在 major_faults，
+      子进程的读取量为 getrusage 块输入数换算的 children_storage_bytes_read
+    - 支持 /proc/self/clear_refs 的 linux 上峰值 RSS 按阶段重置，否则为进程启动以来的峰值（peak_rss_scope 标明）
+    当前平台拿不到的指标记为 None。
+    除 wall_time 外的指标都是进程级的（PROCESS_WIDE_METRICS），阶段并发执行（scheduling 为 concurrent）时会包含同时运行的其他阶段：
+    每个阶段的 overlapping_stages 记录与它在时间上重叠过的阶段，这些阶段的进程级指标不能单独归因，合计中也会重复计入；
+    有其他阶段正在执行时不重置峰值 RSS（否则会抹掉它们的峰值），重叠阶段的 peak_rss_scope 为 overlapping。
+    需要逐阶段准确的数字时让各阶段依次执行（scheduling 为 serial，--profile / --profile-stage 时即如此）；
+    cProfile 同样是进程级的，剖析时总是依次执行。
+    """
+
+    def __init__(self, profile_stage=None, profile_output=None):
+        self.stages = {}
+        self.profile_stage = profile_stage
+        self.profile_output = profile_output or f"vxfile_profile_{profile_stage}.pstats"
+        self.profile_path = None
+        self.cprofile = cProfile.Profile() if profile_stage else None
+        # 增量重跑时沿用了上次结果的阶段
+        self.reused = []
+        # 各阶段是依次执行还是并发执行（由 run_extraction 设置），以及正在执行的阶段 -> 与之重叠过的其他阶段
+        self.scheduling = "concurrent"
+        self.active = {}
+
+    @staticmethod
+    def snapshot():
+        times = os.times()
+        rchar, read_bytes = read_process_io()
+        usage_self, usage_children = get_resource_usage()
+        return {
+            'wall': time.perf_counter(),
+            'cpu': time.process_time(),
+            'children_cpu': times.children_user + times.children_system,
+            'rchar': rchar,
+            'read_bytes': read_bytes,
+            'major_faults': usage_self.ru_majflt if usage_self else None,
+            'children_inblock': usage_children.ru_inblock if usage_children else None,
+            'subprocesses': SPAWN_COUNTS['subprocesses'],
+            'pool_workers': SPAWN_COUNTS['pool_workers'],
+        }
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        overlapping = set(self.active)
+        for other in overlapping:
+            self.active[other].add(name)
+        self.active[name] = overlapping
+        if overlapping:
+            peak_scope = 'overlapping'
         else:
-            # 尝试提取目标目录中的web资源文件名以寻找偏移表
-            contained_filenames = extract_web_source_filenames(vxfile_directory)        
-            if contained_filenames and not fuzzymode:
-            # 提取web资源文件名成功，那就使用精确的方案
-                best_matching_file = find_binary_matches(vxfile_directory, contained_filenames)
-            else:
-                # 提取web资源文件名失败，那就转而使用次精确的字符串匹配方案
-                print("未找到任何web资源文件名，或用户指定使用fuzzy模糊搜索模式，可能固件没有http服务，转而使用次精确的字符串匹配方案")
-                best_matching_file = fuzzy_search_file_contain_table(vxfile_directory)
-        
-        infile_offset = find_files_offset_table(best_matching_file)
-        mode = decide_extract_mode(file_path, infile_offset, endian)
-       
-        # 寻找是不是那种很难找到符号表的固件，方法是，找有没有"Decryption for config.bin"字样
-        if mode == 1:
-            file_info = extract_file_info_type1(file_path, infile_offset, endian)
-        if mode == 2:
-            file_info = extract_file_info_type2(best_matching_file, infile_offset, endian)
+            peak_scope = 'stage' if reset_peak_rss() else 'process'
+        before = self.snapshot()
+        profiling = name == self.profile_stage
+        if profiling:
+            self.cprofile.enable()
+            # 阶段内交给线程池的计算（run_in_thread）也要剖析
+            token = PROFILED_STAGE.set(self.cprofile)
+        stage_token = LOG_STAGE.set(name)
+        try:
+            yield
+        finally:
+            LOG_STAGE.reset(stage_token)
+            overlapping = self.active.pop(name)
+            if overlapping and peak_scope == 'stage':
+                peak_scope = 'overlapping'
+            if profiling:
+                PROFILED_STAGE.reset(token)
+                self.cprofile.disable()
+                self.cprofile.dump_stats(self.profile_output)
+                self.profile_path = os.path.abspath(self.profile_output)
+            after = self.snapshot()
 
-        
-        # 提取binwalk输出结果里面可能的项，作为文件系统偏移
-        maybe_filesystem_offsets = extract_offsets_from_output(binwalk_shell_output)
+            def delta(key, scale=1):
+                if before[key] is None or after[key] is None:
+                    return None
+                return (after[key] - before[key]) * scale
+
+            metrics = {
+                'wall_time': round(delta('wall'), 6),
+                'cpu_time': round(delta('cpu'), 6),
+                'children_cpu_time': round(delta('children_cpu'), 6),
+                'bytes_read': delta('rchar'),
+                'storage_bytes_read': delta('read_bytes'),
+                'major_faults': delta('major_faults'),
+                'children_storage_bytes_read': delta('children_inblock', 512),
+                'subprocesses': delta('subprocesses'),
+                'pool_workers': delta('pool_workers'),
+                'peak_rss_kb': read_peak_rss_kb(),
+                'peak_rss_scope': peak_scope,
+                'overlapping_stages': sorted(overlapping),
+            }
+            # 同一阶段分几段执行时累加
+            previous = self.stages.get(name)
+            if previous:
+                for key, value in metrics.items():
+                    if key == 'peak_rss_kb':
+                        metrics[key] = max(filter(None, (value, previous[key])), default=None)
+                    elif key == 'peak_rss_scope':
+                        metrics[key] = max(value, previous[key], key=PEAK_RSS_SCOPES.index)
+                    elif key == 'overlapping_stages':
+                        metrics[key] = sorted(set(value) | set(previous[key]))
+                    else:
+                        metrics[key] = None if value is None or previous[key] is None else round(value + previous[key], 6)
+            self.stages[name] = metrics
+            logger.info(f"阶段 {name} 完成，耗时 {metrics['wall_time']:.3f}s",
+                        extra={'event': 'stage', 'fields': {'name': name, 'metrics': metrics}})
+
+    @property
+    def timings(self):
+        return {name: stage['wall_time'] for name, stage in self.stages.items()}
+
+    def report(self):
+        """
+        汇总为可写成 JSON 的字典：各阶段指标、合计，以及 cProfile 输出路径。
+        scheduling 和 process_wide_metrics 标明哪些指标在并发执行时包含了其他阶段
+        """
+        total = {}
+        for key in ('wall_time', 'cpu_time', 'children_cpu_time', 'bytes_read', 'storage_bytes_read',
+                    'major_faults', 'children_storage_bytes_read', 'subprocesses', 'pool_workers'):
+            values = [stage[key] for stage in self.stages.values()]
+            total[key] = None if any(value is None for value in values) else round(sum(values), 6)
+        peaks = [stage['peak_rss_kb'] for stage in self.stages.values() if stage['peak_rss_kb'] is not None]
+        total['peak_rss_kb'] = max(peaks, default=None)
+        _, usage_children = get_resource_usage()
+        total['children_peak_rss_kb'] = usage_children.ru_maxrss if usage_children else None
+        return {
+            'scheduling': self.scheduling,
+            'process_wide_metrics': list(PROCESS_WIDE_METRICS),
+            'stages': self.stages,
+            'total': total,
+            'profile': {'stage': self.profile_stage, 'pstats': self.profile_path} if self.profile_stage else None,
+            'reused': self.reused,
+        }
+
+def write_profile_report(report_path, file_path, metrics, error=None):
+    """
+    把一次处理的分阶段指标写成 JSON 报告
+    """
+    report = {
+        'firmware': os.path.abspath(file_path),
+        'status': 'failed' if error else 'ok',
+        'error': error,
+        'finished_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **metrics,
+    }
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    logger.info(f"分阶段统计已写入 {report_path}")
+
+@dataclasses.dataclass
+class ExtractionOptions:
+    """
+    extract() 的处理选项，含义与命令行选项一致。
+    verbose 为 False 时不在控制台输出各阶段的过程信息（只作用于本次调用的上下文，不改动 sys.stdout，多线程同时调用互不影响）。
+    profile_stage 为 PROFILE_STAGES 之一时用 cProfile 剖析该阶段，结果写入 profile_output（默认 vxfile_profile_<阶段>.pstats）。
+    output 不为 None 时把恢复的文件直接写入归档（路径或可写的二进制文件对象），不生成 result_vxworks_file 目录；
+    output_format 为 ARCHIVE_FORMATS 之一，默认按路径后缀推断，文件对象默认为 tar。
+    blob_store 不为 None 时把恢复的文件存入该目录下的内容寻址存储（BlobStore），
+    blob_layout 为 hardlink 时结果目录由指向存储对象的硬链接组成，为 manifest 时只写 blob_manifest.json。
+    incremental 为 True 时根据输出目录中的分阶段清单只重新执行输入变化了的阶段，为 False 时每次从头执行。
+    minifs_extractor 为 native 时 type2 (MINIFS) 固件按 chunk 表直接解压切分文件，找不到 chunk 数据时退回 carved；
+    为 carved 时与以前一样把偏移表项与解包切出的文件逐一匹配。
+    subprocess_timeout 为每条外部命令（binwalk、grep）的超时秒数，超时的命令会被杀掉，None 为不限。
+    symbol_exports 为解析符号表后在 SYMBOL_Table 旁边写出的导出格式（SYMBOL_EXPORT_FORMATS 的子集），为空时不解析。
+    serial_stages 为 True 时各阶段依次执行而不并发，分阶段统计中的进程级指标只属于该阶段（指定 profile_stage 时总是如此）。
+    """
+    fuzzymode: bool = False
+    materialize: str = "copy"
+    extractor: str = "native"
+    cache_dir: str = DEFAULT_CACHE_DIR
+    cache_size: int = DEFAULT_CACHE_SIZE
+    workers: int = None
+    verbose: bool = False
+    profile_stage: str = None
+    profile_output: str = None
+    output: object = None
+    output_format: str = None
+    blob_store: str = None
+    blob_layout: str = "hardlink"
+    incremental: bool = True
+    minifs_extractor: str = "native"
+    subprocess_timeout: float = None
+    symbol_exports: tuple = SYMBOL_EXPORT_FORMATS
+    serial_stages: bool = False
+
+@dataclasses.dataclass
+class ExtractionResult:
+    """
+    extract() 的处理结果，路径均相对于调用时的当前工作目录（固件路径本身按传入的形式保留）。
+    file_map 为 {文件名: 相对文件系统偏移}，timings 为各阶段耗时（秒），metrics 为 StageProfiler 的完整统计。
+    archive 为写出的归档路径（写入文件对象时为 "-"），archived_files 为写入归档的文件数；未使用归档输出时均为 None。
+    blob_manifest 为使用内容寻址存储时写出的清单路径。
+    symbol_count 为符号表中的符号数（没有符号表或格式无法识别时为 None），symbol_exports 为 {导出格式: 路径}。
+    """
+    firmware_path: str
+    extracted_dir: str
+    endian: str
+    main_program: str
+    symbol_table: str
+    offset_table_file: str
+    offset_table_offset: int
+    offset_table_mode: int
+    filesystem_offset: int
+    file_map: dict
+    timings: dict
+    metrics: dict = dataclasses.field(default_factory=dict)
+    archive: str = None
+    archived_files: int = None
+    blob_manifest: str = None
+    symbol_count: int = None
+    symbol_exports: dict = dataclasses.field(default_factory=dict)
+
+    def to_dict(self, include_file_map=True):
+        result = dataclasses.asdict(self)
+        if not include_file_map:
+            result.pop("file_map")
+            result["file_count"] = len(self.file_map)
+        return result
+
+def extract(file_path, options=None, **overrides):
+    """
+    库接口：完整处理一个固件，返回 ExtractionResult。
+    失败时抛出 VxfileError 的子类（选项不合法时抛出 ValueError），不会退出进程；
+    处理过程中抛出的异常带有 metrics 属性，记录出错前各阶段的统计。
+    overrides 可直接覆盖 options 中的个别字段，如 extract(path, fuzzymode=True)。
+    各阶段在内部的事件循环中并发调度（asyncio.run），因此不能在正在运行的事件循环中直接调用，
+    异步代码中请用 asyncio.to_thread(extract, ...)。
+    过程信息经由 logger 输出，级别和 JSON Lines 事件流见 configure_logging；事件中带有固件路径和所在阶段。
+    """
+    options = dataclasses.replace(options or ExtractionOptions(), **overrides)
+    if options.materialize not in MATERIALIZE_METHODS:
+        raise ValueError(f"未知的落盘方式: {options.materialize}，可选: {', '.join(MATERIALIZE_METHODS)}")
+    if options.extractor not in EXTRACTORS:
+        raise ValueError(f"未知的解包后端: {options.extractor}，可选: {', '.join(EXTRACTORS)}")
+    if options.minifs_extractor not in MINIFS_EXTRACTORS:
+        raise ValueError(f"未知的 MINIFS 提取方式: {options.minifs_extractor}，可选: {', '.join(MINIFS_EXTRACTORS)}")
+    if options.subprocess_timeout is not None and options.subprocess_timeout <= 0:
+        raise ValueError(f"外部命令的超时时间必须大于 0: {options.subprocess_timeout}")
+    unknown_exports = [fmt for fmt in options.symbol_exports if fmt not in SYMBOL_EXPORT_FORMATS]
+    if unknown_exports:
+        raise ValueError(f"未知的符号表导出格式: {', '.join(unknown_exports)}，可选: {', '.join(SYMBOL_EXPORT_FORMATS)}")
+    if options.profile_stage and options.profile_stage not in PROFILE_STAGES:
+        raise ValueError(f"未知的阶段: {options.profile_stage}，可选: {', '.join(PROFILE_STAGES)}")
+    if options.output is not None:
+        resolve_archive_format(options.output, options.output_format)
+    if options.blob_store:
+        if options.output is not None:
+            raise ValueError("归档输出和内容寻址存储不能同时使用")
+        if options.blob_layout not in BLOB_LAYOUTS:
+            raise ValueError(f"未知的结果目录形式: {options.blob_layout}，可选: {', '.join(BLOB_LAYOUTS)}")
+    profiler = StageProfiler(options.profile_stage, options.profile_output)
+    firmware_token = LOG_FIRMWARE.set(str(file_path))
+    console_token = LOG_CONSOLE.set(options.verbose)
+    try:
+        return asyncio.run(run_extraction(file_path, options, profiler))
+    except Exception as e:
+        e.metrics = profiler.report()
+        raise
+    finally:
+        LOG_CONSOLE.reset(console_token)
+        LOG_FIRMWARE.reset(firmware_token)
+
+class StageGraph:
+    """
+    处理阶段的依赖图及其 asyncio 调度器。
+    add() 登记一个阶段：func 为协程函数，参数依次为 deps 中各阶段的结果，依赖必须先于它登记（因此不会成环）。
+    run() 时每个阶段在其依赖全部完成后立即启动，互不依赖的阶段同时运行，总耗时约为最长的一条依赖链；
+    lazy 的阶段只在被其他阶段通过 result() 请求时才执行。
+    任一阶段失败时取消其余仍在运行的阶段（其中的外部子进程随之被杀掉），run() 抛出最先发生的异常；
+    已经交给线程执行的计算无法中途停止，其结果在它结束后被丢弃。
+    serial 为 True 时按登记顺序逐个执行阶段，前一个完成后才启动下一个（分阶段统计需要各阶段互不重叠时使用）。
+    """
+
+    def __init__(self, serial=False):
+        self.stages = {}
+        self.tasks = {}
+        self.serial = serial
+
+    def add(self, name, func, deps=(), lazy=False):
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"阶段 {name} 依赖的阶段 {dep} 尚未登记")
+        self.stages[name] = (func, tuple(deps), lazy)
+
+    def start(self, name):
+        task = self.tasks.get(name)
+        if task is None:
+            func, deps, _ = self.stages[name]
+
+            async def run_stage():
+                # shield：一个下游阶段被取消时不会连带取消其他阶段也在等待的上游阶段
+                results = [await asyncio.shield(self.start(dep)) for dep in deps]
+                return await func(*results)
 
-        if maybe_filesystem_offsets:
-            for testing_filesys_offset in maybe_filesystem_offsets:
-                print(f"正在尝试以:{hex(testing_filesys_offset)}作为文件系统偏移")
-                if(rename_extracted_files(file_info, vxfile_directory, testing_filesys_offset,binwalk_shell_output)==True):
+            task = self.tasks[name] = asyncio.ensure_future(run_stage())
+        return task
+
+    async def result(self, name):
+        """
+        等待阶段 name 完成并返回其结果，lazy 的阶段在此时启动
+        """
+        return await asyncio.shield(self.start(name))
+
+    async def run(self):
+        """
+        执行所有非 lazy 的阶段，返回 {阶段名: 结果}（只含实际执行了的阶段）
+        """
+        try:
+            for name, (_, _, lazy) in self.stages.items():
+                if not lazy:
+                    task = self.start(name)
+                    if self.serial:
+                        await task
+            # 执行过程中可能启动 lazy 的阶段，直到没有新的任务为止
+            while True:
+                tasks = list(self.tasks.values())
+                await asyncio.gather(*tasks)
+                if len(tasks) == len(self.tasks):
                     break
+        except BaseException:
+            for task in self.tasks.values():
+                task.cancel()
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+            raise
+        return {name: task.result() for name, task in self.tasks.items()}
+
+def open_result_sink(options, image, extracted_dir):
+    """
+    按选项创建恢复文件的输出后端：ArchiveSink、BlobStoreSink，或 None（普通的结果目录）
+    """
+    if options.output is not None:
+        return ArchiveSink(options.output, options.output_format)
+    if options.blob_store:
+        output_dir = get_parent_directory(extracted_dir)
+        manifest_path = os.path.join(output_dir, BLOB_MANIFEST_NAME)
+        # 同一固件在不同输出目录中各自登记引用，在同一目录中重跑时替换原来的引用
+        ref_name = f"{hash_file(image)[:16]}-{hashlib.sha1(os.path.abspath(manifest_path).encode('utf-8')).hexdigest()[:8]}"
+        return BlobStoreSink(BlobStore(options.blob_store), os.path.join(output_dir, RESULT_DIR_NAME), manifest_path,
+                             ref_name, options.blob_layout, get_image_path(image))
+    return None
+
+async def run_extraction(file_path, options, profiler):
+    """
+    extract() 的处理流程：解包、提取符号表、定位并解析文件偏移表、按文件名恢复文件。
+    各阶段（见 PROFILE_STAGES）组成依赖图，由 StageGraph 并发调度：只依赖固件本身的符号表提取、
+    固件自带偏移表的检查与解包同时进行，解包完成后加密检查与偏移表查找同时进行，其后各阶段依次执行。
+    外部命令（binwalk、grep）以异步子进程执行，其余计算在线程中执行；每个阶段都由 profiler 记录统计。
+    固件只打开并映射一次，得到的 FirmwareImage 在各阶段之间共享。
+    options.incremental 为 True 时各阶段的输入指纹和输出记录在输出目录的分阶段清单中（见 StageManifest），
+    重跑时只执行输入变化了的阶段
+    """
+    workers = options.workers
+    timeout = options.subprocess_timeout
+    with FirmwareImage(file_path) as image:
+        content_hash = hash_file(image)
+        output_dir = resolve_output_dir(file_path, content_hash)
+        manifest = StageManifest(os.path.join(output_dir, STAGE_MANIFEST_NAME), options.incremental, profiler.reused.append)
+        extracted_subdir = os.path.join(output_dir, f"_{os.path.basename(file_path)}.extracted")
+        # 清单中有上次解包的记录
+        extracted_before = manifest.status("extract") is not None
+        # cProfile 和进程级的指标无法区分同时运行的阶段，需要准确的分阶段统计时依次执行
+        serial = options.serial_stages or bool(options.profile_stage)
+        profiler.scheduling = "serial" if serial else "concurrent"
+        graph = StageGraph(serial)
+
+        async def run_stage(name, key, compute, verify=None):
+            """
+            在线程中执行阶段 name 的计算 compute()，输入没有变化时沿用清单中上次的输出
+            """
+            with profiler.stage(name):
+                return await manifest.run_async(name, key, lambda: run_in_thread(compute), verify)
+
+        async def stage_extract():
+            with profiler.stage("extract"):
+                extract_key = manifest.key("extract", content_hash, options.extractor)
+
+                async def run_extract():
+                    if extracted_before and os.path.isdir(extracted_subdir):
+                        # 上次的解包结果不能沿用（解包中途被打断、解压目录被改动或解包选项变了），
+                        # 已有的解压目录会被误当作已解包而跳过，先删除
+                        logger.info(f"上次的解包结果不能沿用，删除解压目录 {extracted_subdir} 后重新解包")
+                        await run_in_thread(shutil.rmtree, extracted_subdir)
+                    # 解包并获取解压目录（binwalk 后端会先检查 binwalk 是否安装）
+                    scan_output, extracted_dir, endian = await run_firmware_extract_async(
+                        image, options.extractor, workers, options.cache_dir, options.cache_size, output_dir, timeout)
+                    return {'scan_output': scan_output, 'extracted_dir': extracted_dir, 'endian': endian,
+                            'tree': await run_in_thread(get_tree_fingerprint, extracted_dir)}
+
+                extracted = await manifest.run_async("extract", extract_key, run_extract,
+                                                     lambda outputs: os.path.isdir(outputs['extracted_dir']) and get_tree_fingerprint(outputs['extracted_dir']) == outputs['tree'])
+            image.endian = extracted['endian']
+            main_program_name = str(find_max_uncompressed_offset(extracted['scan_output'])).lstrip("0x").upper()
+            logger.info(f"\033[92m主程序位于{extracted['extracted_dir']}/{main_program_name}\033[0m")
+            # 下游阶段以解压目录的实际内容为输入，目录被改动过（如手动放入解密后的偏移表）时它们会重新执行
+            return dict(extracted, main_program_name=main_program_name, tree_key=manifest.key("tree", extract_key, extracted['tree']))
+
+        async def stage_symbol_table():
+            # 符号表只取决于固件本身，写在输出目录中（解压目录的上一层），与解包同时进行
+            # 找到后立即解析为索引并一次写出各格式的导出文件
+            def run_symbol_table():
+                path = extract_function_table(image, extracted_subdir, workers)
+                count, exports = export_symbol_table(path, symbol_exports) if path and symbol_exports else (None, {})
+                return {'path': path, 'size': os.path.getsize(path) if path else None, 'count': count, 'exports': exports}
+
+            symbol_exports = tuple(options.symbol_exports)
+            return await run_stage("symbol_table", manifest.key("symbol_table", content_hash, extracted_subdir, symbol_exports), run_symbol_table,
+                                   lambda outputs: outputs['path'] is None or (os.path.isfile(outputs['path']) and os.path.getsize(outputs['path']) == outputs['size']
+                                                                               and all(os.path.isfile(path) for path in outputs['exports'].values())))
+
+        async def stage_self_table():
+            # 有些固件直接就在本身就有文件偏移表了,会省不少功夫，如C80v1。与解包同时检查；
+            # 清单中已有偏移表查找的完成记录时多半会沿用，不做预先检查
+            if manifest.status("find_table_file") == "done":
+                return None
+            with profiler.stage("find_table_file"):
+                return await run_in_thread(check_if_firmware_itself_have_table, image)
+
+        async def stage_check_encrypted(extracted):
+            async def run_check_encrypted():
+                await check_crypted_fileoffset_table_async(extracted['extracted_dir'], timeout)
+                return {}
+
+            with profiler.stage("check_encrypted"):
+                await manifest.run_async("check_encrypted", manifest.key("check_encrypted", extracted['tree_key']), run_check_encrypted)
+
+        async def stage_web_names(extracted):
+            with profiler.stage("web_names"):
+                # 尝试提取目标目录中的web资源文件名以寻找偏移表
+                return await extract_web_source_filenames_async(extracted['extracted_dir'], timeout)
+
+        async def stage_find_table_file(extracted, firm_itself_have_the_table):
+            vxfile_directory = extracted['extracted_dir']
+
+            async def run_find_table_file():
+                nonlocal firm_itself_have_the_table
+                if firm_itself_have_the_table is None:
+                    with profiler.stage("find_table_file"):
+                        firm_itself_have_the_table = await run_in_thread(check_if_firmware_itself_have_table, image)
+                if firm_itself_have_the_table:
+                    # None 表示偏移表就在固件本身中
+                    return {'file': None}
+                # 大多数固件的文件偏移表还是在解包的内容里面的
+                contained_filenames = await graph.result("web_names")
+                with profiler.stage("find_table_file"):
+                    if contained_filenames and not options.fuzzymode:
+                        # 提取web资源文件名成功，那就使用精确的方案
+                        best_matching_file = await run_in_thread(find_binary_matches, vxfile_directory, contained_filenames, workers)
+                    else:
+                        # 提取web资源文件名失败，那就转而使用次精确的字符串匹配方案
+                        logger.warning("未找到任何web资源文件名，或用户指定使用fuzzy模糊搜索模式，可能固件没有http服务，转而使用次精确的字符串匹配方案")
+                        best_matching_file = await run_in_thread(fuzzy_search_file_contain_table, vxfile_directory, workers)
+                if not best_matching_file:
+                    raise OffsetTableNotFoundError("找不到包含文件偏移表的文件，很可能该表已被加密或进一步压缩")
+                return {'file': best_matching_file}
+
+            find_key = manifest.key("find_table_file", extracted['tree_key'], options.fuzzymode)
+            try:
+                table_file = (await manifest.run_async("find_table_file", find_key, run_find_table_file))['file']
+            except OffsetTableNotFoundError:
+                # 与加密检查同时进行，偏移表被加密的固件优先报告为加密
+                await graph.result("check_encrypted")
+                raise
+            return {'file': image if table_file is None else table_file, 'key': find_key}
+
+        async def stage_locate_offset(extracted, found, _):
+            def run_locate_offset():
+                with open_firmware_image(found['file']) as table_source:
+                    infile_offset = find_files_offset_table(table_source)
+                    if infile_offset is None:
+                        raise OffsetTableNotFoundError(f"无法在 {get_image_path(found['file'])} 中定位文件偏移表")
+                    # 其余的结构化扫描候选留给 decode_table 在排在前面的候选解析不出文件时改试
+                    candidates = [[candidate.offset, candidate.mode, candidate.endian] for candidate in scan_offset_tables(table_source)]
+                    return {'offset': infile_offset, 'mode': decide_extract_mode(table_source, infile_offset, extracted['endian']), 'candidates': candidates}
+
+            locate_key = manifest.key("locate_offset", found['key'])
+            return dict(await run_stage("locate_offset", locate_key, run_locate_offset), key=locate_key)
+
+        async def stage_decode_table(extracted, found, located):
+            endian = extracted['endian']
+
+            def run_decode_table():
+                # 先解析排在最前的候选，解析不出任何文件时依次改试其余候选，不必重跑整个流程；
+                # 候选由 ToF 判断出了端序时以它为准
+                attempts = located['candidates'] or [[located['offset'], located['mode'], None]]
+                with open_firmware_image(found['file']) as table_source:
+                    for rank, (offset, mode, table_endian) in enumerate(attempts[:TABLE_CANDIDATE_ATTEMPTS]):
+                        if rank:
+                            logger.warning(f"没有解析出任何文件，改试偏移表候选 #{rank + 1}：偏移 {hex(offset)}，type{mode}")
+                        if mode == 1:
+                            file_info, table = extract_file_info_type1(table_source, offset, table_endian or endian), None
+                        else:
+                            file_info, table = extract_file_info_type2(table_source, offset, table_endian or endian, return_table=True)
+                        if file_info:
+                            break
+                return {'file_info': file_info, 'minifs': dataclasses.asdict(table) if table else None, 'offset': offset, 'mode': mode}
+
+            decode_key = manifest.key("decode_table", located['key'], endian)
+            decoded = await run_stage("decode_table", decode_key, run_decode_table)
+            minifs_table = MinifsTable(**decoded['minifs']) if decoded['minifs'] and options.minifs_extractor == "native" else None
+            return {'file_info': decoded['file_info'], 'minifs_table': minifs_table, 'offset': decoded['offset'], 'mode': decoded['mode'], 'key': decode_key}
+
+        async def stage_choose_offset(extracted, found, decoded):
+            minifs_table = decoded['minifs_table']
+
+            def run_choose_offset():
+                if minifs_table is not None:
+                    # MINIFS 有完整的 chunk 表时直接在固件（或偏移表所在文件）中定位 chunk 数据
+                    for source in dict.fromkeys((file_path, get_image_path(found['file']))):
+                        base = locate_minifs_chunks(image if source == file_path else source, minifs_table)
+                        if base is not None:
+                            return {'offset': base, 'minifs_source': source}
+                    logger.warning("没有找到 MINIFS 的 chunk 数据，改用按解包结果匹配文件系统偏移的方式")
+                # 提取binwalk输出结果里面可能的项，作为文件系统偏移
+                maybe_filesystem_offsets = extract_offsets_from_output(extracted['scan_output'])
+                if not maybe_filesystem_offsets:
+                    return {'offset': None, 'minifs_source': None}
+                # 先在内存中为每个候选偏移打分，选出最优的那个后只落盘一次
+                return {'offset': choose_filesystem_offset(decoded['file_info'], extracted['extracted_dir'], maybe_filesystem_offsets, extracted['scan_output']),
+                        'minifs_source': None}
+
+            choose_key = manifest.key("choose_offset", decoded['key'], extracted['tree_key'], options.minifs_extractor)
+            return dict(await run_stage("choose_offset", choose_key, run_choose_offset), key=choose_key)
+
+        async def stage_restore(extracted, decoded, chosen):
+            # 指定了归档输出时，恢复的文件直接流式写入归档；指定了内容寻址存储时存入存储
+            vxfile_directory = extracted['extracted_dir']
+            filesystem_offset, minifs_source = chosen['offset'], chosen['minifs_source']
+            result_dir = os.path.join(output_dir, RESULT_DIR_NAME)
+
+            def run_restore():
+                sink = open_result_sink(options, image, vxfile_directory)
+                count = None
+                try:
+                    if minifs_source is not None:
+                        # 内置 MINIFS 提取，文件直接由 chunk 解压切分得到，不经过解包结果
+                        restore_minifs_files(decoded['minifs_table'], image if minifs_source == file_path else minifs_source,
+                                             filesystem_offset, result_dir, workers, sink)
+                    elif filesystem_offset is not None:
+                        rename_extracted_files(decoded['file_info'], vxfile_directory, filesystem_offset, extracted['scan_output'], options.materialize, stop_on_misses=False, sink=sink)
+                finally:
+                    if sink is not None:
+                        count = sink.close()
+                if isinstance(sink, BlobStoreSink):
+                    return {'blob_manifest': sink.manifest_path, 'restored': count}
+                if isinstance(sink, ArchiveSink):
+                    return {'archive_format': sink.archive_format, 'restored': count}
+                return {'restored': len(list_tree_files(result_dir)) if os.path.isdir(result_dir) else 0}
+
+            def verify_restore(outputs):
+                if outputs.get('blob_manifest') and not os.path.isfile(outputs['blob_manifest']):
+                    return False
+                if options.blob_layout == "manifest" and options.blob_store:
+                    return True
+                return len(list_tree_files(result_dir)) == outputs['restored'] if os.path.isdir(result_dir) else outputs['restored'] == 0
+
+            if options.output is not None:
+                # 归档输出（可能是标准输出）每次都要重新写出
+                with profiler.stage("restore"):
+                    restored = await run_in_thread(run_restore)
+                archive_path = options.output if isinstance(options.output, str) else "-"
+                logger.info(f"\033[92m已将 {restored['restored']} 个恢复的文件写入 {restored['archive_format']} 归档：{archive_path}\033[0m")
+                return {'archive': archive_path, 'archived_files': restored['restored'], 'blob_manifest': None}
+            restore_key = manifest.key("restore", chosen['key'], options.materialize, options.blob_store, options.blob_layout)
+            restored = await run_stage("restore", restore_key, run_restore, verify_restore)
+            return {'archive': None, 'archived_files': None, 'blob_manifest': restored.get('blob_manifest')}
+
+        graph.add("extract", stage_extract)
+        graph.add("symbol_table", stage_symbol_table)
+        graph.add("self_table", stage_self_table)
+        graph.add("check_encrypted", stage_check_encrypted, ["extract"])
+        graph.add("web_names", stage_web_names, ["extract"], lazy=True)
+        graph.add("find_table_file", stage_find_table_file, ["extract", "self_table"])
+        graph.add("locate_offset", stage_locate_offset, ["extract", "find_table_file", "check_encrypted"])
+        graph.add("decode_table", stage_decode_table, ["extract", "find_table_file", "locate_offset"])
+        graph.add("choose_offset", stage_choose_offset, ["extract", "find_table_file", "decode_table"])
+        graph.add("restore", stage_restore, ["extract", "decode_table", "choose_offset"])
+        results = await graph.run()
+
+        extracted, symbol_table = results['extract'], results['symbol_table']
+        function_offset_table = symbol_table['path']
+        vxfile_directory, main_program_name = extracted['extracted_dir'], extracted['main_program_name']
+        decoded, restored = results['decode_table'], results['restore']
         if function_offset_table:
-            print(f"\033[92m[+]函数符号表也一并提取出来了，路径：{function_offset_table}\033[0m")
+            logger.info(f"\033[92m[+]函数符号表也一并提取出来了，路径：{function_offset_table}\033[0m")
         else:
-            print("没有找到函数符号表")
-        print(f"\033[92m主程序对应原来的文件{vxfile_directory}/{main_program_name}\033[0m") # 我没有偷懒0.0，这样更可靠吧
+            logger.info("没有找到函数符号表")
+        logger.info(f"\033[92m主程序对应原来的文件{vxfile_directory}/{main_program_name}\033[0m") # 我没有偷懒0.0，这样更可靠吧
+
+        result = ExtractionResult(
+            firmware_path=file_path,
+            extracted_dir=vxfile_directory,
+            endian=extracted['endian'],
+            main_program=os.path.join(vxfile_directory, main_program_name),
+            symbol_table=function_offset_table,
+            offset_table_file=get_image_path(results['find_table_file']['file']),
+            offset_table_offset=decoded['offset'],
+            offset_table_mode=decoded['mode'],
+            filesystem_offset=results['choose_offset']['offset'],
+            file_map={file_name: int(offset) for file_name, offset in decoded['file_info'].items()},
+            timings=profiler.timings,
+            metrics=profiler.report(),
+            symbol_count=symbol_table['count'],
+            symbol_exports=symbol_table['exports'],
+            **restored,
+        )
+        logger.info(f"处理完成：偏移表中共 {len(result.file_map)} 个文件",
+                    extra={'event': 'result', 'fields': {'result': result.to_dict(include_file_map=False)}})
+        return result
+
+def main(file_path,fuzzymode,materialize="copy",extractor="native",cache_dir=DEFAULT_CACHE_DIR,cache_size=DEFAULT_CACHE_SIZE,profile_report=None,profile_stage=None,output=None,output_format=None,blob_store=None,blob_layout="hardlink",incremental=True,minifs_extractor="native",subprocess_timeout=None,symbol_exports=SYMBOL_EXPORT_FORMATS):
+    options = ExtractionOptions(fuzzymode, materialize, extractor, cache_dir, cache_size, verbose=True, profile_stage=profile_stage,
+                                output=output, output_format=output_format, blob_store=blob_store, blob_layout=blob_layout, incremental=incremental,
+                                minifs_extractor=minifs_extractor, subprocess_timeout=subprocess_timeout, symbol_exports=symbol_exports,
+                                serial_stages=bool(profile_report or profile_stage))
+    try:
+        result = extract(file_path, options)
+        if profile_report:
+            write_profile_report(profile_report, file_path, result.metrics)
+    except VxfileError as e:
+        logger.error(f"\033[91m错误: {e}\033[0m")
+        if profile_report and hasattr(e, 'metrics'):
+            write_profile_report(profile_report, file_path, e.metrics, f"{type(e).__name__}: {e}")
+        sys.exit(1)
     except (ValueError, RuntimeError) as e:
-        print(f"错误: {e}")
+        logger.error(f"错误: {e}")
+        if profile_report and hasattr(e, 'metrics'):
+            write_profile_report(profile_report, file_path, e.metrics, f"{type(e).__name__}: {e}")
+
+
+def get_cli_option(argv, name, default=None):
+    """
+    从命令行参数中读取 --name=value 或 --name value 形式的选项值
+    """
+    for index, arg in enumerate(argv):
+        if arg.startswith(name + "="):
+            return arg.split("=", 1)[1]
+        if arg == name and index + 1 < len(argv):
+            return argv[index + 1]
+    return default
+
+def parse_size(text):
+    """
+    解析形如 512M、10G、4096 的容量字符串，返回字节数；格式不对或不大于 0 时抛出 ValueError
+    """
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    size_text = text.strip().upper().rstrip('B')
+    try:
+        if size_text and size_text[-1] in units:
+            size = int(float(size_text[:-1]) * units[size_text[-1]])
+        else:
+            size = int(size_text)
+    except OverflowError:
+        raise ValueError(f"无效的容量 {text}") from None
+    if size <= 0:
+        raise ValueError(f"无效的容量 {text}，应大于 0")
+    return size
+
+
+# 批处理：默认输出根目录、清单文件名、每个固件的日志文件名
+BATCH_OUTPUT_ROOT = "vxfile_batch"
+BATCH_MANIFEST_NAME = "batch_manifest.jsonl"
+BATCH_LOG_NAME = "vxfile.log"
+# 工作进程异常退出（如被 OOM 杀掉）导致进程池损坏时，未完成的固件重新提交的次数
+BATCH_POOL_RETRIES = 1
+
+def collect_batch_inputs(source, output_root=None, manifest_path=None):
+    """
+    收集批处理的固件列表，返回去重后的绝对路径列表。
+    source 为目录时递归收集其中的文件（跳过隐藏文件和目录，以及批处理自己的输出根目录 output_root 和清单 manifest_path，
+    例如在固件目录中运行 batch . 时默认的输出根目录就在其中）；
+    为文件时按行读取固件路径，忽略空行和 # 注释，相对路径相对于列表文件所在目录。
+    output_root、manifest_path 均为绝对路径。
+    """
+    file_paths = []
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(os.path.abspath(source)):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.') and os.path.join(root, d) != output_root)
+            for file in sorted(files):
+                file_path = os.path.join(root, file)
+                if not file.startswith('.') and file_path != manifest_path and os.path.isfile(file_path):
+                    file_paths.append(file_path)
+    elif os.path.isfile(source):
+        base_dir = os.path.dirname(os.path.abspath(source))
+        with open(source, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    file_paths.append(os.path.join(base_dir, os.path.expanduser(line)))
+    else:
+        raise ValueError(f"批处理输入不存在: {source}")
+    return list(dict.fromkeys(os.path.abspath(file_path) for file_path in file_paths))
+
+def assign_work_dirs(file_paths, output_root):
+    """
+    为每个固件分配独立的工作目录，默认以固件文件名命名，文件名重复时追加路径哈希
+    """
+    name_counts = defaultdict(int)
+    for file_path in file_paths:
+        name_counts[os.path.basename(file_path)] += 1
+    work_dirs = {}
+    for file_path in file_paths:
+        name = os.path.basename(file_path)
+        if name_counts[name] > 1:
+            name = f"{name}_{hashlib.sha1(file_path.encode('utf-8')).hexdigest()[:8]}"
+        work_dirs[file_path] = os.path.join(output_root, name)
+    return work_dirs
+
+def get_file_fingerprint(file_path):
+    """
+    用文件大小和修改时间判断固件在两次运行之间是否被替换
+    """
+    stat = os.stat(file_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def load_batch_manifest(manifest_path):
+    """
+    读取已有的批处理清单，返回 {固件路径: 最后一条记录}；中断时写了一半的行直接忽略
+    """
+    records = {}
+    if not os.path.exists(manifest_path):
+        return records
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                records[record['path']] = record
+            except (ValueError, KeyError, TypeError):
+                continue
+    return records
+
+def append_batch_manifest(manifest_path, record):
+    """
+    向清单追加一条记录并立即落盘，进程随时中断也不会丢失已完成的结果
+    """
+    with open(manifest_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def run_batch_job(job):
+    """
+    在工作进程中处理一个固件：切换到该固件自己的工作目录，输出写入其日志文件。
+    任何失败都只记录在返回的结果里，不影响其他固件；VxfileError 之外的异常把调用栈写入日志。
+    """
+    file_path, work_dir, options = job
+    os.makedirs(work_dir, exist_ok=True)
+    log_path = os.path.join(work_dir, BATCH_LOG_NAME)
+    record = {"path": file_path, "work_dir": work_dir, "log": log_path}
+    previous_dir = os.getcwd()
+    start_time = time.time()
+    start_cpu = time.process_time()
+    with open(log_path, 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            os.chdir(work_dir)
+            result = extract(file_path, options).to_dict(include_file_map=False)
+            for key in ("extracted_dir", "main_program", "symbol_table", "offset_table_file", "blob_manifest"):
+                if result.get(key):
+                    result[key] = os.path.abspath(result[key])
+            record.update(result, status="ok")
+        except VxfileError as e:
+            record.update(status="failed", error=f"{type(e).__name__}: {e}", metrics=getattr(e, 'metrics', None))
+        except Exception as e:
+            traceback.print_exc()
+            record.update(status="failed", error=f"{type(e).__name__}: {e}", metrics=getattr(e, 'metrics', None))
+        finally:
+            os.chdir(previous_dir)
+    record["elapsed"] = round(time.time() - start_time, 3)
+    record["cpu_time"] = round(time.process_time() - start_cpu, 3)
+    return record
+
+def run_batch(source, output_root=BATCH_OUTPUT_ROOT, jobs=None, manifest_path=None, retry_failed=False, options=None):
+    """
+    批量处理 source（目录或固件列表文件）中的所有固件，每个固件在进程池中独立处理。
+    每处理完一个固件就向清单追加一条 JSON 记录（状态、耗时、输出路径等），
+    再次运行同一命令时跳过清单中已完成且未被替换的固件；retry_failed 为 True 时重新处理失败的固件。
+    options 为每个固件使用的 ExtractionOptions，其中 workers 未指定时为 1，并行度来自固件之间。
+    返回 (成功数, 失败数)。
+    """
+    output_root = os.path.abspath(output_root)
+    manifest_path = os.path.abspath(manifest_path or os.path.join(output_root, BATCH_MANIFEST_NAME))
+    file_paths = collect_batch_inputs(source, output_root, manifest_path)
+    os.makedirs(output_root, exist_ok=True)
+    options = dataclasses.replace(options or ExtractionOptions(), verbose=True)
+    options.workers = options.workers or 1
+    if options.cache_dir:
+        options.cache_dir = os.path.abspath(options.cache_dir)
+    if options.blob_store:
+        options.blob_store = os.path.abspath(options.blob_store)
+
+    finished = load_batch_manifest(manifest_path)
+    work_dirs = assign_work_dirs(file_paths, output_root)
+    fingerprints = {}
+    pending = []
+    for file_path in file_paths:
+        fingerprints[file_path] = get_file_fingerprint(file_path)
+        record = finished.get(file_path)
+        if record and record.get("fingerprint") == fingerprints[file_path]:
+            if record.get("status") == "ok" or not retry_failed:
+                continue
+        pending.append((file_path, work_dirs[file_path], options))
+    logger.info(f"共 {len(file_paths)} 个固件，清单中已完成 {len(file_paths) - len(pending)} 个，本次处理 {len(pending)} 个")
+    logger.info(f"清单文件：{manifest_path}")
+
+    counts = defaultdict(int)
+    done_count = 0
+
+    def record_result(record):
+        nonlocal done_count
+        done_count += 1
+        record["fingerprint"] = fingerprints[record["path"]]
+        record["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        append_batch_manifest(manifest_path, record)
+        counts[record["status"]] += 1
+        detail = f"，{record['error']}" if record.get("error") else ""
+        logger.info(f"[{done_count}/{len(pending)}] {record['status']:<6} {record['path']}（{record['elapsed']:.1f}s{detail}）",
+                    extra={'event': 'batch_item', 'fields': {'record': record}})
+
+    retries = 0
+    jobs_left = pending
+    while jobs_left:
+        broken_jobs = []
+        try:
+            # 工作进程按当前的日志设置重新配置（spawn 启动的进程不会继承）
+            executor = ProcessPoolExecutor(max_workers=min(get_worker_count(jobs), len(jobs_left)),
+                                           initializer=configure_logging, initargs=(LOG_CONFIG['level'], LOG_CONFIG['json_path'], LOG_CONFIG['console_level']))
+        except (OSError, NotImplementedError) as e:
+            logger.warning(f"无法使用进程池（{e}），改为串行处理")
+            for job in jobs_left:
+                record_result(run_batch_job(job))
+            break
+        try:
+            futures = {executor.submit(run_batch_job, job): job for job in jobs_left}
+            for future in as_completed(futures):
+                try:
+                    record_result(future.result())
+                except BrokenProcessPool:
+                    broken_jobs.append(futures[future])
+        except KeyboardInterrupt:
+            executor.shutdown(wait=False, cancel_futures=True)
+            logger.warning("\n批处理已中断，已完成的结果都在清单中，再次运行同一命令即可继续")
+            raise
+        executor.shutdown()
+
+        if broken_jobs and retries < BATCH_POOL_RETRIES:
+            retries += 1
+            logger.warning(f"工作进程异常退出，重新提交未完成的 {len(broken_jobs)} 个固件")
+            jobs_left = broken_jobs
+            continue
+        for file_path, work_dir, _ in broken_jobs:
+            record_result({"path": file_path, "work_dir": work_dir, "log": os.path.join(work_dir, BATCH_LOG_NAME),
+                           "status": "failed", "error": "工作进程异常退出", "elapsed": 0.0})
+        break
+
+    logger.info(f"批处理完成：成功 {counts['ok']} 个，失败 {counts['failed']} 个，清单：{manifest_path}")
+    return counts['ok'], counts['failed']
 
 
 if __name__ == "__main__":
@@ -998,18 +4321,179 @@ if __name__ == "__main__":
     if "-h" in sys.argv or "--help" in sys.argv or len(sys.argv) < 2:
         help_message = """
 用法：
-    python3 vxfile_extracter.py <bin 文件路径> [--fuzzmode]
+    python3 vxfile_extracter.py <bin 文件路径> [--fuzzymode] [--materialize=copy|hardlink|symlink|reflink] [--extractor=native|binwalk]
+                                [--cache-dir=<目录>] [--cache-size=<容量>] [--no-cache]
+                                [--profile[=<报告路径>]] [--profile-stage=<阶段>]
+                                [--output=<归档路径>|-] [--output-format=tar|tar.gz|tar.xz|tar.zst|zip]
+                                [--blob-store=<存储目录>] [--blob-layout=hardlink|manifest] [--no-incremental]
+                                [--minifs=native|carved] [--timeout=<秒>] [--symbol-export=json,csv,ida,ghidra|none]
+                                [--quiet] [--log-level=debug|info|warning|error] [--log-json=<路径>|-]
+    python3 vxfile_extracter.py store-gc <存储目录> [--dry-run]
+    python3 vxfile_extracter.py ls <bin 文件路径>
+    python3 vxfile_extracter.py cat <bin 文件路径> <恢复出的路径> > <输出文件>
+    python3 vxfile_extracter.py symbols <SYMBOL_Table 路径> <地址或符号名>...
+    python3 vxfile_extracter.py batch <固件目录或列表文件> [--jobs=N] [--output-root=<目录>] [--manifest=<路径>]
+                                [--retry-failed] [以上单固件选项]
 
 选项：
     -h, --help      显示帮助信息
-    --fuzzmode      使用模糊匹配模式处理文件
+    --fuzzymode      使用模糊匹配模式处理文件
+    --materialize    恢复文件的落盘方式，默认 copy；hardlink/symlink/reflink 不被文件系统支持时自动退回 copy
+    --extractor      解包后端，默认 native（内置的并行 LZMA 解包，找不到 LZMA 数据时自动改用 binwalk），binwalk 为 binwalk -Me
+    --cache-dir      解包结果缓存目录，默认 ~/.cache/vxfile_extractor（可用环境变量 VXFILE_CACHE_DIR 修改）
+    --cache-size     解包结果缓存的容量上限，如 512M、10G，默认 10G，超出时淘汰最久未使用的缓存项
+    --no-cache       不使用解包结果缓存
+    --profile        把各处理阶段的墙钟时间、CPU 时间、读取字节数、子进程数、峰值 RSS 写成 JSON 报告，默认 vxfile_profile.json；
+                     这些指标是进程级的，带 --profile 或 --profile-stage 时各阶段依次执行而不并发，每个阶段的数字只属于它自己
+    --profile-stage  用 cProfile 剖析指定阶段，结果写入 vxfile_profile_<阶段>.pstats，可选阶段：
+                     extract, symbol_table, check_encrypted, web_names, find_table_file, locate_offset, decode_table, choose_offset, restore
+    --output         把恢复的文件（带恢复出的路径）直接流式写入归档，不在磁盘上生成 result_vxworks_file 目录；
+                     为 - 时写到标准输出（此时过程信息改为输出到标准错误）
+    --output-format  归档格式：tar, tar.gz, tar.xz, tar.zst（需要 Python 3.14+ 或 zstandard 模块）, zip；
+                     默认按 --output 的后缀推断，写到标准输出时默认为 tar
+    --blob-store     把恢复的文件按内容哈希存入共享的内容寻址存储，相同内容在多个固件之间只存一份；
+                     输出目录中写出 blob_manifest.json（恢复路径→哈希），并在存储中登记引用
+    --blob-layout    使用 --blob-store 时结果目录的形式：hardlink（默认，由指向存储对象的硬链接组成）或 manifest（只写清单）
+    --no-incremental 不使用输出目录中的分阶段清单 vxfile_stages.json，所有阶段从头执行（默认只重新执行输入变化了的阶段，
+                     如工具升级或改用 --fuzzymode 后；上次中途被打断的解包会被清理后重做）
+    --minifs         type2 (MINIFS) 固件的文件提取方式，默认 native：按偏移表后的 chunk 表在进程池上把每个 chunk 解压一次，
+                     按偏移和大小精确切出各个文件，不依赖 binwalk 的切分（此时 --materialize 不起作用）；找不到 chunk 数据时自动退回 carved，
+                     carved 为原先把偏移表项与解包切出的文件逐一匹配的方式
+    --timeout        每条外部命令（binwalk、grep）的超时秒数，超时的命令会被杀掉并报错，默认不限
+    --symbol-export  解析符号表后在 SYMBOL_Table 旁边写出的格式，逗号分隔，默认全部：json、csv、ida（IDAPython 脚本）、
+                     ghidra（Ghidra 脚本）；为 none 时只保存原始的 SYMBOL_Table
+    --quiet          安静模式：不显示启动画面、不等待，终端上只输出警告和错误（--log-json 的事件流不受影响）；batch 也不显示启动画面
+    --log-level      日志级别，默认 info；debug 时输出每个表项、每个文件和外部命令的完整输出，
+                     info 时逐个文件的处理只显示一行限速刷新的进度（计数和每秒处理数）
+    --log-json       另外把日志写成 JSON Lines 事件流（追加），每行一个事件，带时间、级别、固件、阶段，
+                     进度、阶段完成、处理结果等事件带有结构化字段；为 - 时写到标准错误
+    store-gc         删除输出目录已被清理的固件的引用，再删除不再被任何固件引用的存储对象；--dry-run 只统计不删除
+    ls               不解包，只解析偏移表，列出固件中恢复出的路径和大小（整个数据流即为文件时大小显示为 -）
+    cat              不解包，只解压目标文件所在的 chunk，把文件内容写到标准输出
+    symbols          在提取出的符号表中查询：地址（如 0x10001234）输出其所在的符号和偏移，符号名输出其地址
+
+批处理选项：
+    batch            批量处理目录中的所有固件（递归），或列表文件中每行一个的固件路径
+    --jobs           同时处理的固件数，默认 CPU 核数
+    --output-root    批处理输出根目录，每个固件在其下拥有独立的工作目录和日志，默认 vxfile_batch
+    --manifest       批处理清单（JSON Lines，含每个固件的分阶段统计），默认 <输出根目录>/batch_manifest.jsonl；中断后再次运行会跳过已完成的固件
+    --retry-failed   重新处理清单中记录为失败的固件
 
 说明：
-    该工具用于正确解压并恢复 vxworks 固件。默认情况下，优先使用精确匹配。如果指定 --fuzzmode 参数，将强制使用模糊匹配。
+    该工具用于正确解压并恢复 vxworks 固件。默认情况下，优先使用精确匹配。如果指定 --fuzzymode 参数，将强制使用模糊匹配。
         """
         print(help_message)
         sys.exit(0)
 
+    if sys.argv[1] == "store-gc":
+        if len(sys.argv) < 3 or not os.path.isdir(sys.argv[2]):
+            print("错误：store-gc 需要指定已存在的存储目录")
+            sys.exit(1)
+        dry_run = "--dry-run" in sys.argv
+        stats = BlobStore(sys.argv[2]).gc(dry_run)
+        print(f"有效引用 {stats['refs']} 个，失效引用 {stats['stale_refs']} 个；对象 {stats['objects']} 个，"
+              f"{'可' if dry_run else '已'}删除 {stats['removed']} 个（{stats['freed_bytes']} 字节），保留 {stats['kept_bytes']} 字节")
+        sys.exit(0)
+
+    if sys.argv[1] in ("ls", "cat"):
+        if len(sys.argv) < (3 if sys.argv[1] == "ls" else 4) or not os.path.isfile(sys.argv[2]):
+            print(f"错误：{sys.argv[1]} 需要指定已存在的固件文件" + ("和恢复出的路径" if sys.argv[1] == "cat" else ""), file=sys.stderr)
+            sys.exit(1)
+        try:
+            with FirmwareArchive(sys.argv[2]) as archive:
+                if sys.argv[1] == "ls":
+                    for name in archive.namelist():
+                        entry = archive.getinfo(name)
+                        print(f"{'-' if entry.size is None else entry.size:>10}  {name}")
+                else:
+                    sys.stdout.buffer.write(archive.read(sys.argv[3]))
+                    sys.stdout.buffer.flush()
+        except KeyError as e:
+            print(f"错误：{e.args[0]}", file=sys.stderr)
+            sys.exit(1)
+        except VxfileError as e:
+            print(f"错误：{e}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+    if sys.argv[1] == "symbols":
+        if len(sys.argv) < 4 or not os.path.isfile(sys.argv[2]):
+            print("错误：symbols 需要指定已存在的 SYMBOL_Table 和要查询的地址或符号名", file=sys.stderr)
+            sys.exit(1)
+        symbols = SymbolTable.load(sys.argv[2])
+        if symbols is None:
+            print(f"错误：{sys.argv[2]} 的格式无法识别", file=sys.stderr)
+            sys.exit(1)
+        missing = 0
+        for query in sys.argv[3:]:
+            if query in symbols:
+                print(f"{query} = 0x{symbols.address_of(query):08X}")
+                continue
+            try:
+                address = int(query, 0)
+            except ValueError:
+                address = None
+            symbol = symbols.symbol_at(address) if address is not None else None
+            if symbol is None:
+                print(f"错误：找不到 {query}", file=sys.stderr)
+                missing += 1
+            else:
+                print(f"0x{address:08X} = {symbol.name}+0x{address - symbol.address:X}")
+        sys.exit(1 if missing else 0)
+
+    # 日志设置：--quiet 时终端上只显示警告和错误，同时跳过启动画面；JSON 事件流仍按 --log-level 记录
+    quiet = "--quiet" in sys.argv
+    try:
+        configure_logging(get_cli_option(sys.argv, "--log-level", DEFAULT_LOG_LEVEL), get_cli_option(sys.argv, "--log-json"),
+                          "warning" if quiet else None)
+    except (ValueError, OSError) as e:
+        print(f"错误：{e}")
+        sys.exit(1)
+
+    # 归档写到标准输出时，过程信息全部改为输出到标准错误
+    output = get_cli_option(sys.argv, "--output")
+    output_format = get_cli_option(sys.argv, "--output-format")
+    if output is not None:
+        if sys.argv[1] == "batch":
+            print("错误：batch 不支持 --output，每个固件的结果写在各自的工作目录中")
+            sys.exit(1)
+        try:
+            resolve_archive_format(output, output_format)
+        except ValueError as e:
+            print(f"错误：{e}")
+            sys.exit(1)
+        if output == "-":
+            output = sys.stdout.buffer
+            sys.stdout = sys.stderr
+    blob_store = get_cli_option(sys.argv, "--blob-store")
+    blob_layout = get_cli_option(sys.argv, "--blob-layout", "hardlink")
+    if blob_layout not in BLOB_LAYOUTS:
+        print(f"错误：未知的结果目录形式 {blob_layout}，可选: {', '.join(BLOB_LAYOUTS)}")
+        sys.exit(1)
+    if blob_store and output is not None:
+        print("错误：--output 和 --blob-store 不能同时使用")
+        sys.exit(1)
+    incremental = "--no-incremental" not in sys.argv
+    minifs_extractor = get_cli_option(sys.argv, "--minifs", "native")
+    if minifs_extractor not in MINIFS_EXTRACTORS:
+        print(f"错误：未知的 MINIFS 提取方式 {minifs_extractor}，可选: {', '.join(MINIFS_EXTRACTORS)}")
+        sys.exit(1)
+    subprocess_timeout = get_cli_option(sys.argv, "--timeout")
+    if subprocess_timeout is not None:
+        try:
+            subprocess_timeout = float(subprocess_timeout)
+            if subprocess_timeout <= 0:
+                raise ValueError
+        except ValueError:
+            print(f"错误：无效的超时时间 {subprocess_timeout}，应为大于 0 的秒数")
+            sys.exit(1)
+    symbol_exports = get_cli_option(sys.argv, "--symbol-export", ",".join(SYMBOL_EXPORT_FORMATS))
+    symbol_exports = () if symbol_exports == "none" else tuple(fmt for fmt in symbol_exports.split(",") if fmt)
+    unknown_exports = [fmt for fmt in symbol_exports if fmt not in SYMBOL_EXPORT_FORMATS]
+    if unknown_exports:
+        print(f"错误：未知的符号表导出格式 {', '.join(unknown_exports)}，可选: {', '.join(SYMBOL_EXPORT_FORMATS)}, none")
+        sys.exit(1)
+
     # 输出 ASCII 艺术字
     ascii_art = """
     ██╗   ██╗██╗  ██╗███████╗██╗██╗     ███████╗        ███████╗██╗  ██╗████████╗██████╗  █████╗  ██████╗████████╗ ██████╗ ██████╗ 
@@ -1019,11 +4503,55 @@ if __name__ == "__main__":
      ╚████╔╝ ██╔╝ ██╗██║     ██║███████╗███████╗███████╗███████╗██╔╝ ██╗   ██║   ██║  ██║██║  ██║╚██████╗   ██║   ╚██████╔╝██║  ██║
       ╚═══╝  ╚═╝  ╚═╝╚═╝     ╚═╝╚══════╝╚══════╝╚══════╝╚══════╝╚═╝  ╚═╝   ╚═╝   ╚═╝  ╚═╝╚═╝  ╚═╝ ╚═════╝   ╚═╝    ╚═════╝ ╚═╝  ╚═╝
     """
-    print("\033[1;32m" + ascii_art + "\033[0m")
-    time.sleep(1.14514)
+    if not quiet and sys.argv[1] != "batch":
+        print("\033[1;32m" + ascii_art + "\033[0m")
+        time.sleep(1.14514)
 
     # 解析 fuzzmode 参数
     fuzzymode = "--fuzzymode" in sys.argv
+    materialize = get_cli_option(sys.argv, "--materialize", "copy")
+    if materialize not in MATERIALIZE_METHODS:
+        print(f"错误：未知的落盘方式 {materialize}，可选: {', '.join(MATERIALIZE_METHODS)}")
+        sys.exit(1)
+    extractor = get_cli_option(sys.argv, "--extractor", "native")
+    if extractor not in EXTRACTORS:
+        print(f"错误：未知的解包后端 {extractor}，可选: {', '.join(EXTRACTORS)}")
+        sys.exit(1)
+
+    cache_dir = None if "--no-cache" in sys.argv else get_cli_option(sys.argv, "--cache-dir", DEFAULT_CACHE_DIR)
+    cache_size = get_cli_option(sys.argv, "--cache-size", str(DEFAULT_CACHE_SIZE))
+    try:
+        cache_size = parse_size(cache_size)
+    except ValueError:
+        print(f"错误：无效的缓存容量 {cache_size}，应为大于 0 的字节数或 512M、10G 这样的容量")
+        sys.exit(1)
+    profile_stage = get_cli_option(sys.argv, "--profile-stage")
+    if profile_stage and profile_stage not in PROFILE_STAGES:
+        print(f"错误：未知的阶段 {profile_stage}，可选: {', '.join(PROFILE_STAGES)}")
+        sys.exit(1)
+    # --profile 可以不带路径
+    profile_report = next((arg.split("=", 1)[1] for arg in sys.argv if arg.startswith("--profile=")), None)
+    if profile_report is None and "--profile" in sys.argv:
+        profile_report = DEFAULT_PROFILE_REPORT
+
+    if sys.argv[1] == "batch":
+        if len(sys.argv) < 3:
+            print("错误：batch 需要指定固件目录或列表文件")
+            sys.exit(1)
+        jobs = get_cli_option(sys.argv, "--jobs")
+        output_root = get_cli_option(sys.argv, "--output-root", BATCH_OUTPUT_ROOT)
+        manifest_path = get_cli_option(sys.argv, "--manifest")
+        try:
+            options = ExtractionOptions(fuzzymode, materialize, extractor, cache_dir, cache_size, profile_stage=profile_stage,
+                                        blob_store=blob_store, blob_layout=blob_layout, incremental=incremental,
+                                        minifs_extractor=minifs_extractor, subprocess_timeout=subprocess_timeout, symbol_exports=symbol_exports)
+            _, failed_count = run_batch(sys.argv[2], output_root, jobs, manifest_path, "--retry-failed" in sys.argv, options)
+        except (ValueError, OSError) as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+        except KeyboardInterrupt:
+            sys.exit(130)
+        sys.exit(1 if failed_count else 0)
 
     # 调用主函数
-    main(sys.argv[1], fuzzymode)
+    main(sys.argv[1], fuzzymode, materialize, extractor, cache_dir, cache_size, profile_report, profile_stage, output, output_format, blob_store, blob_layout, incremental, minifs_extractor, subprocess_timeout, symbol_exports)